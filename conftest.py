@@ -3,22 +3,45 @@ from sqlmodel import select
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 from sqlmodel import Session, create_engine, SQLModel
-
-from pricer_app.database import get_session
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from pricer_app.database import (
+    SYNC_DRIVERS,
+    async_database_url,
+    database_url_with_driver,
+    get_session,
+)
 from pricer_app.main import app
 from pricer_app.settings import settings
+from pricer_app.market_data.cache import forget_market_data_version, market_data_cache
 from pricer_app.market_data.models import MarketData
+from pricer_app.market_data.volatility_surface import volatility_surface_cache
 
 from pricer_app.market_data.tests.factories import MarketDataCreateFactory
 
 
 @pytest.fixture(scope="function")
-def session():
-    engine = create_engine(settings.test_database_url, echo=True)
+def database_url():
+    # Overridden by tests that run against another database, see `pricer_app/tests/test_postgres.py`.
+    return settings.test_database_url
+
 
-    # Create all tables
+@pytest.fixture(scope="function")
+def session(database_url):
+    engine = create_engine(
+        database_url_with_driver(database_url, SYNC_DRIVERS), echo=True
+    )
+
+    # Create all tables, from scratch in case a previous run didn't drop them
+    SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
+    # Cached market data is keyed by id, which the new tables reuse, and their version starts again.
+    market_data_cache.clear()
+    volatility_surface_cache.clear()
+    forget_market_data_version()
 
     # Create a new session
     with Session(engine) as session:
@@ -27,14 +50,31 @@ def session():
         session.rollback()
 
     SQLModel.metadata.drop_all(engine)
+    engine.dispose()
+
+
+@pytest.fixture(scope="function")
+def async_engine(database_url, session: Session):
+    # Without pooling: connections belong to the event loop that opened them, and the test client runs its own.
+    return create_async_engine(
+        async_database_url(database_url), echo=True, poolclass=NullPool
+    )
+
+
+@pytest.fixture(scope="function")
+async def async_session(async_engine):
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
+        yield session
 
 
 @pytest.fixture(scope="function")
-def client(session: Session):
+def client(async_engine):
     # The app dependency overrides go here.
+    async def get_test_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
 
-    # This is just an example, actual implementation might differ
-    app.dependency_overrides[get_session] = lambda: session
+    app.dependency_overrides[get_session] = get_test_session
 
     # Create a TestClient using the FastAPI app
     with TestClient(app) as test_client:
@@ -82,6 +122,17 @@ def raw_market_data():
                 "strike_price": 10.0,
             },
         ),
+        (
+            "ICE",
+            "BRN Jun21 Call Strike 50.0 USD",
+            {
+                "forward_price": 100.0,
+                "time_to_expiration": 0.5,
+                "risk_free_interest_rate": 0.03,
+                "volatility": 0.2,
+                "strike_price": 50.0,
+            },
+        ),
     ]
 
     return valid_market_data
@@ -96,7 +147,11 @@ def market_data_models(raw_market_data, session):
             "market_data": json.dumps(market_data),
         }
         model = MarketDataCreateFactory(**model_data)
-        db_model = MarketData(**model.dict())
+        db_model = MarketData(
+            exchange_code=model.exchange_code,
+            contract=model.contract,
+            **model.market_data_fields(),
+        )
         session.add(db_model)
     session.commit()
 
@@ -1,15 +1,132 @@
+from typing import Any, Dict, Optional
+
+from sqlalchemy import Engine, event
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel import SQLModel, create_engine, Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .settings import settings
 
-connect_args = {"check_same_thread": False}
-engine = create_engine(settings.database_url, echo=True, connect_args=connect_args)
+# Drivers by database backend, for the sync and the async engines; psycopg (3) does both for PostgreSQL.
+SYNC_DRIVERS = {"sqlite": "pysqlite", "postgresql": "psycopg"}
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "psycopg"}
+
+# INSERT constructs supporting ON CONFLICT, by database backend.
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+
+def database_url_with_driver(database_url: str, drivers: Dict[str, str]) -> str:
+    """
+    >>> database_url_with_driver("postgresql://user@localhost/pricer", SYNC_DRIVERS)
+    'postgresql+psycopg://user@localhost/pricer'
+
+    :return: the database url with the driver for its backend.
+    :raises: ValueError if the backend isn't supported.
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in drivers:
+        raise ValueError(
+            f"Unsupported database backend: {backend}, supported: {', '.join(drivers)}"
+        )
+    return url.set(drivername=f"{backend}+{drivers[backend]}").render_as_string(
+        hide_password=False
+    )
+
+
+def async_database_url(database_url: str) -> str:
+    """
+    >>> async_database_url("sqlite:///db.sqlite")
+    'sqlite+aiosqlite:///db.sqlite'
+
+    :return: the database url with the async driver for its backend.
+    """
+    return database_url_with_driver(database_url, ASYNC_DRIVERS)
+
+
+def engine_options(database_url: str) -> Dict[str, Any]:
+    """
+    :return: create_engine keyword arguments for the database url, from settings.
+    """
+    url = make_url(database_url)
+    options = {
+        "echo": settings.database_echo,
+        "pool_pre_ping": settings.database_pool_pre_ping,
+    }
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # in-memory databases live in a single connection, there is no pool to size.
+            return options
+    options["pool_size"] = settings.database_pool_size
+    options["max_overflow"] = settings.database_max_overflow
+    return options
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Configure a new SQLite connection from settings.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.sqlite_busy_timeout)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.sqlite_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size={int(settings.sqlite_cache_size)}")
+    cursor.close()
+
+
+def create_database_engine(database_url: str) -> Engine:
+    """
+    Create a sync engine configured from settings, see `engine_options`.
+    """
+    engine = create_engine(
+        database_url_with_driver(database_url, SYNC_DRIVERS),
+        **engine_options(database_url),
+    )
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+def create_async_database_engine(database_url: str) -> AsyncEngine:
+    """
+    Create an async engine configured from settings, see `engine_options` and `async_database_url`.
+    """
+    options = engine_options(database_url)
+    if "pool_size" in options:
+        # aiosqlite defaults to no pooling, asking for a pool size means a queue pool.
+        options["poolclass"] = AsyncAdaptedQueuePool
+    engine = create_async_engine(async_database_url(database_url), **options)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+# The sync engine is used at startup, to create and migrate tables.
+engine = create_database_engine(settings.database_url)
+# Requests use the async engine, so waiting on the database doesn't block the event loop.
+async_engine = create_async_database_engine(settings.database_url)
+
 
+def create_db_and_tables(bind: Optional[Engine] = None):
+    """
+    Create missing tables and indexes, in the app's database unless another engine is given.
+    """
+    bind = bind or engine
+    SQLModel.metadata.create_all(bind)
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+    # create_all skips tables that already exist, add any indexes they are missing.
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind, checkfirst=True)
 
 
-def get_session():
-    with Session(engine) as session:
+async def get_session():
+    # Objects stay loaded after commit, as reloading them lazily isn't possible with an async session.
+    async with AsyncSession(async_engine, expire_on_commit=False) as session:
         yield session
@@ -2,34 +2,63 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 
-from pricer_app.database import create_db_and_tables
+from sqlmodel import Session
 
+from pricer_app.database import create_db_and_tables, get_session
+
+from pricer_app.market_data.cache import prewarm_market_data_cache
 from pricer_app.market_data.routes import router as market_data_router
+from pricer_app.market_data.expiries import build_expiry_index, warm_expiry_calendars
+from pricer_app.market_data.migrations import migrate_market_data_json
 from pricer_app.market_data.models import (
+    Expiry,
     MarketData,
 )  # noqa - this is used in the create_db_and_tables function
+from pricer_app.option_pricing.executor import shutdown_pool
 from pricer_app.option_pricing.routes import router as option_router
+from pricer_app.settings import settings
+from pricer_app.utils import configure_logging
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
+configure_logging()
 
 DATABASE_URL = os.environ["DATABASE_URL"]
 ALLOW_ORIGINS = os.getenv("ALLOW_ORIGINS", "").split(",")
 
-app = FastAPI()
 
-app.include_router(market_data_router, tags=["market_data"])
-app.include_router(option_router, tags=["option_pricing"])
+def prepare_database(session: Session):
+    """
+    Migrate the tables, create any that are missing and build the expiry index, in the session's database.
+    """
+    engine = session.get_bind()
+    migrate_market_data_json(engine)
+    create_db_and_tables(engine)
+    build_expiry_index(session)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_db_and_tables()
+    # Startup runs before the worker accepts requests.  The database is reached the same way requests
+    # reach it, so a dependency override (as in the tests) applies here too.
+    async for session in app.dependency_overrides.get(get_session, get_session)():
+        if settings.prepare_database_on_startup:
+            await session.run_sync(prepare_database)
+        warm_expiry_calendars()
+        if settings.market_data_cache_prewarm:
+            await prewarm_market_data_cache(session)
     yield
+    shutdown_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.include_router(market_data_router, tags=["market_data"])
+app.include_router(option_router, tags=["option_pricing"])
 
 
 if __name__ == "__main__":
-    import uvicorn
+    from pricer_app.server import main
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    main()
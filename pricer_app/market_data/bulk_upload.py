@@ -0,0 +1,261 @@
+"""
+Bulk upload of market data.
+
+Rows are validated one by one through `MarketDataCreate`, so one bad row doesn't fail the whole
+upload, then written with set-based upserts on the `unique_exchange_code_contract` constraint,
+one statement per chunk of rows, in a single transaction. On PostgreSQL rows are loaded with COPY
+instead, see `postgres.py`.
+
+Very large files can be streamed instead (see `ingest_market_data`): the body is read incrementally
+and each batch of rows is validated, upserted and committed before the next one is read.
+"""
+import csv
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import tuple_
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .cache import bump_market_data_version, market_data_cache
+from .models import BLACK76_FIELDS, MarketData
+from .postgres import copy_upsert_market_data
+from .schemas import MarketDataCreate
+from .volatility_surface import invalidate_volatility_surfaces
+from ..database import UPSERT_INSERTS
+from ..settings import settings
+
+
+def format_validation_error(e: ValidationError) -> str:
+    """
+    :return: the messages of a pydantic ValidationError on one line, prefixed by the field they are for.
+    """
+    return "; ".join(
+        (
+            f"{'.'.join(map(str, error['loc']))}: {error['msg']}"
+            if error["loc"]
+            else error["msg"]
+        )
+        for error in e.errors()
+    )
+
+
+def validate_market_data_rows(
+    rows: Iterable[Any], start: int = 0
+) -> Tuple[List[Tuple[int, MarketDataCreate]], Dict[int, str]]:
+    """
+    Validate rows of market data, without stopping at the first invalid one.
+
+    :param rows: dicts (or JSON strings) of MarketDataCreate fields, anything else is an invalid row
+    :param start: index of the first row, for reporting
+    :return: tuple of ([(index, MarketDataCreate)], {index: error message}).
+    """
+    valid = []
+    errors = {}
+    for i, row in enumerate(rows, start):
+        try:
+            if isinstance(row, (str, bytes)):
+                row = json.loads(row)
+            if not isinstance(row, dict):
+                raise ValueError("Expected a JSON object of market data.")
+            valid.append((i, MarketDataCreate.model_validate(row)))
+        except ValidationError as e:
+            errors[i] = format_validation_error(e)
+        except ValueError as e:
+            errors[i] = str(e)
+    return valid, errors
+
+
+def upsert_market_data(
+    session: Session,
+    items: List[Tuple[int, MarketDataCreate]],
+    chunk_size: int = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Insert or update validated market data, in chunks of chunk_size rows.
+
+    Rows with the same exchange code and contract as an existing row replace its market data and upload
+    timestamp, keeping its id. When the same contract appears more than once the last one wins.
+
+    The caller owns the transaction, nothing is committed here.
+
+    :param items: list of (index, MarketDataCreate), see `validate_market_data_rows`
+    :param chunk_size: rows per statement, defaults to settings.bulk_upload_chunk_size
+    :return: {index: {"status": "created" | "updated", "id": int}}
+    """
+    chunk_size = chunk_size or settings.bulk_upload_chunk_size
+    insert = UPSERT_INSERTS[session.get_bind().dialect.name]
+    results = {}
+    for chunk_start in range(0, len(items), chunk_size):
+        chunk = items[chunk_start : chunk_start + chunk_size]
+
+        # One row per contract: an upsert can't touch the same row twice in one statement.
+        indices_by_key: Dict[Tuple[str, str], List[int]] = {}
+        rows_by_key = {}
+        upload_timestamp = datetime.utcnow()
+        for i, item in chunk:
+            key = (item.exchange_code, item.contract)
+            indices_by_key.setdefault(key, []).append(i)
+            rows_by_key[key] = {
+                "exchange_code": item.exchange_code,
+                "contract": item.contract,
+                "upload_timestamp": upload_timestamp,
+                **item.market_data_fields(),
+            }
+
+        existing = set(
+            session.exec(
+                select(MarketData.exchange_code, MarketData.contract).where(
+                    tuple_(MarketData.exchange_code, MarketData.contract).in_(
+                        list(rows_by_key)
+                    )
+                )
+            ).all()
+        )
+
+        statement = insert(MarketData).values(list(rows_by_key.values()))
+        statement = statement.on_conflict_do_update(
+            index_elements=["exchange_code", "contract"],
+            set_={
+                field: statement.excluded[field]
+                for field in ("upload_timestamp", *BLACK76_FIELDS)
+            },
+        ).returning(MarketData.id, MarketData.exchange_code, MarketData.contract)
+
+        for id_, exchange_code, contract in session.execute(statement).all():
+            key = (exchange_code, contract)
+            status = "updated" if key in existing else "created"
+            for i in indices_by_key[key]:
+                results[i] = {"status": status, "id": id_}
+    return results
+
+
+async def save_market_data(
+    session: AsyncSession,
+    items: List[Tuple[int, MarketDataCreate]],
+    chunk_size: int = None,
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Insert or update validated market data through an async session, with COPY on PostgreSQL
+    (see `postgres.copy_upsert_market_data`), otherwise see `upsert_market_data`, and bump the
+    market data version (see `cache.bump_market_data_version`) in the same transaction.
+    """
+    await bump_market_data_version(session)
+    if session.bind.dialect.name == "postgresql":
+        return await copy_upsert_market_data(session, items)
+    return await session.run_sync(upsert_market_data, items, chunk_size)
+
+
+# CSV columns that are collected into the market_data of a row, when there is no market_data column.
+BLACK76_CSV_FIELDS = BLACK76_FIELDS
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Split a stream of byte chunks into lines, without reading the whole stream; blank lines are skipped.
+    """
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line.decode().rstrip("\r")
+    if pending.strip():
+        yield pending.decode().rstrip("\r")
+
+
+def csv_row_to_market_data(row: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Convert a CSV row into MarketDataCreate fields.
+
+    The market data is either a JSON "market_data" column, or one column per Black76 field
+    (see `BLACK76_CSV_FIELDS`), converted to floats where possible so validation can report the rest.
+    """
+    if "market_data" in row:
+        return row
+
+    market_data = {}
+    for field in BLACK76_CSV_FIELDS:
+        if row.get(field) not in (None, ""):
+            try:
+                market_data[field] = float(row[field])
+            except ValueError:
+                market_data[field] = row[field]
+    return {
+        **{k: v for k, v in row.items() if k not in BLACK76_CSV_FIELDS},
+        "market_data": market_data,
+    }
+
+
+async def ingest_market_data(
+    session: AsyncSession,
+    lines: AsyncIterator[str],
+    csv_format: bool = False,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Validate and upsert a stream of market data rows in fixed-size batches, yielding progress as it goes.
+
+    Only one batch of rows is held in memory at a time, and each batch is committed once written,
+    so progress is kept if a later batch fails.
+
+    :param lines: NDJSON lines, or CSV lines with a header line if csv_format is True
+    :param batch_size: rows per batch, defaults to settings.bulk_upload_chunk_size
+    :return: async iterator of progress dicts, one per batch:
+        {"batch": int, "rows": [first index, last index], "created": int, "updated": int, "errors": {index: message}}
+        followed by a summary {"done": True, "rows": int, "created": int, "updated": int, "errors": int}
+    """
+    batch_size = batch_size or settings.bulk_upload_chunk_size
+    header = None
+    totals = {"rows": 0, "created": 0, "updated": 0, "errors": 0}
+    batch = []
+    batch_number = 0
+
+    async def write_batch() -> Dict[str, Any]:
+        nonlocal batch_number
+        start = totals["rows"]
+        if csv_format:
+            rows = [
+                csv_row_to_market_data(dict(zip(header, values)))
+                for values in csv.reader(batch)
+            ]
+        else:
+            rows = batch
+        valid, errors = validate_market_data_rows(rows, start)
+        results = await save_market_data(session, valid, batch_size)
+        await session.commit()
+        market_data_cache.invalidate(result["id"] for result in results.values())
+        invalidate_volatility_surfaces(
+            (item.exchange_code, item.contract) for _i, item in valid
+        )
+
+        statuses = [result["status"] for result in results.values()]
+        progress = {
+            "batch": batch_number,
+            "rows": [start, start + len(batch) - 1],
+            "created": statuses.count("created"),
+            "updated": statuses.count("updated"),
+            "errors": errors,
+        }
+        totals["rows"] += len(batch)
+        totals["created"] += progress["created"]
+        totals["updated"] += progress["updated"]
+        totals["errors"] += len(errors)
+        batch_number += 1
+        batch.clear()
+        return progress
+
+    async for line in lines:
+        if csv_format and header is None:
+            header = next(csv.reader([line]))
+            continue
+        batch.append(line)
+        if len(batch) == batch_size:
+            yield await write_batch()
+    if batch:
+        yield await write_batch()
+
+    yield {"done": True, **totals}
@@ -14,13 +14,102 @@ so that the correct expiry dates can be calculated.
 """
 import re
 
-from typing import Dict, Type
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple, Type
 from typing_extensions import Self
-import pandas_market_calendars as mcal
-import pandas as pd
 from datetime import date
 from abc import ABC, abstractmethod
-import pytest
+
+from ..settings import settings
+
+if TYPE_CHECKING:
+    import pandas_market_calendars as mcal
+
+
+@lru_cache(maxsize=None)
+def get_calendar(calendar_name: str) -> "mcal.MarketCalendar":
+    """
+    Process-wide cache of exchange calendars, so each one is only constructed once.
+
+    pandas_market_calendars (and pandas with it) is imported here, the first time a calendar is needed,
+    as it takes longer to import than the rest of the app.
+    """
+    import pandas_market_calendars as mcal
+
+    return mcal.get_calendar(calendar_name)
+
+
+def month_before(year: int, month: int, months: int) -> Tuple[int, int]:
+    """
+    >>> month_before(2024, 2, 2)
+    (2023, 12)
+
+    :return: (year, month) of the month that is `months` before the given month.
+    """
+    year, month_index = divmod(year * 12 + (month - 1) - months, 12)
+    return year, month_index + 1
+
+
+class LastBusinessDayTable:
+    """
+    Table of month -> last business day for one exchange calendar.
+
+    Building a pandas schedule for every expiry calculation is expensive, so the business days
+    for the configured year range (settings.expiry_calendar_start_year to
+    settings.expiry_calendar_end_year) are fetched once, the first time the table is used, and
+    reduced to one date per month. Lookups outside the range fetch and add that year only.
+
+    Tables are shared by the whole process, see `for_calendar`.
+    """
+
+    _tables: Dict[str, "LastBusinessDayTable"] = {}
+
+    def __init__(self, calendar_name: str):
+        self.calendar_name = calendar_name
+        self.last_business_days: Dict[Tuple[int, int], date] = {}
+
+    @classmethod
+    def for_calendar(cls, calendar_name: str) -> Self:
+        """
+        Get the process-wide table for an exchange calendar, creating it if needed.
+        """
+        if calendar_name not in cls._tables:
+            cls._tables[calendar_name] = cls(calendar_name)
+        return cls._tables[calendar_name]
+
+    @classmethod
+    def clear(cls):
+        """
+        Drop all the tables, e.g. after the configured year range changes.
+        """
+        cls._tables.clear()
+
+    def get(self, year: int, month: int) -> date:
+        """
+        :return: the last business day of the month.
+        """
+        if (year, month) not in self.last_business_days:
+            if self.last_business_days:
+                self.add_years(year, year)
+            else:
+                self.add_years(
+                    min(year, settings.expiry_calendar_start_year),
+                    max(year, settings.expiry_calendar_end_year),
+                )
+        return self.last_business_days[(year, month)]
+
+    def add_years(self, start_year: int, end_year: int):
+        """
+        Fetch the business days for whole years and record the last one of each month.
+        """
+        business_days = get_calendar(self.calendar_name).valid_days(
+            start_date=date(start_year, 1, 1), end_date=date(end_year, 12, 31)
+        )
+        # business days are in ascending order, so the last one seen for a month is the last business day.
+        for business_day in business_days:
+            self.last_business_days[
+                (business_day.year, business_day.month)
+            ] = business_day.date()
 
 
 # Expiry rules for particular assets on particular exchanges.
@@ -28,6 +117,8 @@ import pytest
 # than one exchange or asset, in which case some base classes could be implemented.
 class ExpiryRule(ABC):
     asset_code: str
+    # name of the pandas_market_calendars calendar business days are taken from.
+    calendar_name: str
 
     @abstractmethod
     def calculate_expiry(self, delivery_month: date) -> date:
@@ -50,6 +141,7 @@ class ExpiryRule(ABC):
 class BRNExpiryRule(ExpiryRule):
     # specific to the ICE exchange
     asset_code = "BRN"
+    calendar_name = "ICE"
 
     def calculate_expiry(self, delivery_month: date) -> date:
         """
@@ -57,24 +149,16 @@ class BRNExpiryRule(ExpiryRule):
 
         The expiry date is the last business day of the second month before the delivery month.
         """
-        # Get the ICE calendar
-        ice_calendar = mcal.get_calendar("ICE")
-
         # Find the last business day of the second month before the delivery month
-        second_month_before = delivery_month - pd.DateOffset(months=2)
-        second_month_before_end = second_month_before.replace(day=1) - pd.DateOffset(
-            days=1
-        )
-        schedule = ice_calendar.schedule(
-            start_date=second_month_before.replace(day=1),
-            end_date=second_month_before_end,
-        )
-        return schedule.iloc[-1].name.date()
+        year, month = month_before(delivery_month.year, delivery_month.month, 2)
+        return LastBusinessDayTable.for_calendar(self.calendar_name).get(year, month)
 
 
 class HHExpiryRule(ExpiryRule):
     # specific to the NYMEX exchange
     asset_code = "HH"
+    # pandas_market_calendars has no "NYMEX" calendar, Henry Hub trades on the CME Globex natural gas calendar.
+    calendar_name = "CMEGlobex_NatGas"
 
     def calculate_expiry(self, delivery_month: date) -> date:
         """
@@ -82,16 +166,9 @@ class HHExpiryRule(ExpiryRule):
 
         The expiry date is the last business day of the month before the delivery month.
         """
-        # Get the NYMEX calendar
-        nymex_calendar = mcal.get_calendar("NYMEX")
-
         # Find the last business day of the month before the delivery month
-        month_before = delivery_month - pd.DateOffset(months=1)
-        month_before_end = month_before.replace(day=1) - pd.DateOffset(days=1)
-        schedule = nymex_calendar.schedule(
-            start_date=month_before.replace(day=1), end_date=month_before_end
-        )
-        return schedule.iloc[-1].name.date()
+        year, month = month_before(delivery_month.year, delivery_month.month, 1)
+        return LastBusinessDayTable.for_calendar(self.calendar_name).get(year, month)
 
 
 # Exchanges - associate an exchange code with a set of expiry rules
@@ -143,6 +220,10 @@ class ContractNotationParser:
 
     This class provides parsing to a dictionary as well as validation that the
     expected fields are present.
+
+    The pattern is compiled once, and parsed notations are kept in a bounded LRU cache
+    (PARSE_CACHE_SIZE entries), so validating a notation and then parsing it, or seeing the
+    same contract many times in a bulk upload, only runs the regular expression once.
     """
 
     NOTATION_FORMAT = (
@@ -152,25 +233,54 @@ class ContractNotationParser:
         r"Strike\s+"
         r"(?P<strike_price>\d+(?:\.\d+)?)\s+(?P<unit>[\w/]+)"
     )
+    NOTATION_PATTERN = re.compile(NOTATION_FORMAT)
+    PARSE_CACHE_SIZE = 65536
 
     @classmethod
     def validate(cls, contract_notation: str) -> bool:
-        if not re.match(cls.NOTATION_FORMAT, contract_notation):
-            raise ValueError(f"Invalid contract notation: {contract_notation}")
+        cls.parse(contract_notation)
+        return True
 
     @classmethod
     def parse(cls, contract_notation: str) -> Dict[str, str]:
         """
         Parse a contract notation string into a dictionary.
 
-        If the contract notation is invalid, a ValueError is raised (see `validate`).
+        If the contract notation is invalid, a ValueError is raised.
 
         :param contract_notation:
         :return:
         """
-        match = re.match(cls.NOTATION_FORMAT, contract_notation)
-        cls.validate(contract_notation)
-        return match.groupdict()
+        # copy, so callers can't change the cached result.
+        return dict(_parse_contract_notation(contract_notation))
+
+    @classmethod
+    def parse_many(
+        cls, contract_notations: Iterable[str]
+    ) -> Tuple[List[Optional[Dict[str, str]]], Dict[int, str]]:
+        """
+        Parse many contract notation strings, without stopping at the first invalid one.
+
+        :return: tuple of (parsed dictionaries, {index: error message}), invalid notations
+        are None in the parsed list.
+        """
+        parsed = []
+        errors = {}
+        for i, contract_notation in enumerate(contract_notations):
+            try:
+                parsed.append(cls.parse(contract_notation))
+            except ValueError as e:
+                parsed.append(None)
+                errors[i] = str(e)
+        return parsed, errors
+
+
+@lru_cache(maxsize=ContractNotationParser.PARSE_CACHE_SIZE)
+def _parse_contract_notation(contract_notation: str) -> Dict[str, str]:
+    match = ContractNotationParser.NOTATION_PATTERN.match(contract_notation)
+    if match is None:
+        raise ValueError(f"Invalid contract notation: {contract_notation}")
+    return match.groupdict()
 
 
 # Example usage
@@ -187,4 +297,6 @@ class ContractNotationParser:
 
 # Run the tests with pytest
 if __name__ == "__main__":
+    import pytest
+
     pytest.main([__file__])
@@ -0,0 +1,247 @@
+"""
+In-process read-through cache of the Black76 market data used for pricing.
+
+Pricing the same option many times a second would otherwise query the database on every request.
+Entries are keyed by `MarketData.id`, bounded in number (least recently used are evicted first) and
+expire after a time to live, and they are invalidated by every upload that replaces or updates rows.
+
+Each worker process has its own cache, and an upload is handled by one of them.  Uploads bump the
+`MarketDataVersion` in the database, and reads check it (see `get_market_data_version`): entries
+cached under an older version are stale, whichever worker the upload went to.  A worker reads the version
+at most once every settings.market_data_version_ttl seconds, so a cache hit doesn't cost a database round
+trip; for that long after another worker's upload, the entries it made stale can still be used.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, NamedTuple, Optional, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import MarketData, MarketDataVersion
+from ..database import UPSERT_INSERTS
+from ..settings import settings
+
+
+class Black76MarketData(NamedTuple):
+    """
+    The columns of a `MarketData` row that pricing needs.
+    """
+
+    exchange_code: str
+    contract: str
+    forward_price: float
+    time_to_expiration: float
+    volatility: float
+    risk_free_interest_rate: float
+
+
+# Columns of `Black76MarketData`, selected with the market data id.
+BLACK76_MARKET_DATA_COLUMNS = (
+    MarketData.id,
+    *(getattr(MarketData, field) for field in Black76MarketData._fields),
+)
+
+
+class MarketDataCache:
+    """
+    Bounded LRU cache with a time to live, of `Black76MarketData` by market data id, or of anything else
+    derived from market data (see `volatility_surface`).
+
+    Entries are stored with the `MarketDataVersion` they were read under, and are stale for readers of a
+    newer version.  A max_size of 0 disables caching.
+    """
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.stale = 0
+        # {key: (expiry time, version, value)}
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: int = 0) -> Optional[Any]:
+        """
+        :param version: the reader's `MarketDataVersion`
+        :return: the cached value, or None if it isn't cached, has expired or was cached under an older version.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            elif entry is not None and entry[1] < version:
+                del self._entries[key]
+                self.stale += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, value: Any, version: int = 0):
+        """
+        :param version: the `MarketDataVersion` the value was read under
+        """
+        with self._lock:
+            if self.max_size <= 0:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Iterable[Hashable]):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Remove all entries and reset the counters.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = self.stale = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "stale": self.stale,
+            }
+
+
+market_data_cache = MarketDataCache(
+    settings.market_data_cache_size, settings.market_data_cache_ttl
+)
+
+# session.info key the session's market data version is kept under.
+MARKET_DATA_VERSION_KEY = "market_data_version"
+
+# (time.monotonic() when it was read, version) of the last `MarketDataVersion` this worker read.
+_last_read_version: Optional[Tuple[float, int]] = None
+
+
+async def get_market_data_version(session: AsyncSession) -> int:
+    """
+    Get the `MarketDataVersion`, once per session: a request sees the market data as of its first read,
+    which is enough for the entries it caches, as they are read after it.
+
+    The version last read by this worker is reused for settings.market_data_version_ttl seconds, before
+    it is read from the database again.
+
+    :return: the version, 0 if no market data has been uploaded since the table was created.
+    """
+    global _last_read_version
+    version = session.info.get(MARKET_DATA_VERSION_KEY)
+    if version is None:
+        now = time.monotonic()
+        if (
+            _last_read_version is not None
+            and now - _last_read_version[0] < settings.market_data_version_ttl
+        ):
+            version = _last_read_version[1]
+        else:
+            version = (
+                await session.exec(
+                    select(MarketDataVersion.version).where(MarketDataVersion.id == 1)
+                )
+            ).first() or 0
+            _last_read_version = (now, version)
+        session.info[MARKET_DATA_VERSION_KEY] = version
+    return version
+
+
+def forget_market_data_version():
+    """
+    Make the next `get_market_data_version` read the version from the database.
+    """
+    global _last_read_version
+    _last_read_version = None
+
+
+async def bump_market_data_version(session: AsyncSession):
+    """
+    Increment the `MarketDataVersion`, in the session's transaction: call this before committing an upload,
+    so every worker's cached market data goes stale (see `MarketDataCache.get`), this one's straight away
+    and the others' within settings.market_data_version_ttl seconds.
+    """
+    insert = UPSERT_INSERTS[session.get_bind().dialect.name]
+    statement = insert(MarketDataVersion).values(id=1, version=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=["id"], set_={"version": MarketDataVersion.version + 1}
+    )
+    await session.execute(statement)
+    session.info.pop(MARKET_DATA_VERSION_KEY, None)
+    forget_market_data_version()
+
+
+async def get_black76_market_data_cached(
+    session: AsyncSession, option_ids: Iterable[int]
+) -> Dict[int, Black76MarketData]:
+    """
+    Read through `market_data_cache`: market data that isn't cached is fetched with a single query
+    and cached.
+
+    :return: {option_id: Black76MarketData}, ids that do not exist are left out.
+    """
+    version = await get_market_data_version(session)
+    found = {}
+    missing = set()
+    for option_id in set(option_ids):
+        market_data = market_data_cache.get(option_id, version)
+        if market_data is None:
+            missing.add(option_id)
+        else:
+            found[option_id] = market_data
+
+    if missing:
+        rows = (
+            await session.exec(
+                select(*BLACK76_MARKET_DATA_COLUMNS).where(MarketData.id.in_(missing))
+            )
+        ).all()
+        for option_id, *values in rows:
+            market_data = Black76MarketData(*values)
+            market_data_cache.put(option_id, market_data, version)
+            found[option_id] = market_data
+    return found
+
+
+async def prewarm_market_data_cache(session: AsyncSession) -> int:
+    """
+    Fill `market_data_cache` with the most recently uploaded market data, as much as it holds,
+    so a worker's first requests don't all go to the database.
+
+    :return: number of entries cached.
+    """
+    if market_data_cache.max_size <= 0:
+        return 0
+    version = await get_market_data_version(session)
+    rows = (
+        await session.exec(
+            select(*BLACK76_MARKET_DATA_COLUMNS)
+            .order_by(MarketData.upload_timestamp.desc(), MarketData.id.desc())
+            .limit(market_data_cache.max_size)
+        )
+    ).all()
+    # oldest first, so the most recent are the last to be evicted.
+    for option_id, *values in reversed(rows):
+        market_data_cache.put(option_id, Black76MarketData(*values), version)
+    return len(rows)
@@ -0,0 +1,144 @@
+"""
+Columnar export of market data as an Arrow IPC stream or a Parquet file.
+
+The Black76 fields are exported from their columns, and the contract notation is decoded once here,
+into typed columns, so consumers can load the table straight into pandas or NumPy without parsing
+every row again.
+Like the text exports (see `export.py`), batches of rows are converted and written out as they
+are read from the database.
+
+pyarrow is imported by the functions that use it, so it's only loaded once an export is asked for.
+"""
+import io
+from functools import lru_cache
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .business_rules import ContractNotationParser
+from .expiries import contract_delivery_month
+from .export import export_row_batches
+from .filters import MarketDataFilter
+from .models import BLACK76_FIELDS
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# Fields parsed from the contract notation, besides the delivery month.
+CONTRACT_FIELDS = ("asset", "option_type", "unit")
+
+
+@lru_cache(maxsize=None)
+def arrow_schema() -> "pa.Schema":
+    """
+    :return: the schema of the columnar exports.
+    """
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("exchange_code", pa.string()),
+            ("contract", pa.string()),
+            ("asset", pa.string()),
+            ("delivery_month", pa.date32()),
+            ("option_type", pa.string()),
+            ("unit", pa.string()),
+            *((field, pa.float64()) for field in BLACK76_FIELDS),
+            ("upload_timestamp", pa.timestamp("us")),
+        ]
+    )
+
+
+async def market_data_record_batches(
+    session: AsyncSession,
+    filters: Optional[MarketDataFilter] = None,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator["pa.RecordBatch"]:
+    """
+    Read market data as Arrow record batches with `arrow_schema`.
+
+    Contract fields are null for rows whose contract notation can't be parsed.
+
+    :param batch_size: see `export.export_row_batches`
+    """
+    import pyarrow as pa
+
+    async for rows in export_row_batches(session, filters, batch_size):
+        parsed, _errors = ContractNotationParser.parse_many(
+            row.contract for row in rows
+        )
+        columns = {
+            "id": [row.id for row in rows],
+            "exchange_code": [row.exchange_code for row in rows],
+            "contract": [row.contract for row in rows],
+            "delivery_month": [
+                contract_delivery_month(fields) if fields else None for fields in parsed
+            ],
+            "upload_timestamp": [row.upload_timestamp for row in rows],
+        }
+        for field in CONTRACT_FIELDS:
+            columns[field] = [fields and fields[field] for fields in parsed]
+        for field in BLACK76_FIELDS:
+            columns[field] = [getattr(row, field) for row in rows]
+        yield pa.RecordBatch.from_pydict(columns, schema=arrow_schema())
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands back what was written since it was last drained.
+
+    Tracks its own position, as writers use it for offsets in the file.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def export_market_data_columnar(
+    session: AsyncSession,
+    filters: Optional[MarketDataFilter] = None,
+    parquet_format: bool = False,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Export market data as an Arrow IPC stream, or as a Parquet file with a row group per batch.
+
+    :param batch_size: see `export.export_row_batches`
+    :return: async iterator of byte chunks, one per batch of rows, then the end of the stream or file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = _ChunkSink()
+    if parquet_format:
+        writer = pq.ParquetWriter(sink, arrow_schema())
+    else:
+        writer = pa.ipc.new_stream(sink, arrow_schema())
+
+    with writer:
+        async for batch in market_data_record_batches(session, filters, batch_size):
+            if parquet_format:
+                writer.write_batch(batch, row_group_size=batch.num_rows)
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,230 @@
+"""
+Materialized expiry date index.
+
+Expiry dates only depend on the exchange, asset and delivery month, so they are calculated once from
+the expiry rules in `business_rules.py` and stored in the `Expiry` table.  Lookups are then plain
+queries, and survive restarts without touching the exchange calendars again.
+
+The index is built for the configured horizon at startup (see `build_expiry_index`) and filled in on
+demand for any other delivery months that are asked for (see `ensure_expiry_index`), at most
+settings.expiries_max_months per request (see `get_expiries`).
+"""
+from datetime import date
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from .business_rules import (
+    ContractNotationParser,
+    Exchange,
+    ExpiryRule,
+    LastBusinessDayTable,
+)
+from .models import Expiry
+from ..database import UPSERT_INSERTS
+from ..settings import settings
+
+# Month abbreviations as used in contract notation, in calendar order.
+MONTH_ABBREVIATIONS = "Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec".split()
+
+# Day count convention used to turn an expiry date into a time to expiration in years (ACT/365).
+DAYS_PER_YEAR = 365.0
+
+
+def delivery_months(start: date, end: date) -> List[date]:
+    """
+    >>> delivery_months(date(2023, 11, 15), date(2024, 1, 1))
+    [datetime.date(2023, 11, 1), datetime.date(2023, 12, 1), datetime.date(2024, 1, 1)]
+
+    :return: the first day of each month from start to end, inclusive.
+    """
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(date(year, month, 1))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def get_expiry_rules(
+    exchange_code: Optional[str] = None, asset: Optional[str] = None
+) -> List[Tuple[str, str, ExpiryRule]]:
+    """
+    Get the expiry rules for an exchange and asset, either may be None to mean all of them.
+
+    :return: list of (exchange_code, asset, expiry rule)
+    :raises: ValueError if the exchange or asset code is not known.
+    """
+    if exchange_code is not None and asset is not None:
+        return [
+            (exchange_code, asset, ExpiryRule.get_expiry_rule(exchange_code, asset))
+        ]
+
+    if exchange_code is not None:
+        exchanges = [Exchange.get_exchange(exchange_code)]
+    else:
+        exchanges = [exchange() for exchange in Exchange.__subclasses__()]
+
+    rules = [
+        (exchange.name, asset_code, exchange.get_expiry_rule(asset_code))
+        for exchange in exchanges
+        for asset_code in exchange.expiry_rules
+        if asset is None or asset_code == asset
+    ]
+    if asset is not None and not rules:
+        raise ValueError(f"No expiry rule found for asset code: {asset}")
+    return rules
+
+
+def ensure_expiry_index(
+    session: Session,
+    start: date,
+    end: date,
+    exchange_code: Optional[str] = None,
+    asset: Optional[str] = None,
+):
+    """
+    Calculate and store any expiry dates missing from the index for delivery months start to end.
+
+    :raises: ValueError if the exchange or asset code is not known.
+    """
+    months = delivery_months(start, end)
+    if not months:
+        return
+
+    missing = []
+    for rule_exchange_code, rule_asset, rule in get_expiry_rules(exchange_code, asset):
+        indexed = set(
+            session.exec(
+                select(Expiry.delivery_month).where(
+                    (Expiry.exchange_code == rule_exchange_code)
+                    & (Expiry.asset == rule_asset)
+                    & (Expiry.delivery_month >= months[0])
+                    & (Expiry.delivery_month <= months[-1])
+                )
+            ).all()
+        )
+        for delivery_month in months:
+            if delivery_month not in indexed:
+                missing.append(
+                    {
+                        "exchange_code": rule_exchange_code,
+                        "asset": rule_asset,
+                        "delivery_month": delivery_month,
+                        "expiry_date": rule.calculate_expiry(delivery_month),
+                    }
+                )
+    if missing:
+        # one executemany rather than an ORM object per row, the whole horizon is added at first startup.
+        # Rows another request added since they were looked up are left as they are: expiry dates don't change.
+        insert = UPSERT_INSERTS[session.get_bind().dialect.name]
+        session.execute(
+            insert(Expiry).on_conflict_do_nothing(
+                index_elements=["exchange_code", "asset", "delivery_month"]
+            ),
+            missing,
+        )
+        session.commit()
+
+
+def build_expiry_index(session: Session):
+    """
+    Fill in the expiry index for every exchange and asset over the configured horizon,
+    settings.expiry_calendar_start_year to settings.expiry_calendar_end_year.
+    """
+    ensure_expiry_index(
+        session,
+        date(settings.expiry_calendar_start_year, 1, 1),
+        date(settings.expiry_calendar_end_year, 12, 1),
+    )
+
+
+def warm_expiry_calendars():
+    """
+    Load the exchange calendars of every expiry rule over the configured horizon, see
+    `LastBusinessDayTable`, so the first expiry calculations don't have to.
+    """
+    for _exchange_code, _asset, rule in get_expiry_rules():
+        LastBusinessDayTable.for_calendar(rule.calendar_name).get(
+            settings.expiry_calendar_start_year, 1
+        )
+
+
+def get_expiries(
+    session: Session,
+    start: date,
+    end: date,
+    exchange_code: Optional[str] = None,
+    asset: Optional[str] = None,
+) -> List[Expiry]:
+    """
+    Get the expiries for delivery months start to end from the index, filling in any that are missing.
+
+    :return: list of Expiry ordered by exchange code, asset and delivery month.
+    :raises: ValueError if the exchange or asset code is not known, or start to end is more than
+    settings.expiries_max_months delivery months.
+    """
+    months = len(delivery_months(start, end))
+    if months > settings.expiries_max_months:
+        raise ValueError(
+            f"{months} delivery months requested, at most {settings.expiries_max_months} are allowed."
+        )
+    ensure_expiry_index(session, start, end, exchange_code, asset)
+
+    query = select(Expiry).where(
+        (Expiry.delivery_month >= date(start.year, start.month, 1))
+        & (Expiry.delivery_month <= end)
+    )
+    if exchange_code is not None:
+        query = query.where(Expiry.exchange_code == exchange_code)
+    if asset is not None:
+        query = query.where(Expiry.asset == asset)
+    query = query.order_by(Expiry.exchange_code, Expiry.asset, Expiry.delivery_month)
+    return [*session.exec(query).all()]
+
+
+def contract_delivery_month(parsed: Dict[str, str]) -> date:
+    """
+    >>> contract_delivery_month(ContractNotationParser.parse("BRN Mar24 Call Strike 100 USD/BBL"))
+    datetime.date(2024, 3, 1)
+
+    :param parsed: contract notation fields, from `ContractNotationParser.parse`
+    :return: the first day of the delivery month of the contract.
+    """
+    return date(
+        2000 + int(parsed["expiration_year"]),
+        MONTH_ABBREVIATIONS.index(parsed["expiration_month"]) + 1,
+        1,
+    )
+
+
+@lru_cache(maxsize=4096)
+def contract_expiry_date(exchange_code: str, contract: str) -> date:
+    """
+    Calculate the expiry date of a contract from its notation and the exchange expiry rules.
+
+    >>> contract_expiry_date("ICE", "BRN Mar24 Call Strike 100 USD/BBL")
+    datetime.date(2024, 1, 31)
+
+    :raises: ValueError if the contract notation is invalid, or the exchange or asset code is not known.
+    """
+    parsed = ContractNotationParser.parse(contract)
+    rule = ExpiryRule.get_expiry_rule(exchange_code, parsed["asset"])
+    return rule.calculate_expiry(contract_delivery_month(parsed))
+
+
+@lru_cache(maxsize=65536)
+def time_to_expiration(
+    exchange_code: str, contract: str, valuation_date: date
+) -> float:
+    """
+    Time to expiration of a contract in years (ACT/365), as seen on the valuation date.
+
+    Results are cached on (exchange code, contract, valuation date), so revaluing a whole book
+    on one date calculates each distinct expiry once.
+
+    :raises: ValueError if the contract notation is invalid, or the exchange or asset code is not known.
+    """
+    expiry_date = contract_expiry_date(exchange_code, contract)
+    return (expiry_date - valuation_date).days / DAYS_PER_YEAR
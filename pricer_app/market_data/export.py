@@ -0,0 +1,105 @@
+"""
+Export of market data as NDJSON or CSV.
+
+Rows are read through a server-side cursor (`yield_per`) and written out one batch at a time,
+so exporting the whole table only ever holds one batch in memory.
+"""
+import csv
+import io
+import json
+from typing import Any, AsyncIterator, Dict, Optional, Sequence
+
+from sqlalchemy import Row
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .filters import MarketDataFilter
+from .models import BLACK76_FIELDS, MarketData
+from ..settings import settings
+
+# Columns read for export, see `export_row_batches`.
+EXPORT_COLUMNS = (
+    "id",
+    "exchange_code",
+    "contract",
+    "upload_timestamp",
+    *BLACK76_FIELDS,
+)
+
+# Fields of the NDJSON and CSV exports, the same as GET /market_data returns.
+TEXT_EXPORT_FIELDS = (
+    "id",
+    "exchange_code",
+    "contract",
+    "market_data",
+    "upload_timestamp",
+)
+
+
+async def export_row_batches(
+    session: AsyncSession,
+    filters: Optional[MarketDataFilter] = None,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[Sequence[Row]]:
+    """
+    Read market data ordered by id through a server-side cursor, as rows of `EXPORT_COLUMNS`.
+
+    :param batch_size: rows fetched per round trip, defaults to settings.market_data_export_batch_size
+    :return: async iterator of batches of rows
+    """
+    batch_size = batch_size or settings.market_data_export_batch_size
+    query = select(*(getattr(MarketData, column) for column in EXPORT_COLUMNS))
+    if filters is not None:
+        query = filters.apply(query)
+    # plain column rows rather than MarketData instances, the ORM doesn't need to track them.
+    result = await session.stream(
+        query.order_by(MarketData.id).execution_options(yield_per=batch_size)
+    )
+    async for rows in result.partitions():
+        yield rows
+
+
+async def export_market_data(
+    session: AsyncSession,
+    filters: Optional[MarketDataFilter] = None,
+    csv_format: bool = False,
+    batch_size: Optional[int] = None,
+) -> AsyncIterator[str]:
+    """
+    Export market data ordered by id, as NDJSON or CSV with a header line.
+
+    market_data is written as a JSON string in both formats, as GET /market_data returns it.
+
+    :param batch_size: see `export_row_batches`
+    :return: async iterator of text chunks, one per batch of rows (after the CSV header line)
+    """
+    if csv_format:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(TEXT_EXPORT_FIELDS)
+        yield buffer.getvalue()
+
+    async for rows in export_row_batches(session, filters, batch_size):
+        records = [text_export_record(row) for row in rows]
+        if csv_format:
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, TEXT_EXPORT_FIELDS, lineterminator="\n")
+            writer.writerows(records)
+            yield buffer.getvalue()
+        else:
+            yield "".join(json.dumps(record) + "\n" for record in records)
+
+
+def text_export_record(row: Row) -> Dict[str, Any]:
+    """
+    :return: dictionary of `TEXT_EXPORT_FIELDS` for a row from `export_row_batches`.
+    """
+    return {
+        "id": row.id,
+        "exchange_code": row.exchange_code,
+        "contract": row.contract,
+        "market_data": json.dumps(
+            {field: getattr(row, field) for field in BLACK76_FIELDS}
+        ),
+        "upload_timestamp": row.upload_timestamp.isoformat(),
+    }
@@ -0,0 +1,51 @@
+"""
+Filtering of market data listings.
+"""
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, Field
+from sqlalchemy import Select
+
+from .models import MarketData
+
+
+class MarketDataFilter(BaseModel):
+    """
+    Filters for listing market data, used as query parameters.
+
+    Asset and expiry are matched against the contract notation, e.g. "BRN Jun21 Call Strike 50.0 USD"
+    has asset "BRN", expiration_month "Jun" and expiration_year "21".
+    """
+
+    exchange_code: Optional[str] = None
+    asset: Optional[str] = Field(None, pattern=r"^\w+$")
+    expiration_month: Optional[str] = Field(
+        None, pattern=r"^(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)$"
+    )
+    expiration_year: Optional[str] = Field(None, pattern=r"^\d{2}$")
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
+
+    def apply(self, query: Select) -> Select:
+        """
+        :return: the query with a where clause for each filter that is set.
+        """
+        if self.exchange_code is not None:
+            query = query.where(MarketData.exchange_code == self.exchange_code)
+        if self.asset is not None:
+            # contracts start with "<asset> ", as a range this can use the contract indexes;
+            # "!" is the character after " ".
+            query = query.where(
+                (MarketData.contract >= f"{self.asset} ")
+                & (MarketData.contract < f"{self.asset}!")
+            )
+        if self.expiration_month is not None or self.expiration_year is not None:
+            month = self.expiration_month or "___"
+            year = self.expiration_year or "__"
+            query = query.where(MarketData.contract.like(f"% {month}{year} %"))
+        if self.uploaded_after is not None:
+            query = query.where(MarketData.upload_timestamp >= self.uploaded_after)
+        if self.uploaded_before is not None:
+            query = query.where(MarketData.upload_timestamp < self.uploaded_before)
+        return query
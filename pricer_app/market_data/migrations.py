@@ -0,0 +1,63 @@
+"""
+Migrations of existing databases to the current market data table layout.
+
+`create_db_and_tables` only creates what is missing, so tables whose columns changed are upgraded
+here first, at startup.
+"""
+from sqlalchemy import Engine, column, func, inspect, select, table, text
+
+from .models import BLACK76_FIELDS, MarketData
+
+# Table the JSON layout is moved to while its rows are copied over.
+JSON_MARKET_DATA_TABLE = "marketdata_json"
+
+
+def migrate_market_data_json(engine: Engine) -> bool:
+    """
+    Move market data stored as a JSON string in a market_data column into the typed Black76 columns.
+
+    SQLite can't change column types in place, so the old table is renamed, the table is created
+    again with the current layout, rows are copied across with their ids, and the old table dropped,
+    all in one transaction.
+
+    :return: True if the table was migrated, False if there was nothing to do.
+    """
+    # only SQLite databases ever had the JSON layout.
+    if engine.dialect.name != "sqlite":
+        return False
+    inspector = inspect(engine)
+    table_name = MarketData.__tablename__
+    if not inspector.has_table(table_name):
+        return False
+    if "market_data" not in {c["name"] for c in inspector.get_columns(table_name)}:
+        return False
+
+    old_indexes = [index["name"] for index in inspector.get_indexes(table_name)]
+    with engine.begin() as connection:
+        connection.execute(
+            text(f"ALTER TABLE {table_name} RENAME TO {JSON_MARKET_DATA_TABLE}")
+        )
+        # index names stay with the renamed table, they're needed for the new one.
+        for name in old_indexes:
+            connection.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        MarketData.__table__.create(connection)
+
+        copied_columns = ("id", "contract", "exchange_code", "upload_timestamp")
+        old = table(
+            JSON_MARKET_DATA_TABLE,
+            *(column(name) for name in (*copied_columns, "market_data")),
+        )
+        connection.execute(
+            MarketData.__table__.insert().from_select(
+                [*copied_columns, *BLACK76_FIELDS],
+                select(
+                    *(old.c[name] for name in copied_columns),
+                    *(
+                        func.json_extract(old.c.market_data, f"$.{field}")
+                        for field in BLACK76_FIELDS
+                    ),
+                ),
+            )
+        )
+        connection.execute(text(f"DROP TABLE {JSON_MARKET_DATA_TABLE}"))
+    return True
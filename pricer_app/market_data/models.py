@@ -1,8 +1,19 @@
+import json
 from typing import Dict
 
-from sqlalchemy import UniqueConstraint
+from pydantic import ConfigDict
+from sqlalchemy import String, UniqueConstraint
 from sqlmodel import SQLModel, Field
-from datetime import datetime
+from datetime import date, datetime
+
+# Black76 market data fields, stored in their own columns, in the order they are serialized.
+BLACK76_FIELDS = (
+    "forward_price",
+    "strike_price",
+    "time_to_expiration",
+    "volatility",
+    "risk_free_interest_rate",
+)
 
 
 class MarketData(SQLModel, table=True):
@@ -11,6 +22,7 @@ class MarketData(SQLModel, table=True):
     """
 
     __table_args__ = (
+        # also serves filtering on exchange_code, and exchange_code with an asset (contract prefix).
         UniqueConstraint(
             "exchange_code", "contract", name="unique_exchange_code_contract"
         ),
@@ -19,8 +31,77 @@ class MarketData(SQLModel, table=True):
     # requirement: Upload and store market data in the database
     id: int = Field(default=None, primary_key=True)
     # contract is stored using contract notation.
+    # indexed so filtering by asset, a contract prefix, is a range scan (see `MarketDataFilter`);
+    # PostgreSQL compares it byte by byte ("C" collation) as SQLite does, so the range holds there too.
+    contract: str = Field(
+        index=True, sa_type=String().with_variant(String(collation="C"), "postgresql")
+    )
+    exchange_code: str
+    upload_timestamp: datetime = Field(
+        default_factory=lambda: datetime.utcnow(), index=True
+    )
+
+    # Black76 market data, see `BLACK76_FIELDS`.
+    forward_price: float = Field(index=True)
+    strike_price: float
+    time_to_expiration: float
+    volatility: float = Field(index=True)
+    risk_free_interest_rate: float
+
+    @property
+    def market_data(self) -> str:
+        """
+        The market data as a JSON string, as the API has always returned it.
+        """
+        return json.dumps({field: getattr(self, field) for field in BLACK76_FIELDS})
+
+
+class MarketDataRead(SQLModel):
+    """
+    Market data as returned by the API, with market_data as a JSON string.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
     contract: str
-    # market_data is stored as a JSON string.
     market_data: str
     exchange_code: str
-    upload_timestamp: datetime = Field(default_factory=lambda: datetime.utcnow())
+    upload_timestamp: datetime
+
+
+class Expiry(SQLModel, table=True):
+    """
+    Materialized expiry date of an asset's contracts on an exchange, one row per delivery month.
+
+    Rows are calculated from the exchange expiry rules (see `business_rules.ExpiryRule`) and kept, so
+    expiry lookups don't need the exchange calendars, see `expiries.py`.
+    """
+
+    __table_args__ = (
+        UniqueConstraint(
+            "exchange_code",
+            "asset",
+            "delivery_month",
+            name="unique_exchange_code_asset_delivery_month",
+        ),
+    )
+
+    id: int = Field(default=None, primary_key=True)
+    exchange_code: str
+    asset: str
+    # delivery_month is stored as the first day of the month.
+    delivery_month: date
+    expiry_date: date
+
+
+class MarketDataVersion(SQLModel, table=True):
+    """
+    Counter of market data writes, a single row bumped in the same transaction as every upload.
+
+    Each worker process caches market data of its own, and checks the version on read to tell whether
+    an upload to another worker has made its entries stale, see `cache.get_market_data_version`.
+    """
+
+    id: int = Field(default=1, primary_key=True)
+    version: int = 0
@@ -0,0 +1,109 @@
+"""
+PostgreSQL specific storage of market data.
+
+Bulk uploads are copied into a temporary staging table with COPY, the fastest way to load rows into
+PostgreSQL, and upserted from there with a single INSERT ... ON CONFLICT statement.
+"""
+from datetime import datetime
+from typing import Any, Dict, List, Tuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    literal_column,
+    select,
+)
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import BLACK76_FIELDS, MarketData
+from .schemas import MarketDataCreate
+
+STAGING_TABLE = Table(
+    "marketdata_staging",
+    MetaData(),
+    Column("position", Integer),
+    Column("exchange_code", String),
+    Column("contract", String),
+    Column("upload_timestamp", DateTime),
+    *(Column(field, Float) for field in BLACK76_FIELDS),
+    prefixes=["TEMPORARY"],
+)
+
+
+async def copy_upsert_market_data(
+    session: AsyncSession, items: List[Tuple[int, MarketDataCreate]]
+) -> Dict[int, Dict[str, Any]]:
+    """
+    Insert or update validated market data, with COPY into a staging table and one upsert from it.
+
+    Behaves as `bulk_upload.upsert_market_data`: existing rows keep their id, the last of several rows for
+    the same contract wins, and the caller owns the transaction.
+
+    :param items: list of (index, MarketDataCreate), see `bulk_upload.validate_market_data_rows`
+    :return: {index: {"status": "created" | "updated", "id": int}}
+    """
+    if not items:
+        return {}
+
+    connection = await session.connection()
+    await connection.run_sync(STAGING_TABLE.create)
+
+    upload_timestamp = datetime.utcnow()
+    copy_columns = ", ".join(column.name for column in STAGING_TABLE.columns)
+    driver_connection = (await connection.get_raw_connection()).driver_connection
+    async with driver_connection.cursor() as cursor:
+        async with cursor.copy(
+            f"COPY {STAGING_TABLE.name} ({copy_columns}) FROM STDIN"
+        ) as copy:
+            for position, (_i, item) in enumerate(items):
+                fields = item.market_data_fields()
+                await copy.write_row(
+                    (
+                        position,
+                        item.exchange_code,
+                        item.contract,
+                        upload_timestamp,
+                        *(fields[field] for field in BLACK76_FIELDS),
+                    )
+                )
+
+    # One row per contract, the last one: an upsert can't touch the same row twice in one statement.
+    staged = STAGING_TABLE.c
+    columns = ["exchange_code", "contract", "upload_timestamp", *BLACK76_FIELDS]
+    latest = (
+        select(*(staged[column] for column in columns))
+        .distinct(staged.exchange_code, staged.contract)
+        .order_by(staged.exchange_code, staged.contract, staged.position.desc())
+    )
+    statement = postgresql_insert(MarketData).from_select(columns, latest)
+    statement = statement.on_conflict_do_update(
+        index_elements=["exchange_code", "contract"],
+        set_={
+            field: statement.excluded[field]
+            for field in ("upload_timestamp", *BLACK76_FIELDS)
+        },
+    ).returning(
+        MarketData.id,
+        MarketData.exchange_code,
+        MarketData.contract,
+        # xmax is only set on rows the statement updated.
+        literal_column("xmax = 0"),
+    )
+
+    ids_by_key = {}
+    for id_, exchange_code, contract, created in await connection.execute(statement):
+        ids_by_key[(exchange_code, contract)] = {
+            "status": "created" if created else "updated",
+            "id": id_,
+        }
+    await connection.run_sync(STAGING_TABLE.drop)
+
+    return {
+        i: dict(ids_by_key[(item.exchange_code, item.contract)]) for i, item in items
+    }
@@ -1,24 +1,78 @@
+import json
 import os
+from datetime import date
+from typing import AsyncIterator, List, Literal, Optional, TypeVar
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select, delete
-from .models import MarketData
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlmodel import select, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .bulk_upload import (
+    ingest_market_data,
+    iter_lines,
+    save_market_data,
+    validate_market_data_rows,
+)
+from .cache import bump_market_data_version, market_data_cache
+from .columnar_export import export_market_data_columnar
+from .expiries import get_expiries
+from .export import export_market_data
+from .filters import MarketDataFilter
+from .models import MarketData, MarketDataRead
 from .schemas import MarketDataCreate
+from .volatility_surface import (
+    VolatilitySurface,
+    get_volatility_surface,
+    invalidate_volatility_surfaces,
+)
 from ..database import get_session
+from ..settings import settings
 
 router = APIRouter()
 
+T = TypeVar("T")
+
+
+async def closing_session(
+    session: AsyncSession, content: AsyncIterator[T]
+) -> AsyncIterator[T]:
+    """
+    Stream content read through session, then close the session.
+
+    The request's session is closed before a streaming response is sent, using it again while streaming
+    checks out a new connection, which is given back here.
+    """
+    try:
+        async for chunk in content:
+            yield chunk
+    finally:
+        await session.close()
+
+
+class RequestStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose content is generated while the request body is still being read.
+
+    StreamingResponse watches for the client disconnecting by receiving from the request, which
+    would take the body chunks away from the content generator, so this leaves receiving to it.
+    """
 
-@router.post("/market_data")
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+@router.post("/market_data", response_model=MarketDataRead)
 async def upload_market_data(
-    option: MarketDataCreate, session: Session = Depends(get_session)
+    option: MarketDataCreate, session: AsyncSession = Depends(get_session)
 ):
     MarketDataCreate.model_validate(option.dict())
-    MarketData.validate(option.dict())
     market_data = MarketData(
-        market_data=option.market_data,
         contract=option.contract,
         exchange_code=option.exchange_code,
+        **option.market_data_fields(),
     )
 
     # First, remove existing data:
@@ -26,23 +80,289 @@ async def upload_market_data(
         (MarketData.exchange_code == market_data.exchange_code)
         & (MarketData.contract == market_data.contract)
     )
-    session.exec(delete_query)
+    deleted_ids = (await session.exec(delete_query.returning(MarketData.id))).all()
 
     session.add(market_data)
-    session.commit()
-    session.refresh(market_data)
-    return market_data
+    await bump_market_data_version(session)
+    await session.commit()
+    await session.refresh(market_data)
+    # SQLite can give the new row an id that was just deleted, so drop both.
+    market_data_cache.invalidate([*deleted_ids, market_data.id])
+    invalidate_volatility_surfaces([(market_data.exchange_code, market_data.contract)])
+    return MarketDataRead.model_validate(market_data)
+
+
+@router.post(
+    "/market_data/bulk",
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {
+                    "schema": {
+                        "type": "array",
+                        "items": MarketDataCreate.model_json_schema(),
+                    }
+                },
+                "application/x-ndjson": {"schema": {"type": "string"}},
+            },
+            "required": True,
+        }
+    },
+)
+async def upload_market_data_bulk(
+    request: Request, session: AsyncSession = Depends(get_session)
+):
+    """
+    Upload many market data rows at once, as a JSON list or as NDJSON (one JSON object per line,
+    with Content-Type: application/x-ndjson).
+
+    Every row is validated (see `MarketDataCreate`), then the valid rows are upserted in chunks
+    in a single transaction (see `bulk_upload.save_market_data`); an existing row for the same
+    exchange code and contract is updated and keeps its id.
+
+    Returns a dictionary with a "results" list in request order, each entry is either
+    {"status": "created" | "updated", "id": int} or {"status": "error", "error": str}.
 
+    Raises a 400 error if the body is not a JSON list or NDJSON.
+    """
+    body = await request.body()
+    try:
+        if request.headers.get("content-type", "").startswith("application/x-ndjson"):
+            rows = [line for line in body.splitlines() if line.strip()]
+        else:
+            rows = json.loads(body)
+            if not isinstance(rows, list):
+                raise ValueError("Expected a JSON list of market data.")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    valid, errors = validate_market_data_rows(rows)
+    results = await save_market_data(session, valid)
+    await session.commit()
+    market_data_cache.invalidate(result["id"] for result in results.values())
+    invalidate_volatility_surfaces(
+        (item.exchange_code, item.contract) for _i, item in valid
+    )
+
+    for i, error in errors.items():
+        results[i] = {"status": "error", "error": error}
+    return {"results": [results[i] for i in range(len(rows))]}
+
+
+@router.post(
+    "/market_data/stream",
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/x-ndjson": {"schema": {"type": "string"}},
+                "text/csv": {"schema": {"type": "string"}},
+            },
+            "required": True,
+        }
+    },
+)
+async def upload_market_data_stream(
+    request: Request, session: AsyncSession = Depends(get_session)
+):
+    """
+    Stream a very large market data file in, as NDJSON (Content-Type: application/x-ndjson) or
+    CSV (Content-Type: text/csv, with a header line).
+
+    CSV files have exchange_code, contract and pricing_model columns, and either a JSON market_data
+    column or one column per Black76 field. Quoted values can't contain newlines.
+
+    The body is read incrementally and validated and upserted in batches (see
+    `bulk_upload.ingest_market_data`), so memory use doesn't depend on the size of the file.
+    Progress is streamed back as NDJSON, one line per batch with its errors, then a summary line.
+    """
+    csv_format = request.headers.get("content-type", "").startswith("text/csv")
+    progress = ingest_market_data(session, iter_lines(request.stream()), csv_format)
+
+    async def progress_lines():
+        async for update in progress:
+            yield json.dumps(update) + "\n"
+
+    return RequestStreamingResponse(
+        closing_session(session, progress_lines()), media_type="application/x-ndjson"
+    )
+
+
+@router.get("/market_data", response_model=List[MarketDataRead])
+async def get_all_market_data(
+    response: Response,
+    limit: int = Query(
+        None,
+        ge=1,
+        le=settings.market_data_max_page_size,
+        description=f"Rows per page, defaults to {settings.market_data_page_size}",
+    ),
+    after_id: Optional[int] = Query(
+        None, description="Return rows after this id, from the X-Next-Cursor header"
+    ),
+    filters: MarketDataFilter = Depends(),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    List market data one page at a time, ordered by id, optionally filtered (see `MarketDataFilter`).
 
-@router.get("/market_data")
-async def get_all_market_data(session: Session = Depends(get_session)):
-    market_data = [*session.exec(select(MarketData)).all()]
-    return market_data
+    Pagination is keyset based: if there are more rows, the X-Next-Cursor response header holds the id
+    to pass as after_id for the next page.
+    """
+    limit = limit or settings.market_data_page_size
+    query = filters.apply(select(MarketData))
+    if after_id is not None:
+        query = query.where(MarketData.id > after_id)
+    # one extra row tells whether there is a next page.
+    market_data = [
+        *(await session.exec(query.order_by(MarketData.id).limit(limit + 1))).all()
+    ]
 
+    if len(market_data) > limit:
+        market_data = market_data[:limit]
+        response.headers["X-Next-Cursor"] = str(market_data[-1].id)
+    return [MarketDataRead.model_validate(row) for row in market_data]
 
-@router.get("/market_data/{option_id}")
-async def get_market_data(option_id: int, session: Session = Depends(get_session)):
-    market_data = session.get(MarketData, option_id)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+@router.get(
+    "/market_data/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {
+                media_type: {"schema": {"type": "string"}}
+                for media_type in EXPORT_MEDIA_TYPES.values()
+            }
+        }
+    },
+)
+async def export_all_market_data(
+    format: Literal["ndjson", "csv", "arrow", "parquet"] = "ndjson",
+    filters: MarketDataFilter = Depends(),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Export all market data, optionally filtered (see `MarketDataFilter`), as NDJSON, CSV,
+    an Arrow IPC stream or a Parquet file.
+
+    Rows are streamed out in batches as they are read from the database (see `export.export_market_data`),
+    so the first rows are sent straight away and the table is never loaded all at once.
+
+    The Arrow and Parquet exports have the Black76 fields and the contract fields in typed columns
+    instead of the market_data JSON (see `columnar_export.arrow_schema`).
+    """
+    if format in ("arrow", "parquet"):
+        content = export_market_data_columnar(
+            session, filters, parquet_format=format == "parquet"
+        )
+    else:
+        content = export_market_data(session, filters, csv_format=format == "csv")
+    return StreamingResponse(
+        closing_session(session, content), media_type=EXPORT_MEDIA_TYPES[format]
+    )
+
+
+@router.get("/market_data/cache")
+async def get_market_data_cache_stats():
+    """
+    Counters of this worker's market data cache, for monitoring (see `cache.MarketDataCache`).
+    """
+    return market_data_cache.stats()
+
+
+@router.get("/market_data/{option_id}", response_model=MarketDataRead)
+async def get_market_data(option_id: int, session: AsyncSession = Depends(get_session)):
+    market_data = await session.get(MarketData, option_id)
     if not market_data:
         raise HTTPException(status_code=404, detail="Option not found")
-    return market_data
+    return MarketDataRead.model_validate(market_data)
+
+
+@router.get("/expiries")
+async def get_expiry_dates(
+    start: date,
+    end: date,
+    exchange_code: Optional[str] = None,
+    asset: Optional[str] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Get the expiry dates for delivery months start to end, from the expiry index (see `expiries.py`).
+
+    exchange_code and asset narrow the results down, by default all known exchanges and assets are returned.
+
+    Raises a 400 error if the exchange or asset code is not known, or start to end is more than
+    settings.expiries_max_months delivery months.
+    """
+    try:
+        return await session.run_sync(get_expiries, start, end, exchange_code, asset)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+
+async def get_surface_or_404(
+    session: AsyncSession, exchange_code: str, asset: str
+) -> VolatilitySurface:
+    """
+    :raises: HTTPException 404 if there is no market data for the exchange and asset.
+    """
+    surface = await get_volatility_surface(session, exchange_code, asset)
+    if surface is None:
+        raise HTTPException(
+            status_code=404, detail=f"No volatility quotes for {exchange_code} {asset}."
+        )
+    return surface
+
+
+@router.get("/volatility_surface")
+async def get_volatility_surface_quotes(
+    exchange_code: str,
+    asset: str = Query(pattern=r"^\w+$"),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Get the volatility surface of an exchange and asset (see `volatility_surface.py`): a smile per expiry,
+    ordered by time to expiration, with the quoted strikes and volatilities it interpolates.
+
+    Raises a 404 error if there is no market data for the exchange and asset.
+    """
+    surface = await get_surface_or_404(session, exchange_code, asset)
+    return {
+        "exchange_code": surface.exchange_code,
+        "asset": surface.asset,
+        "smiles": [
+            {
+                "delivery_month": smile.delivery_month,
+                "time_to_expiration": smile.time_to_expiration,
+                "strikes": smile.strikes.tolist(),
+                "volatilities": smile.volatilities.tolist(),
+            }
+            for smile in surface.smiles
+        ],
+    }
+
+
+@router.get("/volatility_surface/volatility")
+async def get_volatility_surface_volatility(
+    exchange_code: str,
+    T: float = Query(ge=0, description="Time to expiration in years"),
+    K: List[float] = Query(description="Strike prices, the parameter may be repeated"),
+    asset: str = Query(pattern=r"^\w+$"),
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Interpolate the volatility surface of an exchange and asset at strikes K and time to expiration T.
+
+    Returns {"volatilities": [float, ...]} in the order of the strikes.
+
+    Raises a 404 error if there is no market data for the exchange and asset.
+    """
+    surface = await get_surface_or_404(session, exchange_code, asset)
+    return {"volatilities": surface.volatility(K, T).tolist()}
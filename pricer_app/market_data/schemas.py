@@ -103,18 +103,10 @@ class MarketDataCreate(BaseModel):
         # Convert market_data to a dictionary if it is a JSON string
         if isinstance(market_data, str):
             market_data = json.loads(market_data)
+        if not isinstance(market_data, dict):
+            raise ValueError("market_data must be a JSON object.")
 
         if pricing_model == "Black76":
-            try:
-                market_data_validated = parse_obj_as(Black76PricingModel, market_data)
-                values[
-                    "market_data"
-                ] = (
-                    market_data_validated.json()
-                )  # Convert back to JSON string if needed
-            except ValidationError as e:
-                raise ValueError(f"Validation error for Black76 model: {e}")
-
             required_fields = {
                 "forward_price",
                 "strike_price",
@@ -128,16 +120,30 @@ class MarketDataCreate(BaseModel):
                     f"Missing required fields for {pricing_model} model: {', '.join(missing_fields)}"
                 )
 
+            try:
+                parse_obj_as(Black76PricingModel, market_data)
+            except ValidationError as e:
+                raise ValueError(f"Validation error for Black76 model: {e}")
+
         # Modify values directly if needed
         values.market_data = json.dumps(market_data)
         return values
 
+    def market_data_fields(self) -> Dict[str, float]:
+        """
+        :return: the Black76 fields of the validated market_data, as stored in `MarketData` columns.
+        """
+        return Black76PricingModel.model_validate_json(self.market_data).model_dump()
+
     @model_validator(mode="before")
     def convert_market_data_to_json(cls, values: Dict[str, Any]) -> Dict[str, Any]:
         """
         Convert the market_data dictionary to a JSON string before storing in the database
         (sqlite does not have json fields at the time of writing.)
         """
+        if not isinstance(values, dict):
+            # left for pydantic to report as not a valid dictionary.
+            return values
         market_data = values.get("market_data")
         if isinstance(market_data, dict):
             values["market_data"] = json.dumps(market_data)
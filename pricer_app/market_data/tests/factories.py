@@ -78,6 +78,29 @@ class MarketDataCreateFactory(factory.Factory):
     )
 
 
+class MarketDataRowFactory(factory.DictFactory):
+    """
+    Generate market data rows as they are uploaded, plain dicts that aren't validated, so tests can
+    build invalid rows too.
+
+    Fields of the market data are overridden with a double underscore, e.g.
+    MarketDataRowFactory(contract="BRN Jan24 Call Strike 100 USD/BBL", market_data__forward_price=96.0)
+    """
+
+    exchange_code = "ICE"
+    contract = "BRN Jan24 Call Strike 100 USD/BBL"
+    pricing_model = "Black76"
+    market_data = factory.Dict(
+        {
+            "forward_price": 95.0,
+            "strike_price": 100.0,
+            "time_to_expiration": 0.5,
+            "volatility": 0.25,
+            "risk_free_interest_rate": 0.03,
+        }
+    )
+
+
 def get_valid_exchange_code_for_commodity(commodity: str) -> str:
     """
     Get a valid exchange code for a given commodity.
@@ -1,6 +1,18 @@
+from datetime import date
+
 import pytest
 
-from ..business_rules import BRNExpiryRule, ExpiryRule, HHExpiryRule
+from ..business_rules import (
+    BRNExpiryRule,
+    ContractNotationParser,
+    ExpiryRule,
+    HHExpiryRule,
+    LastBusinessDayTable,
+    get_calendar,
+    month_before,
+    _parse_contract_notation,
+)
+from .factories import ContractNotationFactory
 
 
 # Parameterized unit test for valid data
@@ -33,6 +45,113 @@ def test_get_expiry_rule_invalid_data(
     assert str(e.value) == error_message
 
 
+@pytest.mark.parametrize(
+    "expiry_rule,delivery_month,expected_expiry",
+    [
+        # last business day of the second month before delivery
+        (BRNExpiryRule, date(2024, 3, 1), date(2024, 1, 31)),
+        (BRNExpiryRule, date(2024, 2, 1), date(2023, 12, 29)),
+        (BRNExpiryRule, date(2024, 8, 1), date(2024, 6, 28)),
+        # last business day of the month before delivery
+        (HHExpiryRule, date(2024, 3, 1), date(2024, 2, 29)),
+        (HHExpiryRule, date(2024, 1, 1), date(2023, 12, 29)),
+        (HHExpiryRule, date(2024, 7, 1), date(2024, 6, 28)),
+        # outside the precomputed year range
+        (BRNExpiryRule, date(2060, 3, 1), date(2060, 1, 30)),
+    ],
+)
+def test_calculate_expiry(expiry_rule, delivery_month, expected_expiry):
+    assert expiry_rule().calculate_expiry(delivery_month) == expected_expiry
+
+
+@pytest.mark.parametrize(
+    "year,month,months,expected",
+    [(2024, 3, 1, (2024, 2)), (2024, 2, 2, (2023, 12)), (2024, 1, 13, (2022, 12))],
+)
+def test_month_before(year, month, months, expected):
+    assert month_before(year, month, months) == expected
+
+
+def test_last_business_day_table_is_built_once(monkeypatch):
+    LastBusinessDayTable.clear()
+    calendar = get_calendar("ICE")
+    assert get_calendar("ICE") is calendar
+
+    calls = []
+    valid_days = calendar.valid_days
+    monkeypatch.setattr(
+        calendar,
+        "valid_days",
+        lambda *args, **kwargs: calls.append(kwargs) or valid_days(*args, **kwargs),
+    )
+
+    rule = BRNExpiryRule()
+    for month in range(1, 13):
+        rule.calculate_expiry(date(2024, month, 1))
+    rule.calculate_expiry(date(2030, 6, 1))
+    assert len(calls) == 1
+    assert LastBusinessDayTable.for_calendar(
+        "ICE"
+    ) is LastBusinessDayTable.for_calendar("ICE")
+
+
+def test_parse_contract_notation():
+    assert ContractNotationParser.parse("BRN Jun21 Call Strike 50.0 USD") == {
+        "asset": "BRN",
+        "expiration_month": "Jun",
+        "expiration_year": "21",
+        "option_type": "Call",
+        "strike_price": "50.0",
+        "unit": "USD",
+    }
+
+
+def test_parse_contract_notation_is_cached():
+    _parse_contract_notation.cache_clear()
+    notation = "HH Mar24 Put Strike 10 USD/MMBtu"
+
+    ContractNotationParser.validate(notation)
+    parsed = ContractNotationParser.parse(notation)
+    parsed["asset"] = "changed"
+
+    assert ContractNotationParser.parse(notation)["asset"] == "HH"
+    assert _parse_contract_notation.cache_info().misses == 1
+
+
+def test_parse_many():
+    parsed, errors = ContractNotationParser.parse_many(
+        [
+            "BRN Jun21 Call Strike 50.0 USD",
+            "INVALID CONTRACT STRING",
+            "HH Mar24 Put Strike 10 USD/MMBtu",
+        ]
+    )
+    assert [p and p["asset"] for p in parsed] == ["BRN", None, "HH"]
+    assert errors == {1: "Invalid contract notation: INVALID CONTRACT STRING"}
+
+
+def test_parse_many_caches_repeated_notations():
+    """
+    Parse a large corpus with many repeated notations, as in a daily settlement file: the regular
+    expression only runs once per distinct notation.
+    """
+    distinct = [ContractNotationFactory() for _ in range(1000)]
+    corpus = distinct * 50
+
+    _parse_contract_notation.cache_clear()
+    parsed, errors = ContractNotationParser.parse_many(corpus)
+    assert errors == {}
+    assert len(parsed) == len(corpus)
+    cache_info = _parse_contract_notation.cache_info()
+    assert cache_info.misses == len(set(distinct))
+    assert cache_info.hits == len(corpus) - len(set(distinct))
+
+    # validating a notation, then parsing it, doesn't match it again.
+    ContractNotationParser.validate(distinct[0])
+    ContractNotationParser.parse(distinct[0])
+    assert _parse_contract_notation.cache_info().misses == cache_info.misses
+
+
 # Run the tests with pytest
 if __name__ == "__main__":
     pytest.main([__file__])
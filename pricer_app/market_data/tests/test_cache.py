@@ -0,0 +1,197 @@
+import json
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+from sqlmodel import select, update
+
+from pricer_app.market_data import cache
+from pricer_app.market_data.cache import (
+    Black76MarketData,
+    MarketDataCache,
+    bump_market_data_version,
+    get_market_data_version,
+    prewarm_market_data_cache,
+)
+from pricer_app.market_data.models import MarketData, MarketDataVersion
+from pricer_app.settings import settings
+
+
+def black76_market_data(forward_price: float = 95.0) -> Black76MarketData:
+    return Black76MarketData(
+        exchange_code="ICE",
+        contract="BRN Jun21 Call Strike 50.0 USD",
+        forward_price=forward_price,
+        time_to_expiration=0.5,
+        volatility=0.2,
+        risk_free_interest_rate=0.03,
+    )
+
+
+def test_market_data_cache_evicts_least_recently_used():
+    market_data_cache = MarketDataCache(max_size=2, ttl=60)
+    for option_id in (1, 2):
+        market_data_cache.put(option_id, black76_market_data(option_id))
+    assert market_data_cache.get(1).forward_price == 1
+    market_data_cache.put(3, black76_market_data(3))
+
+    assert market_data_cache.get(2) is None
+    assert market_data_cache.get(1) is not None
+    assert market_data_cache.get(3) is not None
+    assert market_data_cache.stats() == {
+        "size": 2,
+        "max_size": 2,
+        "ttl": 60,
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+        "expirations": 0,
+        "stale": 0,
+    }
+
+
+def test_market_data_cache_expires(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    market_data_cache = MarketDataCache(max_size=2, ttl=60)
+    market_data_cache.put(1, black76_market_data())
+
+    now += 59
+    assert market_data_cache.get(1) is not None
+    now += 1
+    assert market_data_cache.get(1) is None
+    assert market_data_cache.stats()["expirations"] == 1
+    assert market_data_cache.stats()["size"] == 0
+
+
+def test_market_data_cache_invalidate_and_disable():
+    market_data_cache = MarketDataCache(max_size=2, ttl=60)
+    market_data_cache.put(1, black76_market_data())
+    market_data_cache.invalidate([1, 2])
+    assert market_data_cache.get(1) is None
+
+    market_data_cache.max_size = 0
+    market_data_cache.put(1, black76_market_data())
+    assert market_data_cache.get(1) is None
+
+
+def test_market_data_cache_drops_entries_of_older_versions():
+    market_data_cache = MarketDataCache(max_size=2, ttl=60)
+    market_data_cache.put(1, black76_market_data(), version=3)
+    assert market_data_cache.get(1, version=3) is not None
+    assert market_data_cache.get(1, version=4) is None
+    assert market_data_cache.stats()["stale"] == 1
+    assert market_data_cache.stats()["size"] == 0
+
+
+async def test_prewarm_market_data_cache(
+    monkeypatch, async_session, market_data_models
+):
+    monkeypatch.setattr(cache, "market_data_cache", MarketDataCache(2, ttl=60))
+    ids = (await async_session.exec(select(MarketData.id))).all()
+
+    assert await prewarm_market_data_cache(async_session) == 2
+    # the most recently uploaded.
+    assert cache.market_data_cache.get(max(ids)) is not None
+    assert cache.market_data_cache.get(max(ids) - 1) is not None
+    assert cache.market_data_cache.stats()["size"] == 2
+
+
+def price(client: TestClient, option_id: int) -> float:
+    response = client.post(
+        f"/option_pricing/{option_id}", json={"option_type": "call", "K": 50.0}
+    )
+    assert response.status_code == 200
+    return response.json()["pv"]
+
+
+def test_pricing_reads_through_cache(client: TestClient, market_data_models):
+    first = price(client, 3)
+    assert price(client, 3) == first
+
+    stats = client.get("/market_data/cache").json()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (1, 1, 1)
+
+
+def test_cache_hit_does_not_query_the_database(
+    client: TestClient, async_engine, market_data_models
+):
+    price(client, 3)
+    statements = []
+    event.listen(
+        async_engine.sync_engine,
+        "before_cursor_execute",
+        lambda *args: statements.append(args[2]),
+    )
+    price(client, 3)
+    assert statements == []
+
+
+async def test_market_data_version_is_read_once_per_ttl(async_session, monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(cache.time, "monotonic", lambda: now)
+    monkeypatch.setattr(settings, "market_data_version_ttl", 1.0)
+    assert await get_market_data_version(async_session) == 0
+
+    # another worker's upload, this worker keeps the version it read until the time to live is up.
+    async_session.add(MarketDataVersion(id=1, version=1))
+    await async_session.commit()
+    async_session.info.clear()
+    now += 0.5
+    assert await get_market_data_version(async_session) == 0
+
+    async_session.info.clear()
+    now += 0.5
+    assert await get_market_data_version(async_session) == 1
+
+
+def test_upload_invalidates_cache(client: TestClient, market_data_models):
+    first = price(client, 3)
+    row = {
+        "exchange_code": "ICE",
+        "contract": "BRN Jun21 Call Strike 50.0 USD",
+        "pricing_model": "Black76",
+        "market_data": {
+            "forward_price": 110.0,
+            "strike_price": 50.0,
+            "time_to_expiration": 0.5,
+            "volatility": 0.2,
+            "risk_free_interest_rate": 0.03,
+        },
+    }
+
+    # bulk upload updates the row in place, keeping its id.
+    assert client.post("/market_data/bulk", json=[row]).status_code == 200
+    second = price(client, 3)
+    assert second > first
+
+    row["market_data"]["forward_price"] = 120.0
+    client.post(
+        "/market_data/stream",
+        content=json.dumps(row),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    third = price(client, 3)
+    assert third > second
+
+    # upload replaces the row, so it may get a new id.
+    row["market_data"]["forward_price"] = 130.0
+    option_id = client.post("/market_data", json=row).json()["id"]
+    assert price(client, option_id) > third
+
+
+async def test_upload_by_another_worker_makes_cache_stale(
+    client: TestClient, async_session, market_data_models
+):
+    first = price(client, 3)
+    assert await get_market_data_version(async_session) == 0
+
+    # another worker's upload: its own cache is invalidated, not this one.
+    await async_session.exec(
+        update(MarketData).where(MarketData.id == 3).values(forward_price=110.0)
+    )
+    await bump_market_data_version(async_session)
+    await async_session.commit()
+    assert await get_market_data_version(async_session) == 1
+
+    assert price(client, 3) > first
+    assert client.get("/market_data/cache").json()["stale"] == 1
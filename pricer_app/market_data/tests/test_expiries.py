@@ -0,0 +1,66 @@
+from datetime import date
+
+import pytest
+
+from pricer_app.market_data.expiries import (
+    contract_expiry_date,
+    delivery_months,
+    time_to_expiration,
+)
+
+
+def test_delivery_months():
+    assert delivery_months(date(2023, 11, 15), date(2024, 1, 1)) == [
+        date(2023, 11, 1),
+        date(2023, 12, 1),
+        date(2024, 1, 1),
+    ]
+    assert delivery_months(date(2024, 2, 1), date(2024, 1, 1)) == []
+
+
+@pytest.mark.parametrize(
+    "exchange_code,contract,expected_expiry",
+    [
+        ("ICE", "BRN Mar24 Call Strike 100 USD/BBL", date(2024, 1, 31)),
+        ("ICE", "BRN Jun21 Call Strike 50.0 USD", date(2021, 4, 30)),
+        ("NYMEX", "HH Mar24 Put Strike 10 USD/MMBtu", date(2024, 2, 29)),
+    ],
+)
+def test_contract_expiry_date(exchange_code, contract, expected_expiry):
+    assert contract_expiry_date(exchange_code, contract) == expected_expiry
+
+
+@pytest.mark.parametrize(
+    "exchange_code,contract,expected_error",
+    [
+        (
+            "NYMEX",
+            "BRN Mar24 Call Strike 100 USD/BBL",
+            "No expiry rule found for asset code: BRN",
+        ),
+        ("ICE", "BRN Mar24", "Invalid contract notation: BRN Mar24"),
+    ],
+)
+def test_contract_expiry_date_invalid(exchange_code, contract, expected_error):
+    with pytest.raises(ValueError) as e:
+        contract_expiry_date(exchange_code, contract)
+    assert str(e.value) == expected_error
+
+
+def test_time_to_expiration():
+    contract = "BRN Mar24 Call Strike 100 USD/BBL"
+    assert time_to_expiration("ICE", contract, date(2024, 1, 1)) == 30 / 365
+    assert time_to_expiration("ICE", contract, date(2024, 1, 31)) == 0.0
+    assert time_to_expiration("ICE", contract, date(2024, 2, 1)) < 0
+
+
+def test_time_to_expiration_is_cached():
+    time_to_expiration.cache_clear()
+    contract_expiry_date.cache_clear()
+    contract = "HH Mar24 Put Strike 10 USD/MMBtu"
+    for _ in range(3):
+        time_to_expiration("NYMEX", contract, date(2024, 1, 1))
+    time_to_expiration("NYMEX", contract, date(2024, 1, 2))
+
+    assert time_to_expiration.cache_info().misses == 2
+    assert contract_expiry_date.cache_info().misses == 1
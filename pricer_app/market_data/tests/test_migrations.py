@@ -0,0 +1,67 @@
+import json
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session, SQLModel, create_engine
+
+from pricer_app.market_data.migrations import migrate_market_data_json
+from pricer_app.market_data.models import MarketData
+
+# The market data table as it was when market data was stored as a JSON string.
+JSON_MARKET_DATA_TABLE = """
+CREATE TABLE marketdata (
+    id INTEGER NOT NULL,
+    contract VARCHAR NOT NULL,
+    market_data VARCHAR NOT NULL,
+    exchange_code VARCHAR NOT NULL,
+    upload_timestamp DATETIME NOT NULL,
+    PRIMARY KEY (id),
+    CONSTRAINT unique_exchange_code_contract UNIQUE (exchange_code, contract)
+)
+"""
+
+
+def test_migrate_market_data_json(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    market_data = {
+        "forward_price": 100.0,
+        "strike_price": 50.0,
+        "time_to_expiration": 0.5,
+        "volatility": 0.2,
+        "risk_free_interest_rate": 0.03,
+    }
+    with engine.begin() as connection:
+        connection.execute(text(JSON_MARKET_DATA_TABLE))
+        connection.execute(
+            text("CREATE INDEX ix_marketdata_contract ON marketdata (contract)")
+        )
+        connection.execute(
+            text(
+                "INSERT INTO marketdata VALUES (7, 'BRN Jun21 Call Strike 50.0 USD', "
+                ":market_data, 'ICE', '2024-02-01 12:00:00.000000')"
+            ),
+            {"market_data": json.dumps(market_data)},
+        )
+
+    assert migrate_market_data_json(engine)
+
+    with Session(engine) as session:
+        row = session.get(MarketData, 7)
+        assert row.contract == "BRN Jun21 Call Strike 50.0 USD"
+        assert row.upload_timestamp == datetime(2024, 2, 1, 12)
+        assert json.loads(row.market_data) == market_data
+    assert not inspect(engine).has_table("marketdata_json")
+    assert {index["name"] for index in inspect(engine).get_indexes("marketdata")} == {
+        index.name for index in MarketData.__table__.indexes
+    }
+
+    # Already migrated.
+    assert not migrate_market_data_json(engine)
+
+
+def test_migrate_market_data_json_new_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    assert not migrate_market_data_json(engine)
+
+    SQLModel.metadata.create_all(engine)
+    assert not migrate_market_data_json(engine)
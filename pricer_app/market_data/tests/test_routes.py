@@ -1,7 +1,25 @@
+import csv
 import json
+from datetime import date
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
 from typing import List
 from fastapi.testclient import TestClient
+from sqlmodel import select
+from pricer_app.market_data.business_rules import HHExpiryRule
+from pricer_app.market_data.columnar_export import (
+    arrow_schema,
+    export_market_data_columnar,
+)
+from pricer_app.market_data.expiries import ensure_expiry_index
+from pricer_app.market_data.export import export_market_data
+from pricer_app.market_data.models import Expiry
 from pricer_app.market_data.schemas import MarketDataCreate, MarketDataRetrieve
+from pricer_app.settings import settings
+
+from .factories import MarketDataRowFactory
 
 
 def test_upload_market_data(client: TestClient):
@@ -33,6 +51,71 @@ def test_get_all_market_data(
     data = response.json()
 
     assert len(data) == len(raw_market_data)
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_all_market_data_pages(
+    client: TestClient, market_data_models: List[MarketDataCreate]
+):
+    response = client.get("/market_data", params={"limit": 2})
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()] == [1, 2]
+    cursor = response.headers["X-Next-Cursor"]
+    assert cursor == "2"
+
+    response = client.get("/market_data", params={"limit": 2, "after_id": cursor})
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()] == [3]
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_get_all_market_data_default_page_size(
+    client: TestClient, market_data_models: List[MarketDataCreate], monkeypatch
+):
+    monkeypatch.setattr(settings, "market_data_page_size", 1)
+    response = client.get("/market_data")
+    assert [row["id"] for row in response.json()] == [1]
+    assert response.headers["X-Next-Cursor"] == "1"
+
+
+@pytest.mark.parametrize(
+    "params, expected_ids",
+    [
+        ({"exchange_code": "ICE"}, [2, 3]),
+        ({"asset": "BRN"}, [1, 3]),
+        ({"exchange_code": "ICE", "asset": "BRN"}, [3]),
+        ({"asset": "BR"}, []),
+        ({"expiration_month": "Jun"}, [3]),
+        ({"expiration_year": "24"}, [1, 2]),
+        ({"expiration_month": "Mar", "expiration_year": "24"}, [2]),
+        ({"uploaded_after": "2000-01-01T00:00:00"}, [1, 2, 3]),
+        ({"uploaded_before": "2000-01-01T00:00:00"}, []),
+    ],
+)
+def test_get_all_market_data_filtered(
+    client: TestClient,
+    market_data_models: List[MarketDataCreate],
+    params,
+    expected_ids,
+):
+    response = client.get("/market_data", params=params)
+    assert response.status_code == 200
+    assert [row["id"] for row in response.json()] == expected_ids
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"limit": 0},
+        {"limit": 1_000_000},
+        {"expiration_month": "June"},
+        {"expiration_year": "2024"},
+        {"asset": "BRN%"},
+    ],
+)
+def test_get_all_market_data_invalid(client: TestClient, params):
+    response = client.get("/market_data", params=params)
+    assert response.status_code == 422
 
 
 def test_get_market_data(
@@ -55,3 +138,361 @@ def test_get_market_data_not_found(client: TestClient):
     data = response.json()
     assert "detail" in data
     assert data["detail"] == "Option not found"
+
+
+def test_get_expiries(client: TestClient):
+    response = client.get(
+        "/expiries",
+        params={
+            "exchange_code": "ICE",
+            "asset": "BRN",
+            "start": "2024-02-01",
+            "end": "2024-03-31",
+        },
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [(e["delivery_month"], e["expiry_date"]) for e in data] == [
+        ("2024-02-01", "2023-12-29"),
+        ("2024-03-01", "2024-01-31"),
+    ]
+    assert all(e["exchange_code"] == "ICE" and e["asset"] == "BRN" for e in data)
+
+
+def test_get_expiries_all_assets(client: TestClient):
+    params = {"start": "2024-01-01", "end": "2024-12-01"}
+    data = client.get("/expiries", params=params).json()
+    assert {(e["exchange_code"], e["asset"]) for e in data} == {
+        ("ICE", "BRN"),
+        ("NYMEX", "HH"),
+    }
+    assert len(data) == 24
+
+
+def test_get_expiries_uses_index(client: TestClient, session, monkeypatch):
+    params = {"start": "2024-01-01", "end": "2024-06-01", "asset": "HH"}
+    first = client.get("/expiries", params=params).json()
+
+    # Once indexed, expiries are read back without calculating them again.
+    def fail(self, delivery_month):
+        raise AssertionError("expiry should come from the index")
+
+    monkeypatch.setattr(HHExpiryRule, "calculate_expiry", fail)
+    assert client.get("/expiries", params=params).json() == first
+
+
+def test_ensure_expiry_index_keeps_rows_added_concurrently(session, monkeypatch):
+    calculate_expiry = HHExpiryRule.calculate_expiry
+
+    # Another request adds the same month between the index being read and written.
+    def calculate_expiry_racing(self, delivery_month):
+        expiry_date = calculate_expiry(self, delivery_month)
+        if delivery_month == date(2100, 2, 1):
+            session.add(
+                Expiry(
+                    exchange_code="NYMEX",
+                    asset="HH",
+                    delivery_month=delivery_month,
+                    expiry_date=expiry_date,
+                )
+            )
+            session.flush()
+        return expiry_date
+
+    monkeypatch.setattr(HHExpiryRule, "calculate_expiry", calculate_expiry_racing)
+    ensure_expiry_index(session, date(2100, 1, 1), date(2100, 3, 1), "NYMEX", "HH")
+
+    months = session.exec(select(Expiry.delivery_month)).all()
+    assert sorted(months) == [date(2100, 1, 1), date(2100, 2, 1), date(2100, 3, 1)]
+
+
+def test_get_expiries_range_too_large(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "expiries_max_months", 12)
+    response = client.get(
+        "/expiries", params={"start": "2100-01-01", "end": "2101-01-01"}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == (
+        "13 delivery months requested, at most 12 are allowed."
+    )
+
+
+@pytest.mark.parametrize(
+    "params,expected_error",
+    [
+        ({"exchange_code": "INVALID"}, "No exchange found with exchange_code: INVALID"),
+        (
+            {"exchange_code": "ICE", "asset": "HH"},
+            "No expiry rule found for asset code: HH",
+        ),
+        ({"asset": "INVALID"}, "No expiry rule found for asset code: INVALID"),
+    ],
+)
+def test_get_expiries_invalid(client: TestClient, params, expected_error):
+    response = client.get(
+        "/expiries", params={"start": "2024-01-01", "end": "2024-02-01", **params}
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == expected_error
+
+
+def test_upload_market_data_bulk(client: TestClient, market_data_models):
+    # Market data 3 is "BRN Jun21 Call Strike 50.0 USD" on ICE.
+    rows = [
+        MarketDataRowFactory(contract="BRN Jan24 Call Strike 100 USD/BBL"),
+        MarketDataRowFactory(contract="INVALID CONTRACT STRING"),
+        MarketDataRowFactory(
+            contract="BRN Jun21 Call Strike 50.0 USD", market_data__forward_price=101.0
+        ),
+        MarketDataRowFactory(
+            contract="BRN Feb24 Put Strike 90 USD/BBL", pricing_model="Binomial"
+        ),
+    ]
+    response = client.post("/market_data/bulk", json=rows)
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert results[0]["status"] == "created"
+    assert results[1]["status"] == "error"
+    assert "Invalid contract notation: INVALID CONTRACT STRING" in results[1]["error"]
+    assert results[2] == {"status": "updated", "id": 3}
+    assert results[3]["status"] == "error"
+    assert "Unsupported pricing model" in results[3]["error"]
+
+    created = client.get(f"/market_data/{results[0]['id']}").json()
+    assert created["contract"] == rows[0]["contract"]
+    updated = client.get("/market_data/3").json()
+    assert json.loads(updated["market_data"])["forward_price"] == 101.0
+    assert len(client.get("/market_data").json()) == 4
+
+
+def test_upload_market_data_bulk_ndjson(client: TestClient):
+    rows = [
+        MarketDataRowFactory(contract=f"BRN Jan{year} Call Strike 100 USD/BBL")
+        for year in range(20, 30)
+    ]
+    # the same contract twice, the last one wins.
+    rows.append(
+        MarketDataRowFactory(
+            contract="BRN Jan20 Call Strike 100 USD/BBL", market_data__forward_price=1.0
+        )
+    )
+    body = "\n".join(json.dumps(row) for row in rows) + "\n{not json\n"
+
+    response = client.post(
+        "/market_data/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert len(results) == len(rows) + 1
+    assert {result["status"] for result in results[:-1]} == {"created"}
+    assert results[0]["id"] == results[-2]["id"]
+    assert results[-1]["status"] == "error"
+
+    stored = client.get(f"/market_data/{results[0]['id']}").json()
+    assert json.loads(stored["market_data"])["forward_price"] == 1.0
+    assert len(client.get("/market_data").json()) == 10
+
+
+@pytest.mark.parametrize(
+    "row", [1, None, [1, 2], MarketDataRowFactory(market_data="[1]")]
+)
+def test_upload_market_data_bulk_not_an_object(client: TestClient, row):
+    response = client.post("/market_data/bulk", json=[row, MarketDataRowFactory()])
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert results[0]["status"] == "error"
+    assert "JSON object" in results[0]["error"]
+    assert results[1]["status"] == "created"
+
+
+def test_upload_market_data_bulk_ndjson_not_an_object(client: TestClient):
+    body = "null\n[1, 2]\n" + json.dumps(MarketDataRowFactory())
+    response = client.post(
+        "/market_data/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert [result["status"] for result in results] == ["error", "error", "created"]
+    assert results[0]["error"] == "Expected a JSON object of market data."
+
+
+def test_upload_market_data_bulk_chunks(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "bulk_upload_chunk_size", 3)
+    rows = [
+        MarketDataRowFactory(contract=f"BRN Jan{year} Call Strike 100 USD/BBL")
+        for year in range(10, 20)
+    ]
+
+    results = client.post("/market_data/bulk", json=rows).json()["results"]
+    assert len({result["id"] for result in results}) == len(rows)
+
+
+def test_upload_market_data_bulk_invalid_body(client: TestClient):
+    response = client.post("/market_data/bulk", json={"not": "a list"})
+    assert response.status_code == 400
+
+
+def stream_upload(client: TestClient, body: str, content_type: str) -> List[dict]:
+    response = client.post(
+        "/market_data/stream", content=body, headers={"Content-Type": content_type}
+    )
+    assert response.status_code == 200
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_upload_market_data_stream_ndjson(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "bulk_upload_chunk_size", 4)
+    rows = [
+        MarketDataRowFactory(contract=f"BRN Jan{year} Call Strike 100 USD/BBL")
+        for year in range(20, 30)
+    ]
+    lines = [json.dumps(row) for row in rows]
+    lines.insert(
+        5, json.dumps(MarketDataRowFactory(contract="INVALID CONTRACT STRING"))
+    )
+
+    progress = stream_upload(client, "\n".join(lines), "application/x-ndjson")
+
+    assert [update.get("rows") for update in progress[:-1]] == [[0, 3], [4, 7], [8, 10]]
+    assert list(progress[1]["errors"]) == ["5"]
+    assert progress[-1] == {
+        "done": True,
+        "rows": 11,
+        "created": 10,
+        "updated": 0,
+        "errors": 1,
+    }
+    assert len(client.get("/market_data").json()) == 10
+
+
+@pytest.mark.parametrize("line", ["1", "null", "[1, 2]", '"row"'])
+def test_upload_market_data_stream_not_an_object(client: TestClient, line):
+    body = "\n".join([line, json.dumps(MarketDataRowFactory())])
+    progress = stream_upload(client, body, "application/x-ndjson")
+
+    assert "0" in progress[0]["errors"]
+    assert progress[-1] == {
+        "done": True,
+        "rows": 2,
+        "created": 1,
+        "updated": 0,
+        "errors": 1,
+    }
+
+
+def test_upload_market_data_stream_csv(client: TestClient, market_data_models):
+    body = (
+        "exchange_code,contract,pricing_model,forward_price,strike_price,"
+        "time_to_expiration,volatility,risk_free_interest_rate\r\n"
+        "ICE,BRN Jun21 Call Strike 50.0 USD,Black76,101.0,50.0,0.5,0.2,0.03\r\n"
+        "ICE,BRN Jul21 Call Strike 50.0 USD,Black76,102.0,50.0,0.5,0.2,0.03\r\n"
+        "ICE,BRN Aug21 Call Strike 50.0 USD,Black76,102.0,50.0,0.5,0.2\r\n"
+    )
+    progress = stream_upload(client, body, "text/csv")
+
+    assert progress[-1] == {
+        "done": True,
+        "rows": 3,
+        "created": 1,
+        "updated": 1,
+        "errors": 1,
+    }
+    assert "risk_free_interest_rate" in progress[0]["errors"]["2"]
+    updated = json.loads(client.get("/market_data/3").json()["market_data"])
+    assert updated["forward_price"] == 101.0
+
+
+def test_upload_market_data_stream_csv_market_data_column(client: TestClient):
+    market_data = json.dumps(MarketDataRowFactory()["market_data"]).replace('"', '""')
+    body = (
+        "exchange_code,contract,pricing_model,market_data\n"
+        f'ICE,BRN Jun21 Call Strike 50.0 USD,Black76,"{market_data}"\n'
+    )
+    progress = stream_upload(client, body, "text/csv")
+    assert progress[-1]["created"] == 1
+
+
+def test_export_market_data_ndjson(client: TestClient, market_data_models):
+    response = client.get("/market_data/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == client.get("/market_data").json()
+
+
+def test_export_market_data_csv(client: TestClient, market_data_models, monkeypatch):
+    monkeypatch.setattr(settings, "market_data_export_batch_size", 2)
+    response = client.get("/market_data/export", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(response.text.splitlines()))
+    assert [row["id"] for row in rows] == ["1", "2", "3"]
+    assert rows[2]["contract"] == "BRN Jun21 Call Strike 50.0 USD"
+    assert json.loads(rows[2]["market_data"])["forward_price"] == 100.0
+
+
+def test_export_market_data_filtered(client: TestClient, market_data_models):
+    response = client.get("/market_data/export", params={"exchange_code": "ICE"})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [2, 3]
+
+
+async def test_export_market_data_batches(async_session, market_data_models):
+    chunks = [chunk async for chunk in export_market_data(async_session, batch_size=2)]
+    assert [chunk.count("\n") for chunk in chunks] == [2, 1]
+
+    chunks = [
+        chunk
+        async for chunk in export_market_data(
+            async_session, csv_format=True, batch_size=2
+        )
+    ]
+    assert [chunk.count("\n") for chunk in chunks] == [1, 2, 1]
+
+
+@pytest.mark.parametrize("format", ["arrow", "parquet"])
+def test_export_market_data_columnar(client: TestClient, market_data_models, format):
+    response = client.get("/market_data/export", params={"format": format})
+    assert response.status_code == 200
+    body = pa.BufferReader(response.content)
+    if format == "arrow":
+        table = pa.ipc.open_stream(body).read_all()
+    else:
+        table = pq.read_table(body)
+
+    assert table.schema == arrow_schema()
+    assert table.column("id").to_pylist() == [1, 2, 3]
+    row = table.slice(2, 1).to_pylist()[0]
+    assert row["asset"] == "BRN"
+    assert row["delivery_month"] == date(2021, 6, 1)
+    assert row["option_type"] == "Call"
+    assert row["unit"] == "USD"
+    assert row["forward_price"] == 100.0
+    assert row["volatility"] == 0.2
+
+
+async def test_export_market_data_columnar_batches(async_session, market_data_models):
+    chunks = [
+        chunk
+        async for chunk in export_market_data_columnar(async_session, batch_size=2)
+    ]
+    assert len(chunks) == 3
+    table = pa.ipc.open_stream(b"".join(chunks)).read_all()
+    assert table.num_rows == 3
+
+    parquet = b"".join(
+        [
+            chunk
+            async for chunk in export_market_data_columnar(
+                async_session, parquet_format=True, batch_size=2
+            )
+        ]
+    )
+    assert pq.ParquetFile(pa.BufferReader(parquet)).num_row_groups == 2
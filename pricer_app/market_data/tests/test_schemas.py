@@ -4,7 +4,7 @@ import pytest
 from pydantic import ValidationError
 
 from .factories import MarketDataCreateFactory, ContractFactory
-from ..schemas import Contract
+from ..schemas import Contract, MarketDataCreate
 from .helpers import assert_valid_contract
 
 
@@ -156,3 +156,15 @@ def test_invalid_market_data(market_data, expected_message):
         assert (
             expected_message in error_messages
         ), f"Expected message '{expected_message}' not found in error messages: {error_messages}"
+
+
+@pytest.mark.parametrize("market_data", ["[1]", "1", "null"])
+def test_market_data_not_an_object(market_data):
+    with pytest.raises(ValidationError, match="market_data must be a JSON object"):
+        MarketDataCreateFactory(pricing_model="Black76", market_data=market_data)
+
+
+@pytest.mark.parametrize("values", [1, None, [1, 2]])
+def test_market_data_create_not_an_object(values):
+    with pytest.raises(ValidationError, match="valid dictionary"):
+        MarketDataCreate.model_validate(values)
@@ -0,0 +1,216 @@
+from datetime import date
+from typing import NamedTuple
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import update
+
+from pricer_app.market_data.cache import bump_market_data_version
+from pricer_app.market_data.models import MarketData
+from pricer_app.market_data.volatility_surface import (
+    VolatilitySmile,
+    VolatilitySurface,
+    build_volatility_surface,
+)
+from pricer_app.option_pricing.enums import OptionType
+from pricer_app.option_pricing.pricing import black76
+
+from .factories import MarketDataRowFactory
+
+
+class QuoteRow(NamedTuple):
+    contract: str
+    strike_price: float
+    volatility: float
+    time_to_expiration: float
+
+
+def test_volatility_smile_interpolates_quotes():
+    smile = VolatilitySmile(
+        date(2024, 3, 1), 0.5, [80.0, 90.0, 100.0, 110.0], [0.3, 0.25, 0.2, 0.22]
+    )
+    assert smile.volatility([80.0, 90.0, 100.0, 110.0]).tolist() == pytest.approx(
+        [0.3, 0.25, 0.2, 0.22]
+    )
+    between = smile.volatility(95.0).item()
+    assert 0.2 < between < 0.25
+    # flat beyond the quoted strikes.
+    assert smile.volatility([50.0, 200.0]).tolist() == pytest.approx([0.3, 0.22])
+
+
+def test_volatility_smile_single_quote_is_flat():
+    smile = VolatilitySmile(date(2024, 3, 1), 0.5, [100.0], [0.2])
+    assert smile.volatility([50.0, 100.0, 150.0]).tolist() == [0.2, 0.2, 0.2]
+
+
+def test_volatility_surface_interpolates_total_variance():
+    surface = VolatilitySurface(
+        "ICE",
+        "BRN",
+        [
+            VolatilitySmile(date(2024, 6, 1), 1.0, [100.0], [0.3]),
+            VolatilitySmile(date(2024, 3, 1), 0.5, [100.0], [0.2]),
+        ],
+    )
+    variance = 0.2**2 * 0.5 + 0.5 * (0.3**2 * 1.0 - 0.2**2 * 0.5)
+    assert surface.volatility(100.0, 0.75).item() == pytest.approx(
+        (variance / 0.75) ** 0.5
+    )
+    assert surface.volatility(100.0, 0.25).item() == pytest.approx(0.2)
+    assert surface.volatility(100.0, 2.0).item() == pytest.approx(0.3)
+
+
+def test_build_volatility_surface():
+    surface = build_volatility_surface(
+        "ICE",
+        "BRN",
+        [
+            QuoteRow("BRN Mar24 Call Strike 90 USD", 90.0, 0.25, 0.5),
+            QuoteRow("BRN Mar24 Put Strike 100 USD", 100.0, 0.2, 0.5),
+            QuoteRow("BRN Jun24 Call Strike 100 USD", 100.0, 0.3, 0.75),
+            # uploaded later, replaces the quote at 100.
+            QuoteRow("BRN Mar24 Call Strike 100 USD", 100.0, 0.21, 0.49),
+        ],
+    )
+    march = surface.smile(date(2024, 3, 1))
+    assert march.strikes.tolist() == [90.0, 100.0]
+    assert march.volatilities.tolist() == [0.25, 0.21]
+    assert march.time_to_expiration == 0.49
+    assert [smile.delivery_month for smile in surface.smiles] == [
+        date(2024, 3, 1),
+        date(2024, 6, 1),
+    ]
+    assert surface.smile(date(2024, 9, 1)) is None
+
+
+@pytest.fixture
+def smile_quotes(client: TestClient):
+    quotes = [
+        MarketDataRowFactory(
+            contract="BRN Mar24 Put Strike 90 USD",
+            market_data__forward_price=100.0,
+            market_data__strike_price=90.0,
+            market_data__volatility=0.25,
+        ),
+        MarketDataRowFactory(
+            contract="BRN Mar24 Call Strike 100 USD",
+            market_data__forward_price=100.0,
+            market_data__strike_price=100.0,
+            market_data__volatility=0.2,
+        ),
+        MarketDataRowFactory(
+            contract="BRN Mar24 Call Strike 110 USD",
+            market_data__forward_price=100.0,
+            market_data__strike_price=110.0,
+            market_data__volatility=0.22,
+        ),
+    ]
+    response = client.post("/market_data/bulk", json=quotes)
+    return [result["id"] for result in response.json()["results"]]
+
+
+def test_get_volatility_surface(client: TestClient, smile_quotes):
+    response = client.get("/volatility_surface?exchange_code=ICE&asset=BRN")
+    assert response.status_code == 200
+    assert response.json() == {
+        "exchange_code": "ICE",
+        "asset": "BRN",
+        "smiles": [
+            {
+                "delivery_month": "2024-03-01",
+                "time_to_expiration": 0.5,
+                "strikes": [90.0, 100.0, 110.0],
+                "volatilities": [0.25, 0.2, 0.22],
+            }
+        ],
+    }
+
+    response = client.get(
+        "/volatility_surface/volatility?exchange_code=ICE&asset=BRN&T=0.5&K=100&K=120"
+    )
+    assert response.json()["volatilities"] == pytest.approx([0.2, 0.22])
+
+    response = client.get("/volatility_surface?exchange_code=ICE&asset=HH")
+    assert response.status_code == 404
+    assert response.json()["detail"] == "No volatility quotes for ICE HH."
+
+
+def test_upload_invalidates_volatility_surface(client: TestClient, smile_quotes):
+    url = "/volatility_surface/volatility?exchange_code=ICE&asset=BRN&T=0.5&K=100"
+    assert client.get(url).json()["volatilities"] == pytest.approx([0.2])
+
+    client.post(
+        "/market_data",
+        json=MarketDataRowFactory(
+            contract="BRN Mar24 Call Strike 100 USD",
+            market_data__forward_price=100.0,
+            market_data__strike_price=100.0,
+            market_data__volatility=0.3,
+        ),
+    )
+    assert client.get(url).json()["volatilities"] == pytest.approx([0.3])
+
+
+def test_price_with_volatility_surface(client: TestClient, smile_quotes):
+    option_id = smile_quotes[1]
+    option = {"option_type": "call", "K": 105.0}
+    (volatility,) = client.get(
+        "/volatility_surface/volatility?exchange_code=ICE&asset=BRN&T=0.5&K=105"
+    ).json()["volatilities"]
+    assert volatility != 0.2
+
+    response = client.post(
+        f"/option_pricing/{option_id}?volatility=surface", json=option
+    )
+    assert response.status_code == 200
+    expected = black76(OptionType.call, 100.0, 105.0, 0.03, volatility, 0.5)
+    assert response.json()["pv"] == pytest.approx(expected, rel=1e-14)
+
+    # the stored volatility is still the default.
+    flat = client.post(f"/option_pricing/{option_id}", json=option).json()["pv"]
+    assert flat == pytest.approx(
+        black76(OptionType.call, 100.0, 105.0, 0.03, 0.2, 0.5), rel=1e-14
+    )
+
+    batch = client.post(
+        f"/option_pricing/{option_id}/batch?volatility=surface", json=[option]
+    ).json()["results"]
+    assert batch[0]["pv"] == pytest.approx(expected, rel=1e-14)
+
+    legs = [
+        {"option_id": option_id, **option},
+        {"option_id": 999, **option},
+    ]
+    portfolio = client.post(
+        "/option_pricing/portfolio?volatility=surface", json=legs
+    ).json()
+    assert portfolio["legs"][0]["pv"] == pytest.approx(expected, rel=1e-14)
+    assert portfolio["legs"][1] == {"error": "Option market data not found."}
+
+    scenario = {
+        "options": [{"option_id": option_id, **option}],
+        "volatility_shifts": [0.0],
+    }
+    scenarios = client.post(
+        "/option_pricing/scenarios?volatility=surface", json=scenario
+    ).json()
+    assert scenarios["pv"][0][0] == pytest.approx(expected, rel=1e-14)
+
+
+async def test_upload_by_another_worker_makes_surface_stale(
+    client: TestClient, async_session, smile_quotes
+):
+    params = "exchange_code=ICE&asset=BRN&T=0.5&K=100"
+    url = f"/volatility_surface/volatility?{params}"
+    assert client.get(url).json()["volatilities"] == [0.2]
+
+    # another worker's upload: its own surfaces are invalidated, not this one's.
+    await async_session.exec(
+        update(MarketData)
+        .where(MarketData.id == smile_quotes[1])
+        .values(volatility=0.3)
+    )
+    await bump_market_data_version(async_session)
+    await async_session.commit()
+
+    assert client.get(url).json()["volatilities"] == [0.3]
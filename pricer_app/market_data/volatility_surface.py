@@ -0,0 +1,208 @@
+"""
+Volatility surfaces built from the uploaded market data.
+
+Each market data row quotes the volatility at its strike, for its exchange, asset and expiry (the
+contract's delivery month).  A surface holds one smile per expiry: a natural cubic spline of volatility in
+strike through that expiry's quotes, flat beyond the lowest and highest strikes.  Between expiries, total
+variance (sigma^2 T) is interpolated linearly in time to expiration.
+
+Surfaces are built once per exchange and asset, with the spline coefficients, and kept in
+`volatility_surface_cache`, so a lookup is a binary search for the strike's interval and a cubic to
+evaluate rather than a refit.  Uploads invalidate the surfaces of the contracts they write, see
+`invalidate_volatility_surfaces`, and make the surfaces cached by other workers stale, see
+`cache.get_market_data_version`.
+"""
+from bisect import bisect_left
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Row
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .business_rules import ContractNotationParser
+from .cache import MarketDataCache, get_market_data_version
+from .expiries import contract_delivery_month
+from .filters import MarketDataFilter
+from .models import MarketData
+from ..settings import settings
+
+# Surfaces by (exchange code, asset).
+volatility_surface_cache = MarketDataCache(
+    settings.volatility_surface_cache_size, settings.market_data_cache_ttl
+)
+
+
+class VolatilitySmile:
+    """
+    Volatility by strike for one expiry, interpolated with a natural cubic spline through the quotes.
+    """
+
+    def __init__(
+        self,
+        delivery_month: date,
+        time_to_expiration: float,
+        strikes: Sequence[float],
+        volatilities: Sequence[float],
+    ):
+        """
+        :param strikes: in ascending order, without repeats
+        """
+        self.delivery_month = delivery_month
+        self.time_to_expiration = time_to_expiration
+        self.strikes = np.asarray(strikes, dtype=float)
+        self.volatilities = np.asarray(volatilities, dtype=float)
+        self._spline = None
+        if self.strikes.size > 1:
+            # scipy is only needed once a surface is built.
+            from scipy.interpolate import CubicSpline
+
+            self._spline = CubicSpline(
+                self.strikes, self.volatilities, bc_type="natural"
+            )
+
+    def volatility(self, K) -> np.ndarray:
+        """
+        :return: the volatility at each strike, that of the nearest quote beyond the quoted strikes.
+        """
+        K = np.clip(np.asarray(K, dtype=float), self.strikes[0], self.strikes[-1])
+        if self._spline is None:
+            return np.full(K.shape, self.volatilities[0])
+        # the spline can dip below zero between widely spaced quotes.
+        return np.maximum(self._spline(K), 0.0)
+
+
+class VolatilitySurface:
+    """
+    The smiles of an exchange and asset, one per expiry.
+    """
+
+    def __init__(self, exchange_code: str, asset: str, smiles: List[VolatilitySmile]):
+        self.exchange_code = exchange_code
+        self.asset = asset
+        self.smiles = sorted(smiles, key=lambda smile: smile.time_to_expiration)
+        self._times = [smile.time_to_expiration for smile in self.smiles]
+        self._smiles_by_month = {smile.delivery_month: smile for smile in smiles}
+
+    def smile(self, delivery_month: date) -> Optional[VolatilitySmile]:
+        return self._smiles_by_month.get(delivery_month)
+
+    def volatility(self, K, T: float) -> np.ndarray:
+        """
+        :return: the volatility at each strike for a time to expiration, from the total variance interpolated
+        linearly between the smiles either side of it, or the nearest smile's volatility beyond them.
+        """
+        i = bisect_left(self._times, T)
+        if i == 0:
+            return self.smiles[0].volatility(K)
+        if i == len(self.smiles):
+            return self.smiles[-1].volatility(K)
+        before, after = self.smiles[i - 1], self.smiles[i]
+        variance_before = before.volatility(K) ** 2 * before.time_to_expiration
+        variance_after = after.volatility(K) ** 2 * after.time_to_expiration
+        weight = (T - before.time_to_expiration) / (
+            after.time_to_expiration - before.time_to_expiration
+        )
+        variance = variance_before + weight * (variance_after - variance_before)
+        return np.sqrt(variance / T)
+
+
+def build_volatility_surface(
+    exchange_code: str, asset: str, rows: Iterable[Row]
+) -> VolatilitySurface:
+    """
+    :param rows: the exchange and asset's market data (contract, strike_price, volatility and
+    time_to_expiration), oldest upload first: where there are several quotes for a strike, the last one is used.
+    """
+    volatilities_by_month: Dict[date, Dict[float, float]] = {}
+    # each expiry's time to expiration, as of its latest upload.
+    times_by_month: Dict[date, float] = {}
+    for row in rows:
+        delivery_month = contract_delivery_month(
+            ContractNotationParser.parse(row.contract)
+        )
+        volatilities_by_month.setdefault(delivery_month, {})[
+            row.strike_price
+        ] = row.volatility
+        times_by_month[delivery_month] = row.time_to_expiration
+
+    smiles = []
+    for delivery_month, volatilities in volatilities_by_month.items():
+        strikes = sorted(volatilities)
+        smiles.append(
+            VolatilitySmile(
+                delivery_month,
+                times_by_month[delivery_month],
+                strikes,
+                [volatilities[strike] for strike in strikes],
+            )
+        )
+    return VolatilitySurface(exchange_code, asset, smiles)
+
+
+async def get_volatility_surface(
+    session: AsyncSession, exchange_code: str, asset: str
+) -> Optional[VolatilitySurface]:
+    """
+    Read through `volatility_surface_cache`: surfaces that aren't cached are built from the market data
+    and cached.
+
+    :return: the surface, or None if the exchange and asset have no market data.
+    """
+    key = (exchange_code, asset)
+    version = await get_market_data_version(session)
+    surface = volatility_surface_cache.get(key, version)
+    if surface is not None:
+        return surface
+
+    query = MarketDataFilter(exchange_code=exchange_code, asset=asset).apply(
+        select(
+            MarketData.contract,
+            MarketData.strike_price,
+            MarketData.volatility,
+            MarketData.time_to_expiration,
+        )
+    )
+    rows = (
+        await session.exec(query.order_by(MarketData.upload_timestamp, MarketData.id))
+    ).all()
+    if not rows:
+        return None
+    surface = build_volatility_surface(exchange_code, asset, rows)
+    volatility_surface_cache.put(key, surface, version)
+    return surface
+
+
+async def get_volatility_smile(
+    session: AsyncSession, exchange_code: str, contract: str
+) -> VolatilitySmile:
+    """
+    :return: the smile of the contract's exchange, asset and expiry.
+    :raises: ValueError if the contract notation is invalid, or there are no quotes for its expiry.
+    """
+    parsed = ContractNotationParser.parse(contract)
+    delivery_month = contract_delivery_month(parsed)
+    surface = await get_volatility_surface(session, exchange_code, parsed["asset"])
+    smile = surface and surface.smile(delivery_month)
+    if smile is None:
+        raise ValueError(
+            f"No volatility quotes for {exchange_code} {parsed['asset']} "
+            f"{parsed['expiration_month']}{parsed['expiration_year']}."
+        )
+    return smile
+
+
+def invalidate_volatility_surfaces(contracts: Iterable[Tuple[str, str]]):
+    """
+    Drop the cached surfaces that uploaded market data belongs to.
+
+    :param contracts: (exchange code, contract notation) of each uploaded row
+    """
+    keys = set()
+    for exchange_code, contract in contracts:
+        try:
+            keys.add((exchange_code, ContractNotationParser.parse(contract)["asset"]))
+        except ValueError:
+            continue
+    volatility_surface_cache.invalidate(keys)
@@ -14,3 +14,18 @@ class OptionType(str, Enum):
                 f"Invalid option type '{value}'. Must be one of: {', '.join(valid_values)}."
             )
         return value.lower()
+
+
+class Greek(str, Enum):
+    delta = "delta"
+    gamma = "gamma"
+    vega = "vega"
+    theta = "theta"
+    rho = "rho"
+
+
+class VolatilitySource(str, Enum):
+    # the volatility stored with the option's market data.
+    market_data = "market_data"
+    # the volatility surface's, at the option's strike, see `pricer_app.market_data.volatility_surface`.
+    surface = "surface"
@@ -0,0 +1,340 @@
+"""
+Offload of CPU heavy pricing to a pool of worker processes.
+
+The request handlers run on the event loop, so pricing a large batch inline holds up every other
+request until it is done.  Jobs of at least settings.pricing_pool_threshold options
+(settings.implied_volatility_pool_threshold quotes for implied volatility, which costs an order of
+magnitude more per quote) are split into chunks and priced in parallel by a process pool instead,
+while the event loop carries on.  Smaller jobs are priced inline: sending them to another process
+would cost more than it saves.
+
+Inputs and outputs go through shared memory rather than being pickled: the broadcast inputs are
+written once to a shared block, each worker prices its slice of it into a shared output block, and only
+the error messages are sent back.
+
+The pool is started on first use and belongs to the process, so each server worker has its own, and by
+default they share the CPU cores between them rather than each starting a process per core.
+"""
+import asyncio
+import math
+import os
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .enums import Greek
+from .implied_volatility import implied_volatility_batch
+from .pricing import ArrayLike, OptionTypeLike, black76_batch, call_mask
+from ..settings import settings
+
+# (shared memory name, array names, array length), enough for another process to attach to a SharedArrays.
+SharedArraysHandle = Tuple[str, Tuple[str, ...], int]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+class SharedArrays:
+    """
+    Float arrays of the same length, in one block of shared memory.
+
+    The process that creates the block unlinks it, processes that attach to it only close it.
+    """
+
+    def __init__(self, names: Sequence[str], size: int, name: Optional[str] = None):
+        self.names = tuple(names)
+        self.size = size
+        self.memory = SharedMemory(
+            name=name,
+            create=name is None,
+            # a block can't be empty.
+            size=max(len(self.names) * size * np.dtype(float).itemsize, 1),
+        )
+        block = np.ndarray((len(self.names), size), dtype=float, buffer=self.memory.buf)
+        self.arrays: Dict[str, np.ndarray] = dict(zip(self.names, block))
+
+    @classmethod
+    def attach(cls, handle: SharedArraysHandle) -> "SharedArrays":
+        name, names, size = handle
+        return cls(names, size, name)
+
+    def handle(self) -> SharedArraysHandle:
+        return self.memory.name, self.names, self.size
+
+    def close(self, unlink: bool = False):
+        # the arrays are views of the block, it can't be closed while they exist.
+        self.arrays = {}
+        self.memory.close()
+        if unlink:
+            self.memory.unlink()
+
+
+def pool_workers() -> int:
+    """
+    :return: settings.pricing_pool_workers, or when it isn't set the number of CPU cores shared between the
+    server workers (settings.server_workers, see `pricer_app.server`), at least 1.
+    """
+    if settings.pricing_pool_workers is None:
+        return max((os.cpu_count() or 1) // (settings.server_workers or 1), 1)
+    return settings.pricing_pool_workers
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """
+    Get the process pool, starting it if needed, or replacing it if it is broken.
+    """
+    global _pool
+    if _pool is not None and _pool._broken:
+        # a worker died (e.g. killed when out of memory) and took the pool with it, it can't run anything else.
+        _pool.shutdown(wait=False)
+        _pool = None
+    if _pool is None:
+        # spawn rather than fork: forking a process with an event loop and database connections isn't safe.
+        _pool = ProcessPoolExecutor(pool_workers(), mp_context=get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    """
+    Stop the process pool, if it was started, once the jobs in progress are done.
+    """
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def use_pool(size: int, threshold: int) -> bool:
+    return pool_workers() > 0 and size >= threshold
+
+
+def chunk_ranges(size: int, workers: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    >>> chunk_ranges(10, 4, 100)
+    [(0, 3), (3, 6), (6, 9), (9, 10)]
+    >>> chunk_ranges(10, 2, 4)
+    [(0, 4), (4, 8), (8, 10)]
+
+    :return: (start, stop) of each chunk, at most chunk_size long and enough to keep every worker busy.
+    """
+    step = max(min(chunk_size, math.ceil(size / workers)), 1)
+    return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+
+async def run_chunked(
+    chunk_function: Callable[..., Dict[int, str]],
+    inputs: Dict[str, np.ndarray],
+    shape: Tuple[int, ...],
+    output_names: Sequence[str],
+    *args,
+) -> Tuple[Dict[str, np.ndarray], Dict[int, str]]:
+    """
+    Run chunk_function over chunks of the inputs in the process pool, see `black76_chunk`.
+
+    Inputs of the full shape go through shared memory, the others (scalars, the rows or columns of
+    a grid) are small enough to be sent to every worker as they are.
+
+    If the pool breaks while the job runs, the job is run again once in a new pool.
+
+    :param inputs: {name: array}, that broadcast together to shape
+    :param args: passed on to chunk_function after the inputs, the shape and the chunk's range
+    :return: tuple of ({output name: array of shape}, {index into the flattened shape: error message})
+    """
+    size = math.prod(shape)
+    full_names = [name for name, array in inputs.items() if array.shape == shape]
+    partial_inputs = {
+        name: array for name, array in inputs.items() if name not in full_names
+    }
+    shared_inputs = SharedArrays(full_names, size)
+    shared_outputs = SharedArrays(output_names, size)
+    try:
+        for name in full_names:
+            shared_inputs.arrays[name][:] = inputs[name].ravel()
+
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            try:
+                chunk_errors = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(
+                            get_pool(),
+                            chunk_function,
+                            shared_inputs.handle(),
+                            partial_inputs,
+                            shape,
+                            shared_outputs.handle(),
+                            start,
+                            stop,
+                            *args,
+                        )
+                        for start, stop in chunk_ranges(
+                            size, pool_workers(), settings.pricing_pool_chunk_size
+                        )
+                    )
+                )
+                break
+            except BrokenProcessPool:
+                # get_pool replaces the broken pool.
+                if attempt:
+                    raise
+        outputs = {
+            name: array.reshape(shape).copy()
+            for name, array in shared_outputs.arrays.items()
+        }
+    finally:
+        shared_inputs.close(unlink=True)
+        shared_outputs.close(unlink=True)
+
+    errors = {}
+    for chunk in chunk_errors:
+        errors.update(chunk)
+    return outputs, dict(sorted(errors.items()))
+
+
+def run_on_chunk(
+    price: Callable[
+        [Dict[str, np.ndarray]], Tuple[Dict[str, np.ndarray], Dict[int, str]]
+    ],
+    inputs_handle: SharedArraysHandle,
+    partial_inputs: Dict[str, np.ndarray],
+    shape: Tuple[int, ...],
+    outputs_handle: SharedArraysHandle,
+    start: int,
+    stop: int,
+) -> Dict[int, str]:
+    """
+    In a pool worker: price the inputs from start to stop, in the flattened shape, into the outputs.
+
+    :param price: called with {name: 1 dimensional input chunk}, returns
+    ({output name: values}, {index in chunk: error message})
+    :return: {index: error message}
+    """
+    shared_inputs = SharedArrays.attach(inputs_handle)
+    shared_outputs = SharedArrays.attach(outputs_handle)
+    try:
+        chunk = {
+            name: array[start:stop] for name, array in shared_inputs.arrays.items()
+        }
+        indices = None
+        for name, array in partial_inputs.items():
+            if array.size == 1:
+                chunk[name] = array.reshape(())
+                continue
+            # index the broadcast views rather than flattening them, which would copy the whole shape.
+            if indices is None:
+                indices = np.unravel_index(np.arange(start, stop), shape)
+            chunk[name] = np.broadcast_to(array, shape)[indices]
+
+        values, errors = price(chunk)
+        del chunk
+        for name, value in values.items():
+            shared_outputs.arrays[name][start:stop] = value
+        return {start + index: message for index, message in errors.items()}
+    finally:
+        shared_inputs.close()
+        shared_outputs.close()
+
+
+def black76_chunk(*chunk_args, greeks: Tuple[Greek, ...]) -> Dict[int, str]:
+    """
+    In a pool worker: `pricing.black76_batch` of a chunk, see `run_on_chunk` for the arguments.
+    """
+
+    def price(inputs):
+        return black76_batch(
+            inputs["is_call"].astype(bool),
+            inputs["F"],
+            inputs["K"],
+            inputs["r"],
+            inputs["sigma"],
+            inputs["T"],
+            greeks,
+            inputs.get("exclude"),
+        )
+
+    return run_on_chunk(price, *chunk_args)
+
+
+def implied_volatility_chunk(*chunk_args) -> Dict[int, str]:
+    """
+    In a pool worker: `implied_volatility.implied_volatility_batch` of a chunk, see `run_on_chunk`
+    for the arguments.
+    """
+
+    def solve(inputs):
+        volatilities, errors = implied_volatility_batch(
+            inputs["is_call"].astype(bool),
+            inputs["price"],
+            inputs["F"],
+            inputs["K"],
+            inputs["r"],
+            inputs["T"],
+        )
+        return {"volatility": volatilities}, errors
+
+    return run_on_chunk(solve, *chunk_args)
+
+
+def job_inputs(
+    option_type: OptionTypeLike, **arrays: ArrayLike
+) -> Tuple[Dict[str, np.ndarray], Tuple[int, ...]]:
+    """
+    :return: tuple of ({"is_call": call mask, <name>: float array, ...}, the shape they broadcast to)
+    """
+    inputs = {"is_call": call_mask(option_type)}
+    for name, array in arrays.items():
+        inputs[name] = np.asarray(array, dtype=float)
+    return inputs, np.broadcast_shapes(*(array.shape for array in inputs.values()))
+
+
+async def price_black76_batch(
+    option_type: OptionTypeLike,
+    F: ArrayLike,
+    K: ArrayLike,
+    r: ArrayLike,
+    sigma: ArrayLike,
+    T: ArrayLike,
+    greeks: Iterable[Greek] = (),
+    exclude: ArrayLike = False,
+) -> Tuple[Dict[str, np.ndarray], Dict[int, str]]:
+    """
+    `pricing.black76_batch`, in the process pool when there are at least settings.pricing_pool_threshold options.
+    """
+    greeks = tuple(Greek(greek) for greek in greeks)
+    inputs, shape = job_inputs(
+        option_type, F=F, K=K, r=r, sigma=sigma, T=T, exclude=exclude
+    )
+    if not use_pool(math.prod(shape), settings.pricing_pool_threshold):
+        exclude = inputs.pop("exclude")
+        return black76_batch(*inputs.values(), greeks, exclude)
+    return await run_chunked(
+        partial(black76_chunk, greeks=greeks),
+        inputs,
+        shape,
+        ["pv", *(greek.value for greek in greeks)],
+    )
+
+
+async def solve_implied_volatility_batch(
+    option_type: OptionTypeLike,
+    price: ArrayLike,
+    F: ArrayLike,
+    K: ArrayLike,
+    r: ArrayLike,
+    T: ArrayLike,
+) -> Tuple[np.ndarray, Dict[int, str]]:
+    """
+    `implied_volatility.implied_volatility_batch`, in the process pool when there are at least
+    settings.implied_volatility_pool_threshold quotes.
+    """
+    inputs, shape = job_inputs(option_type, price=price, F=F, K=K, r=r, T=T)
+    if not use_pool(math.prod(shape), settings.implied_volatility_pool_threshold):
+        return implied_volatility_batch(*inputs.values())
+    outputs, errors = await run_chunked(
+        implied_volatility_chunk, inputs, shape, ["volatility"]
+    )
+    return outputs["volatility"], errors
@@ -0,0 +1,240 @@
+"""
+Implied volatility for the Black76 model.
+
+Given option prices, find the volatility that `black76` needs to reproduce them.
+
+The solver works on whole arrays at once: each iteration is a single vectorized Black76
+evaluation of the present value and vega (see `pricing._black76`), followed by a Newton step
+that falls back to bisection whenever the step would leave the bracket known to contain the root.
+"""
+from math import pi, sqrt
+from typing import Dict, Tuple
+
+import numpy as np
+
+from .enums import Greek, OptionType
+from .pricing import (
+    ArrayLike,
+    OptionTypeLike,
+    _black76,
+    black76_input_errors,
+    call_mask,
+)
+
+# Volatility search range, prices that need a volatility outside it are reported as errors.
+MIN_VOLATILITY = 1e-8
+MAX_VOLATILITY = 100.0
+
+
+def implied_volatility(
+    option_type: OptionType,
+    price: float,
+    F: float,
+    K: float,
+    r: float,
+    T: float,
+    tol: float = 1e-10,
+    max_iterations: int = 100,
+) -> float:
+    """
+    Calculate the Black76 implied volatility of an option from its price.
+
+    Args:
+    option_type (OptionType): Type of the option (Call or Put)
+    price (float): Present value of the option
+    F (float): Forward price of the underlying asset
+    K (float): Option strike price
+    r (float): Risk-free interest rate
+    T (float): Time to maturity in years
+    tol (float): Stop once the repriced option is within this relative tolerance of price
+    max_iterations (int): Give up after this many iterations
+
+    Returns:
+    float: Volatility of the underlying asset
+
+    Raises:
+    ValueError: if the inputs are invalid, the price is outside the no-arbitrage bounds, or
+    the solver does not converge (see `implied_volatility_batch`).
+    """
+    volatilities, errors = implied_volatility_batch(
+        option_type, price, F, K, r, T, tol, max_iterations
+    )
+    if errors:
+        raise ValueError(errors[0])
+    return volatilities.item()
+
+
+def implied_volatility_batch(
+    option_type: OptionTypeLike,
+    price: ArrayLike,
+    F: ArrayLike,
+    K: ArrayLike,
+    r: ArrayLike,
+    T: ArrayLike,
+    tol: float = 1e-10,
+    max_iterations: int = 100,
+) -> Tuple[np.ndarray, Dict[int, str]]:
+    """
+    Calculate the Black76 implied volatility of many options in one pass.
+
+    Arguments are broadcast together like `pricing.black76_array`, so a price ladder is solved
+    with F, r and T as scalars and price, K and option_type as arrays.
+
+    Options that can't be solved get a NaN volatility and an error, so one bad quote doesn't fail the batch.
+
+    :return: tuple of (volatilities, {index: error message}) with indices into the flattened broadcast shape.
+    """
+    is_call, price, F, K, r, T = np.broadcast_arrays(
+        call_mask(option_type),
+        *(np.asarray(x, dtype=float) for x in (price, F, K, r, T)),
+    )
+    shape = price.shape
+    is_call, price, F, K, r, T = (
+        np.array(x).ravel() for x in (is_call, price, F, K, r, T)
+    )
+
+    errors_by_index: Dict[int, str] = {}
+    for message, indices in black76_input_errors(F, K, r, 0.0, T).items():
+        for index in indices:
+            errors_by_index[index] = " ".join(
+                filter(None, [errors_by_index.get(index), message])
+            )
+
+    # No-arbitrage bounds: a call is worth between its discounted intrinsic value and the
+    # discounted forward, a put between its discounted intrinsic value and the discounted strike.
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        discount = np.exp(-r * T)
+        lower_bound = discount * np.maximum(np.where(is_call, F - K, K - F), 0.0)
+        upper_bound = discount * np.where(is_call, F, K)
+    out_of_bounds = ~((price > lower_bound) & (price < upper_bound)) & (T > 0)
+    for index in np.flatnonzero(out_of_bounds).tolist():
+        errors_by_index.setdefault(
+            index,
+            "Option price must be between the no-arbitrage bounds "
+            f"{lower_bound[index]} and {upper_bound[index]}.",
+        )
+    for index in np.flatnonzero(T == 0).tolist():
+        errors_by_index.setdefault(
+            index, "Time to maturity (T) must be positive to imply a volatility."
+        )
+
+    # Solve for the out-of-the-money option of each pair (put-call parity), so the intrinsic
+    # value doesn't swamp the small time value that the volatility is found from.
+    in_the_money = np.where(is_call, F > K, K > F)
+    otm_is_call = is_call ^ in_the_money
+    otm_price = np.where(
+        in_the_money, price - discount * np.where(is_call, F - K, K - F), price
+    )
+
+    volatility = np.full(price.shape, np.nan)
+    solvable = np.ones(price.shape, dtype=bool)
+    solvable[list(errors_by_index)] = False
+    if solvable.any():
+        volatility[solvable], converged, out_of_range = _solve(
+            otm_is_call[solvable],
+            otm_price[solvable],
+            F[solvable],
+            K[solvable],
+            r[solvable],
+            T[solvable],
+            tol,
+            max_iterations,
+        )
+        solvable_indices = np.flatnonzero(solvable)
+        for index in solvable_indices[~converged & out_of_range].tolist():
+            errors_by_index[index] = (
+                "Implied volatility is outside the search range "
+                f"{MIN_VOLATILITY} to {MAX_VOLATILITY}."
+            )
+        for index in solvable_indices[~converged & ~out_of_range].tolist():
+            errors_by_index[
+                index
+            ] = f"Implied volatility did not converge after {max_iterations} iterations."
+        volatility[solvable_indices[~converged]] = np.nan
+
+    return volatility.reshape(shape), errors_by_index
+
+
+def _initial_guess(is_call, price, F, K, r, T) -> np.ndarray:
+    """
+    Corrado-Miller approximation of the implied volatility, used to start the Newton iterations.
+
+    Puts are converted to calls with put-call parity, the approximation is exact enough near the
+    money that Newton typically converges in a handful of iterations.
+    """
+    discount = np.exp(-r * T)
+    call_price = np.where(is_call, price, price + discount * (F - K))
+    half_intrinsic = discount * (F - K) / 2
+    excess = call_price - half_intrinsic
+    radicand = np.maximum(excess**2 - (discount * (F - K)) ** 2 / pi, 0.0)
+    total_volatility = (
+        sqrt(2 * pi) / (discount * (F + K)) * (excess + np.sqrt(radicand))
+    )
+    return total_volatility / np.sqrt(T)
+
+
+def _solve(is_call, price, F, K, r, T, tol, max_iterations):
+    """
+    Vega guided Newton iterations, bracketed by bisection.
+
+    The Black76 price increases with volatility, so every evaluation tightens a bracket
+    [low, high] around the root; a Newton step that would leave the bracket, or a vega too small
+    to divide by, is replaced by bisection.
+
+    Only a volatility that reprices the option to within tol is converged; a bracket that can't
+    shrink any further stops the iterations, and if it is squeezed against MIN_VOLATILITY or
+    MAX_VOLATILITY the price needs a volatility outside the search range.
+
+    :return: tuple of (volatilities, converged mask, out of range mask), inputs must already be
+    validated and should be out-of-the-money options.
+    """
+    low = np.full(price.shape, MIN_VOLATILITY)
+    high = np.full(price.shape, MAX_VOLATILITY)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        volatility = _initial_guess(is_call, price, F, K, r, T)
+    volatility = np.where(
+        np.isfinite(volatility) & (volatility > low) & (volatility < high),
+        volatility,
+        0.5,
+    )
+
+    converged = np.zeros(price.shape, dtype=bool)
+    active = np.arange(price.size)
+    for _ in range(max_iterations):
+        values = _black76(
+            is_call[active],
+            F[active],
+            K[active],
+            r[active],
+            volatility[active],
+            T[active],
+            [Greek.vega],
+        )
+        difference = values["pv"] - price[active]
+
+        too_high = difference > 0
+        high[active] = np.where(too_high, volatility[active], high[active])
+        low[active] = np.where(too_high, low[active], volatility[active])
+
+        # Converged once the price is matched to within tol (relative to the price, so far
+        # out-of-the-money options are solved too); give up when the bracket can't shrink any further.
+        matched = np.abs(difference) <= tol * price[active]
+        converged[active[matched]] = True
+        done = matched | (high[active] - low[active] <= 4 * np.spacing(high[active]))
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            newton = volatility[active] - difference / values["vega"]
+        bisection = 0.5 * (low[active] + high[active])
+        in_bracket = (newton > low[active]) & (newton < high[active])
+        volatility[active] = np.where(
+            done, volatility[active], np.where(in_bracket, newton, bisection)
+        )
+
+        active = active[~done]
+        if not active.size:
+            break
+
+    out_of_range = (high - MIN_VOLATILITY <= 4 * np.spacing(MIN_VOLATILITY)) | (
+        MAX_VOLATILITY - low <= 4 * np.spacing(MAX_VOLATILITY)
+    )
+    return volatility, converged, out_of_range
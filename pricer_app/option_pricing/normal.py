@@ -0,0 +1,46 @@
+"""
+Standard normal distribution functions for the pricing hot path.
+
+`scipy.stats.norm` goes through the generic distribution machinery on every call, which costs far
+more than the few floating point operations Black76 needs, and importing `scipy.stats` is slow.
+These call the underlying special functions directly: `math.erfc` for scalars and
+`scipy.special.ndtr` for arrays; scipy is only imported once an array is priced.
+"""
+from math import erfc, exp, pi, sqrt
+
+import numpy as np
+
+SQRT_2 = sqrt(2.0)
+SQRT_2PI = sqrt(2.0 * pi)
+
+
+def norm_cdf(x: float) -> float:
+    """
+    Standard normal cumulative distribution function of a scalar.
+
+    Uses erfc rather than 1 + erf, so the lower tail keeps full relative precision.
+    """
+    return 0.5 * erfc(-x / SQRT_2)
+
+
+def norm_pdf(x: float) -> float:
+    """
+    Standard normal probability density function of a scalar.
+    """
+    return exp(-0.5 * x * x) / SQRT_2PI
+
+
+def norm_cdf_array(x: np.ndarray) -> np.ndarray:
+    """
+    Standard normal cumulative distribution function, element-wise over an array.
+    """
+    from scipy.special import ndtr
+
+    return ndtr(x)
+
+
+def norm_pdf_array(x: np.ndarray) -> np.ndarray:
+    """
+    Standard normal probability density function, element-wise over an array.
+    """
+    return np.exp(-0.5 * np.square(x)) / SQRT_2PI
@@ -1,7 +1,23 @@
-from math import exp, log, sqrt
-from scipy.stats import norm
+from math import exp, isfinite, isnan, log, sqrt
+from typing import Dict, Iterable, Optional, Sequence, Tuple, Union
 
-from .enums import OptionType
+import numpy as np
+
+from .enums import Greek, OptionType
+from .normal import norm_cdf, norm_cdf_array, norm_pdf, norm_pdf_array
+
+ArrayLike = Union[float, Sequence[float], np.ndarray]
+OptionTypeLike = Union[OptionType, str, Sequence[Union[OptionType, str]], np.ndarray]
+
+# (argument name, name in error messages) for each Black76 input, in the order they are validated;
+# each must be a non-negative number.
+BLACK76_INPUT_NAMES = (
+    ("F", "Forward price (F)"),
+    ("K", "Strike price (K)"),
+    ("r", "Risk-free interest rate (r)"),
+    ("sigma", "Volatility (sigma)"),
+    ("T", "Time to maturity (T)"),
+)
 
 
 def black76(
@@ -21,22 +37,334 @@ def black76(
     Returns:
     float: Present value of the option
     """
+    _validate_black76_inputs(F, K, r, sigma, T)
 
-    if F < 0:
-        raise ValueError("Forward price (F) must be non-negative.")
-    if K < 0:
-        raise ValueError("Strike price (K) must be non-negative.")
-    if r < 0:
-        raise ValueError("Risk-free interest rate (r) must be non-negative.")
-    if sigma < 0:
-        raise ValueError("Volatility (sigma) must be non-negative.")
-    if T < 0:
-        raise ValueError("Time to maturity (T) must be non-negative.")
+    if sigma * sqrt(T) == 0:
+        # with no volatility or time left, the option is worth its discounted intrinsic value.
+        intrinsic_value = F - K if option_type == OptionType.call else K - F
+        return exp(-r * T) * max(intrinsic_value, 0.0)
 
     d1 = (log(F / K) + 0.5 * sigma**2 * T) / (sigma * sqrt(T))
     d2 = d1 - sigma * sqrt(T)
 
     if option_type == OptionType.call:
-        return exp(-r * T) * (F * norm.cdf(d1) - K * norm.cdf(d2))
+        return exp(-r * T) * (F * norm_cdf(d1) - K * norm_cdf(d2))
     else:
-        return exp(-r * T) * (K * norm.cdf(-d2) - F * norm.cdf(-d1))
+        return exp(-r * T) * (K * norm_cdf(-d2) - F * norm_cdf(-d1))
+
+
+def black76_greeks(
+    option_type: OptionType,
+    F: float,
+    K: float,
+    r: float,
+    sigma: float,
+    T: float,
+    greeks: Iterable[Greek] = tuple(Greek),
+) -> Dict[str, float]:
+    """
+    Calculate the present value and analytic Greeks of an option using the Black76 formula.
+
+    d1, d2 and the discount factor are computed once and shared by the present value and every Greek.
+    Greeks are with respect to the forward price (delta, gamma), volatility (vega), the risk-free
+    rate (rho) and the passage of time (theta, per year, i.e. -dV/dT).
+
+    Args are as for `black76`, plus:
+    greeks (Iterable[Greek]): The Greeks to calculate, defaults to all of them
+
+    Returns:
+    Dict[str, float]: {"pv": present value, <greek>: value, ...}
+
+    Raises:
+    ValueError: if an input is invalid, or a Greek is not a finite number, e.g. the gamma of an option at the
+    money with no volatility or time to maturity left.
+    """
+    _validate_black76_inputs(F, K, r, sigma, T)
+
+    if sigma * sqrt(T) == 0:
+        # d1 and d2 are undefined, take the limits of the formula like the array pricers (see `_black76`).
+        is_call = np.asarray(OptionType(option_type) == OptionType.call)
+        values = {
+            name: value.item()
+            for name, value in _black76(is_call, F, K, r, sigma, T, greeks).items()
+        }
+        for name, value in values.items():
+            if not isfinite(value):
+                raise ValueError(non_finite_error(name))
+        return values
+
+    sqrt_t = sqrt(T)
+    d1 = (log(F / K) + 0.5 * sigma**2 * T) / (sigma * sqrt_t)
+    d2 = d1 - sigma * sqrt_t
+    discount = exp(-r * T)
+
+    if option_type == OptionType.call:
+        pv = discount * (F * norm_cdf(d1) - K * norm_cdf(d2))
+        delta = discount * norm_cdf(d1)
+    else:
+        pv = discount * (K * norm_cdf(-d2) - F * norm_cdf(-d1))
+        delta = -discount * norm_cdf(-d1)
+
+    # discounted standard normal density at d1, shared by gamma, vega and theta.
+    discounted_pdf_d1 = discount * norm_pdf(d1)
+
+    values = {"pv": pv}
+    for greek in map(Greek, greeks):
+        if greek == Greek.delta:
+            values[greek.value] = delta
+        elif greek == Greek.gamma:
+            values[greek.value] = discounted_pdf_d1 / (F * sigma * sqrt_t)
+        elif greek == Greek.vega:
+            values[greek.value] = F * discounted_pdf_d1 * sqrt_t
+        elif greek == Greek.theta:
+            values[greek.value] = r * pv - F * discounted_pdf_d1 * sigma / (2 * sqrt_t)
+        elif greek == Greek.rho:
+            values[greek.value] = -T * pv
+    return values
+
+
+def call_mask(option_type: OptionTypeLike) -> np.ndarray:
+    """
+    Convert an option type, or a sequence of them, into a boolean array that is True for calls.
+
+    A boolean array is passed through unchanged, so callers that already hold a mask don't pay for the conversion.
+
+    :raises: ValueError if any element is not a valid OptionType.
+    """
+    if isinstance(option_type, (str, OptionType)):
+        return np.asarray(OptionType(option_type) == OptionType.call)
+    if isinstance(option_type, np.ndarray) and option_type.dtype == bool:
+        return option_type
+    option_types = np.asarray(option_type, dtype=object)
+    if option_types.size and all(
+        isinstance(o, (bool, np.bool_)) for o in option_types.flat
+    ):
+        return option_types.astype(bool)
+    is_call = np.frompyfunc(lambda o: OptionType(o) == OptionType.call, 1, 1)
+    return is_call(option_types).astype(bool)
+
+
+def black76_input_errors(
+    F: ArrayLike, K: ArrayLike, r: ArrayLike, sigma: ArrayLike, T: ArrayLike
+) -> dict:
+    """
+    Check Black76 inputs element-wise, without stopping at the first bad value.
+
+    Inputs are broadcast together first, so the indices refer to positions in the flattened broadcast shape.
+
+    :return: dict of {error message: [offending indices]}, empty if all inputs are valid.
+    """
+    inputs = dict(
+        zip(("F", "K", "r", "sigma", "T"), np.broadcast_arrays(F, K, r, sigma, T))
+    )
+    errors = {}
+    for name, label in BLACK76_INPUT_NAMES:
+        value = np.asarray(inputs[name], dtype=float)
+        for message, offending in (
+            (f"{label} must be a number.", np.isnan(value)),
+            (f"{label} must be non-negative.", value < 0),
+        ):
+            if offending.any():
+                errors[message] = np.flatnonzero(offending).tolist()
+    return errors
+
+
+def black76_array(
+    option_type: OptionTypeLike,
+    F: ArrayLike,
+    K: ArrayLike,
+    r: ArrayLike,
+    sigma: ArrayLike,
+    T: ArrayLike,
+) -> np.ndarray:
+    """
+    Calculate the present value of many options in one pass using the Black76 formula.
+
+    Each argument may be a scalar or an array, all arguments are broadcast together using the
+    usual NumPy rules, so a strike ladder is priced with F, r, sigma and T as scalars and K as an array.
+
+    Args:
+    option_type (OptionTypeLike): Option type(s), as OptionType values, strings or a boolean "is call" array
+    F (ArrayLike): Forward price(s) of the underlying asset
+    K (ArrayLike): Option strike price(s)
+    r (ArrayLike): Risk-free interest rate(s)
+    sigma (ArrayLike): Volatility(ies) of the underlying asset
+    T (ArrayLike): Time(s) to maturity in years
+
+    Returns:
+    np.ndarray: Present value of each option, in the broadcast shape of the inputs
+
+    Raises:
+    ValueError: if any input is negative or NaN, the message lists every offending index for each rule
+    (see `black76_input_errors`).
+    """
+    return black76_array_greeks(option_type, F, K, r, sigma, T, greeks=())["pv"]
+
+
+def black76_array_greeks(
+    option_type: OptionTypeLike,
+    F: ArrayLike,
+    K: ArrayLike,
+    r: ArrayLike,
+    sigma: ArrayLike,
+    T: ArrayLike,
+    greeks: Iterable[Greek] = tuple(Greek),
+) -> Dict[str, np.ndarray]:
+    """
+    Calculate the present value and analytic Greeks of many options in one pass.
+
+    Arguments and validation are as for `black76_array`, the Greeks are as for `black76_greeks`.
+
+    Returns:
+    Dict[str, np.ndarray]: {"pv": present values, <greek>: values, ...} in the broadcast shape of the inputs
+    """
+    errors = black76_input_errors(F, K, r, sigma, T)
+    if errors:
+        raise ValueError(
+            " ".join(
+                f"{message} Offending indices: {indices}"
+                for message, indices in errors.items()
+            )
+        )
+
+    return _black76(call_mask(option_type), F, K, r, sigma, T, greeks)
+
+
+def black76_batch(
+    option_type: OptionTypeLike,
+    F: ArrayLike,
+    K: ArrayLike,
+    r: ArrayLike,
+    sigma: ArrayLike,
+    T: ArrayLike,
+    greeks: Iterable[Greek] = (),
+    exclude: Optional[ArrayLike] = None,
+) -> Tuple[Dict[str, np.ndarray], Dict[int, str]]:
+    """
+    Price many options like `black76_array_greeks`, but report invalid inputs per option instead of raising.
+
+    Options with invalid inputs, NaN included, are priced as NaN, so one bad strike doesn't fail the whole batch.
+    A present value or requested Greek that is not a finite number, e.g. the gamma of an option at the money
+    with no volatility or time to maturity left, is NaN too with an error of its own; the option's other
+    values are kept.
+
+    :param exclude: mask broadcast with the inputs, of options that are priced as NaN without an error,
+    for callers that report errors for them themselves (e.g. options whose market data is missing).
+    :return: tuple of ({"pv": present values, <greek>: values, ...}, {index: error message}) with
+    indices into the flattened broadcast shape; the error message joins every rule the option breaks.
+    """
+    excluded = np.zeros((), dtype=bool) if exclude is None else np.asarray(exclude)
+    excluded = np.broadcast_to(
+        excluded.astype(bool),
+        np.broadcast_shapes(
+            excluded.shape, *(np.shape(x) for x in (option_type, F, K, r, sigma, T))
+        ),
+    ).ravel()
+
+    errors_by_index: Dict[int, str] = {}
+    for message, indices in black76_input_errors(F, K, r, sigma, T).items():
+        for index in indices:
+            if not excluded[index]:
+                errors_by_index[index] = " ".join(
+                    filter(None, [errors_by_index.get(index), message])
+                )
+    not_priced = excluded.copy()
+    not_priced[list(errors_by_index)] = True
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = _black76(call_mask(option_type), F, K, r, sigma, T, greeks)
+    for name, value in values.items():
+        shape = value.shape
+        value = value.ravel()
+        value[not_priced] = np.nan
+        not_finite = ~np.isfinite(value) & ~not_priced
+        for index in np.flatnonzero(not_finite).tolist():
+            errors_by_index[index] = " ".join(
+                filter(None, [errors_by_index.get(index), non_finite_error(name)])
+            )
+        value[not_finite] = np.nan
+        values[name] = value.reshape(shape)
+    return values, dict(sorted(errors_by_index.items()))
+
+
+def non_finite_error(name: str) -> str:
+    """
+    :return: the error message for a present value ("pv") or Greek that is not a finite number.
+    """
+    return f"The {name} of the option is not a finite number."
+
+
+def _validate_black76_inputs(F, K, r, sigma, T):
+    """
+    :raises: ValueError for the first Black76 input that is not a non-negative number (see `BLACK76_INPUT_NAMES`).
+    """
+    inputs = {"F": F, "K": K, "r": r, "sigma": sigma, "T": T}
+    for name, label in BLACK76_INPUT_NAMES:
+        if isnan(inputs[name]):
+            raise ValueError(f"{label} must be a number.")
+        if inputs[name] < 0:
+            raise ValueError(f"{label} must be non-negative.")
+
+
+def _black76(is_call, F, K, r, sigma, T, greeks=()) -> Dict[str, np.ndarray]:
+    """
+    Black76 kernel shared by the array pricers, inputs are not validated.
+
+    d1, d2 and the discount factor are computed once for the present value and all requested Greeks.
+
+    Options with no volatility or no time to maturity left take the limits of the formula: d1 and d2 tend
+    to +/- infinity either side of the money and to 0 at it, so the present value is the discounted
+    intrinsic value.  Their gamma, and the theta of those with no time left, are 0 away from the money
+    and infinite at it.
+    """
+    is_call, F, K, r, sigma, T = np.broadcast_arrays(
+        is_call, *(np.asarray(x, dtype=float) for x in (F, K, r, sigma, T))
+    )
+
+    sqrt_t = np.sqrt(T)
+    sigma_sqrt_t = sigma * sqrt_t
+    no_total_volatility = sigma_sqrt_t == 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        log_moneyness = np.log(F / K)
+        d1 = np.where(
+            no_total_volatility,
+            np.select([log_moneyness > 0, log_moneyness < 0], [np.inf, -np.inf], 0.0),
+            (log_moneyness + 0.5 * sigma**2 * T) / sigma_sqrt_t,
+        )
+    d2 = d1 - sigma_sqrt_t
+    discount = np.exp(-r * T)
+
+    call_pv = discount * (F * norm_cdf_array(d1) - K * norm_cdf_array(d2))
+    put_pv = discount * (K * norm_cdf_array(-d2) - F * norm_cdf_array(-d1))
+    pv = np.where(is_call, call_pv, put_pv)
+
+    values = {"pv": pv}
+    greeks = [Greek(greek) for greek in greeks]
+    if not greeks:
+        return values
+
+    # discounted standard normal density at d1, shared by gamma, vega and theta.
+    discounted_pdf_d1 = discount * norm_pdf_array(d1)
+    for greek in greeks:
+        if greek == Greek.delta:
+            values[greek.value] = np.where(
+                is_call, discount * norm_cdf_array(d1), -discount * norm_cdf_array(-d1)
+            )
+        elif greek == Greek.gamma:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                gamma = discounted_pdf_d1 / (F * sigma_sqrt_t)
+            values[greek.value] = np.where(
+                no_total_volatility, np.where(d1 == 0, np.inf, 0.0), gamma
+            )
+        elif greek == Greek.vega:
+            values[greek.value] = F * discounted_pdf_d1 * sqrt_t
+        elif greek == Greek.theta:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                time_decay = F * discounted_pdf_d1 * sigma / (2 * sqrt_t)
+            time_decay = np.where(
+                T == 0, np.where((d1 == 0) & (sigma > 0), np.inf, 0.0), time_decay
+            )
+            values[greek.value] = r * pv - time_decay
+        elif greek == Greek.rho:
+            values[greek.value] = -T * pv
+    return values
@@ -1,53 +1,576 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+import math
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..database import get_session
+from ..settings import settings
+from ..market_data.cache import Black76MarketData, get_black76_market_data_cached
+from ..market_data.expiries import time_to_expiration
 from ..market_data.models import MarketData
+from ..market_data.volatility_surface import get_volatility_smile
 
-from .schemas import OptionPricingData
-from .pricing import black76
-from ..market_data.schemas import MarketDataRetrieve
+from .enums import Greek, VolatilitySource
+from .executor import price_black76_batch, solve_implied_volatility_batch
+from .scenarios import SCENARIO_AXES, scenario_grid
+from .schemas import (
+    ImpliedVolatilityData,
+    OptionPricingData,
+    PortfolioLegData,
+    ScenarioData,
+)
+from .pricing import black76, black76_greeks, call_mask, non_finite_error
 
 router = APIRouter()
 
 
+def get_greeks(
+    greeks: Optional[str] = Query(
+        None,
+        description="Comma separated Greeks to calculate alongside the PV, e.g. delta,vega",
+    )
+) -> List[Greek]:
+    """
+    Dependency that parses the "greeks" query parameter.
+
+    :raises: HTTPException 422 if any of the Greeks is not known.
+    """
+    if not greeks:
+        return []
+    names = [name.strip().lower() for name in greeks.split(",") if name.strip()]
+    valid_values = [item.value for item in Greek]
+    invalid = [name for name in names if name not in valid_values]
+    if invalid:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Invalid greeks '{', '.join(invalid)}'. Must be one of: {', '.join(valid_values)}.",
+        )
+    return [Greek(name) for name in names]
+
+
+def get_valuation_date(
+    valuation_date: Optional[date] = Query(
+        None,
+        description="Calculate the time to expiration from the contract's expiry date as seen on this date, "
+        "instead of using the stored time_to_expiration",
+    )
+) -> Optional[date]:
+    """
+    Dependency for the "valuation_date" query parameter, see `black76_parameters`.
+    """
+    return valuation_date
+
+
+def get_volatility_source(
+    volatility: VolatilitySource = Query(
+        VolatilitySource.market_data,
+        description="Price with the volatility stored with the market data, or with the volatility surface's "
+        "at each option's strike",
+    )
+) -> VolatilitySource:
+    """
+    Dependency for the "volatility" query parameter, see `get_surface_volatilities`.
+    """
+    return volatility
+
+
+def priced_result(
+    values: Dict[str, np.ndarray],
+    i: int,
+    greeks: List[Greek],
+    error: Optional[str] = None,
+) -> dict:
+    """
+    :return: {"pv": float} for the i-th option priced by `black76_batch`, with a "greeks" dict if any were requested,
+    or {"error": str} if it has no present value. Greeks that are not finite numbers are null, with the "error"
+    that `black76_batch` reported for them.
+    """
+    pv = values["pv"].flat[i].item()
+    if math.isnan(pv):
+        return {"error": error}
+    result = {"pv": pv}
+    if greeks:
+        greek_values = {
+            greek.value: values[greek.value].flat[i].item() for greek in greeks
+        }
+        # NaN isn't valid JSON.
+        result["greeks"] = {
+            name: None if math.isnan(value) else value
+            for name, value in greek_values.items()
+        }
+    if error:
+        result["error"] = error
+    return result
+
+
+def black76_parameters(
+    option_market_data_instance: Union[MarketData, Black76MarketData],
+    valuation_date: Optional[date] = None,
+) -> Tuple[float, float, float, float]:
+    """
+    Read the Black76 parameters of a market data object.
+
+    If a valuation date is given, the time to expiration is calculated from the contract's expiry date
+    (see `pricer_app.market_data.expiries.time_to_expiration`) instead of using the stored value.
+
+    :return: tuple of (F, r, sigma, T)
+    :raises: ValueError if the time to expiration can't be calculated from the contract.
+    """
+    if valuation_date is None:
+        T = option_market_data_instance.time_to_expiration
+    else:
+        T = time_to_expiration(
+            option_market_data_instance.exchange_code,
+            option_market_data_instance.contract,
+            valuation_date,
+        )
+
+    return (
+        option_market_data_instance.forward_price,
+        option_market_data_instance.risk_free_interest_rate,
+        option_market_data_instance.volatility,
+        T,
+    )
+
+
+async def get_black76_market_data(
+    session: AsyncSession, option_id: int, valuation_date: Optional[date] = None
+) -> Tuple[float, float, float, float]:
+    """
+    Fetch the Black76 market data for an option, through the market data cache, see `black76_parameters`.
+
+    :return: tuple of (F, r, sigma, T)
+    :raises: HTTPException 404 if the option market data object does not exist.
+    :raises: HTTPException 400 if the time to expiration can't be calculated for the valuation date.
+    """
+    option_market_data_instance = (
+        await get_black76_market_data_cached(session, [option_id])
+    ).get(option_id)
+
+    if option_market_data_instance is None:
+        raise HTTPException(status_code=404, detail="Option market data not found.")
+
+    try:
+        return black76_parameters(option_market_data_instance, valuation_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+
+async def get_black76_market_data_many(
+    session: AsyncSession,
+    option_ids: Iterable[int],
+    valuation_date: Optional[date] = None,
+) -> Tuple[Dict[int, Tuple[float, float, float, float]], Dict[int, str]]:
+    """
+    Fetch the Black76 market data for many options, through the market data cache with a single query
+    for the ones that aren't cached, see `black76_parameters`.
+
+    Each market data object is read once, however many times its id is passed.
+
+    :return: tuple of ({option_id: (F, r, sigma, T)}, {option_id: error message}),
+    ids that do not exist are left out of both.
+    """
+    option_market_data_instances = await get_black76_market_data_cached(
+        session, option_ids
+    )
+
+    black76_market_data = {}
+    errors = {}
+    for option_id, option_market_data_instance in option_market_data_instances.items():
+        try:
+            black76_market_data[option_id] = black76_parameters(
+                option_market_data_instance, valuation_date
+            )
+        except ValueError as e:
+            errors[option_id] = str(e.args[0])
+    return black76_market_data, errors
+
+
+async def get_surface_volatilities(
+    session: AsyncSession, option_ids: Sequence[int], K: Sequence[float]
+) -> Tuple[np.ndarray, Dict[int, str]]:
+    """
+    Read the volatility of each option at its strike from the smile of its contract's exchange, asset and
+    expiry (see `pricer_app.market_data.volatility_surface`), instead of the market data's own volatility.
+
+    :return: tuple of (volatilities, {index: error message}), volatilities are NaN where there is an
+    error, or where the option's market data does not exist (see `get_black76_market_data_many`).
+    """
+    K = np.asarray(K, dtype=float)
+    volatilities = np.full(K.shape, np.nan)
+    errors = {}
+    indices_by_option_id = defaultdict(list)
+    for i, option_id in enumerate(option_ids):
+        indices_by_option_id[option_id].append(i)
+
+    market_data = await get_black76_market_data_cached(session, indices_by_option_id)
+    for option_id, instance in market_data.items():
+        indices = indices_by_option_id[option_id]
+        try:
+            smile = await get_volatility_smile(
+                session, instance.exchange_code, instance.contract
+            )
+        except ValueError as e:
+            errors.update(dict.fromkeys(indices, str(e.args[0])))
+            continue
+        volatilities[indices] = smile.volatility(K[indices])
+    return volatilities, errors
+
+
+async def get_surface_volatility(
+    session: AsyncSession, option_id: int, K: Sequence[float]
+) -> np.ndarray:
+    """
+    `get_surface_volatilities` of options that share one market data object.
+
+    :raises: HTTPException 400 if the volatility surface has no smile for the option.
+    """
+    volatilities, errors = await get_surface_volatilities(
+        session, [option_id] * len(K), K
+    )
+    if errors:
+        raise HTTPException(status_code=400, detail=next(iter(errors.values())))
+    return volatilities
+
+
+# Declared before "/option_pricing/{option_id}" so "portfolio" isn't parsed as an option_id.
+@router.post("/option_pricing/portfolio")
+async def calculate_portfolio_pv(
+    legs_data: List[PortfolioLegData],
+    session: AsyncSession = Depends(get_session),
+    greeks: List[Greek] = Depends(get_greeks),
+    valuation_date: Optional[date] = Depends(get_valuation_date),
+    volatility_source: VolatilitySource = Depends(get_volatility_source),
+) -> dict:
+    """
+    Endpoint for calculating the present value (PV) of a portfolio of options.
+
+    All referenced market data objects are fetched with one query, and every leg is priced in a
+    single vectorized call.
+
+    Returns a dictionary with a "legs" list in request order, each entry is either
+    {"pv": float, "value": float}, where value is pv * quantity, plus a "greeks" dict of the requested
+    per unit Greeks (see `get_greeks`), or {"error": str} if the leg's
+    market data does not exist, its time to expiration can't be calculated for the valuation date,
+    the volatility surface has no smile for it (see `get_volatility_source`),
+    its pricing data is invalid, or its pv or value is not a finite number
+    (see `pricer_app.pricing.black76_batch`). A requested Greek that is not a finite number is null,
+    with an "error" saying so.
+    "total" is the sum of the values of the legs that could be priced.
+
+    :legs_data: List[PortfolioLegData]: The legs, each containing an option_id, the option type [Call/Put], strike price [K] and quantity.
+
+    :return: dict: A dictionary containing the per leg results and the portfolio total.
+    """
+    market_data, market_data_errors = await get_black76_market_data_many(
+        session, (leg_data.option_id for leg_data in legs_data), valuation_date
+    )
+    missing = {
+        i
+        for i, leg_data in enumerate(legs_data)
+        if leg_data.option_id not in market_data
+    }
+
+    # Legs without market data are left out of pricing and reported as errors below.
+    parameters = np.array(
+        [market_data.get(leg_data.option_id, (np.nan,) * 4) for leg_data in legs_data],
+        dtype=float,
+    ).reshape(-1, 4)
+    F, r, sigma, T = parameters.T
+    volatility_errors = {}
+    if volatility_source == VolatilitySource.surface:
+        sigma, volatility_errors = await get_surface_volatilities(
+            session,
+            [leg_data.option_id for leg_data in legs_data],
+            [leg_data.K for leg_data in legs_data],
+        )
+
+    values, errors = await price_black76_batch(
+        [leg_data.option_type for leg_data in legs_data],
+        F,
+        [leg_data.K for leg_data in legs_data],
+        r,
+        sigma,
+        T,
+        greeks,
+        exclude=[i in missing or i in volatility_errors for i in range(len(legs_data))],
+    )
+
+    legs = []
+    total = 0.0
+    for i, leg_data in enumerate(legs_data):
+        if i in missing:
+            legs.append(
+                {
+                    "error": market_data_errors.get(
+                        leg_data.option_id, "Option market data not found."
+                    )
+                }
+            )
+        elif i in volatility_errors:
+            legs.append({"error": volatility_errors[i]})
+        else:
+            leg = priced_result(values, i, greeks, errors.get(i))
+            if "pv" not in leg:
+                legs.append(leg)
+                continue
+            leg["value"] = leg["pv"] * leg_data.quantity
+            if not math.isfinite(leg["value"]):
+                legs.append({"error": non_finite_error("value")})
+                continue
+            total += leg["value"]
+            legs.append(leg)
+    return {"legs": legs, "total": total}
+
+
+# Also declared before "/option_pricing/{option_id}".
+@router.post("/option_pricing/scenarios")
+async def calculate_scenarios(
+    scenario_data: ScenarioData,
+    session: AsyncSession = Depends(get_session),
+    greeks: List[Greek] = Depends(get_greeks),
+    valuation_date: Optional[date] = Depends(get_valuation_date),
+    volatility_source: VolatilitySource = Depends(get_volatility_source),
+) -> dict:
+    """
+    Endpoint for revaluing options under a grid of shifts to their market data, e.g. for risk ladders.
+
+    The grid is every combination of the options and the shifts given for each axis (see
+    `pricer_app.option_pricing.scenarios.scenario_grid`), all priced in a single vectorized call.
+
+    Returns a dictionary with the grid's "axes" in order (always starting with "option"), its "shape",
+    and "pv" as a nested list of that shape, plus a "greeks" dict of nested lists if any were requested
+    (see `get_greeks`). Points that can't be priced are null, and "errors" gives the reason by option index:
+    its market data does not exist, its time to expiration can't be calculated for the valuation date,
+    the volatility surface has no smile for it (see `get_volatility_source`), shifted pricing data is invalid,
+    or the pv or a requested Greek is not a finite number at a point (see `pricer_app.pricing.black76_batch`).
+    With no volatility or time left after shifting, options are priced at their discounted intrinsic value.
+
+    Raises a 400 error if the grid has more than settings.scenario_max_points points.
+
+    :scenario_data: ScenarioData: The options, each containing an option_id, the option type [Call/Put] and strike price [K],
+    and the shifts of each axis.
+
+    :return: dict: A dictionary containing the grid of results.
+    """
+    options_data = scenario_data.options
+    shifts = {
+        axis: getattr(scenario_data, f"{axis}s") for axis, _parameter in SCENARIO_AXES
+    }
+    shape = (
+        len(options_data),
+        *(
+            len(axis_shifts)
+            for axis_shifts in shifts.values()
+            if axis_shifts is not None
+        ),
+    )
+    points = math.prod(shape)
+    if points > settings.scenario_max_points:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Scenario grid of {points} points is larger than the limit of {settings.scenario_max_points}.",
+        )
+
+    market_data, market_data_errors = await get_black76_market_data_many(
+        session, (option_data.option_id for option_data in options_data), valuation_date
+    )
+    errors = {}
+    for i, option_data in enumerate(options_data):
+        if option_data.option_id not in market_data:
+            errors[i] = market_data_errors.get(
+                option_data.option_id, "Option market data not found."
+            )
+
+    # Options without market data are left out of pricing, and reported in errors already.
+    parameters = np.array(
+        [
+            market_data.get(option_data.option_id, (np.nan,) * 4)
+            for option_data in options_data
+        ],
+        dtype=float,
+    ).reshape(-1, 4)
+    F, r, sigma, T = parameters.T
+    if volatility_source == VolatilitySource.surface:
+        sigma, volatility_errors = await get_surface_volatilities(
+            session,
+            [option_data.option_id for option_data in options_data],
+            [option_data.K for option_data in options_data],
+        )
+        for i, message in volatility_errors.items():
+            errors.setdefault(i, message)
+    axes, grid = scenario_grid(F, r, sigma, T, shifts)
+
+    # option type and strike vary by option only, along the first axis.
+    per_option = (-1,) + (1,) * (len(shape) - 1)
+    values, point_errors = await price_black76_batch(
+        call_mask([option_data.option_type for option_data in options_data]).reshape(
+            per_option
+        ),
+        grid["F"],
+        np.array([option_data.K for option_data in options_data]).reshape(per_option),
+        grid["r"],
+        grid["sigma"],
+        grid["T"],
+        greeks,
+        exclude=np.array([i in errors for i in range(len(options_data))]).reshape(
+            per_option
+        ),
+    )
+    points_per_option = math.prod(shape[1:])
+    for index, message in point_errors.items():
+        option_errors = errors.setdefault(index // points_per_option, message)
+        if message not in option_errors:
+            errors[index // points_per_option] = f"{option_errors} {message}"
+
+    def grid_values(values: np.ndarray) -> list:
+        # NaN isn't valid JSON.
+        values = values.reshape(shape)
+        return np.where(np.isnan(values), None, values).tolist()
+
+    result = {"axes": axes, "shape": shape, "pv": grid_values(values["pv"])}
+    if greeks:
+        result["greeks"] = {
+            greek.value: grid_values(values[greek.value]) for greek in greeks
+        }
+    result["errors"] = dict(sorted(errors.items()))
+    return result
+
+
 @router.post("/option_pricing/{option_id}")
 async def calculate_option_pv(
     option_id: int,
     option_data: OptionPricingData,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_session),
+    greeks: List[Greek] = Depends(get_greeks),
+    valuation_date: Optional[date] = Depends(get_valuation_date),
+    volatility_source: VolatilitySource = Depends(get_volatility_source),
 ) -> dict:
     """
     Endpoint for calculating the present value (PV) of an option.
 
-    Returns a dictionary containing the present value of the option.
+    Returns a dictionary containing the present value of the option, and a "greeks" dictionary
+    if any Greeks were requested (see `get_greeks`).
 
     Raises a 404 error if the option market data object does not exist.
-    Raises a 400 error if the option pricing data is invalid (see `pricer_app.pricing.black76`).
+    Raises a 400 error if the option pricing data is invalid (see `pricer_app.pricing.black76`),
+    or the time to expiration can't be calculated for the valuation date (see `get_valuation_date`),
+    or the volatility surface has no smile for the option (see `get_volatility_source`).
 
     :option_id: int: The ID of the option market data object.
     :option_data: OptionPricingData: The option pricing data, containing the option type [Call/Put] and strike price [K}.
 
     :return: dict: A dictionary containing the present value of the option as calculated by the Black-76 model.
     """
-    option_market_data_instance = session.exec(
-        select(MarketData).where(MarketData.id == option_id)
-    ).first()
-
-    if option_market_data_instance is None:
-        raise HTTPException(status_code=404, detail="Option market data not found.")
-
-    market_data = MarketDataRetrieve.convert_market_data_from_json(
-        option_market_data_instance.market_data
-    )
-
-    F = market_data["forward_price"]
-    r = market_data["risk_free_interest_rate"]
-    sigma = market_data["volatility"]
-    T = market_data["time_to_expiration"]
+    F, r, sigma, T = await get_black76_market_data(session, option_id, valuation_date)
+    if volatility_source == VolatilitySource.surface:
+        (sigma,) = (
+            await get_surface_volatility(session, option_id, [option_data.K])
+        ).tolist()
 
     try:
+        if greeks:
+            values = black76_greeks(
+                option_data.option_type, F, option_data.K, r, sigma, T, greeks
+            )
+            return {"pv": values.pop("pv"), "greeks": values}
         pv = black76(option_data.option_type, F, option_data.K, r, sigma, T)
         return {"pv": pv}
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e.args[0]))
+
+
+@router.post("/option_pricing/{option_id}/batch")
+async def calculate_option_pv_batch(
+    option_id: int,
+    options_data: List[OptionPricingData],
+    session: AsyncSession = Depends(get_session),
+    greeks: List[Greek] = Depends(get_greeks),
+    valuation_date: Optional[date] = Depends(get_valuation_date),
+    volatility_source: VolatilitySource = Depends(get_volatility_source),
+) -> dict:
+    """
+    Endpoint for calculating the present value (PV) of many options against one market data object.
+
+    The market data is fetched once, and all options are priced in a single vectorized call.
+
+    Returns a dictionary with a "results" list in request order, each entry is either {"pv": float},
+    plus a "greeks" dict if any were requested (see `get_greeks`), or {"error": str} if that option's pricing data is invalid
+    or its pv is not a finite number (see `pricer_app.pricing.black76_batch`), so one bad option doesn't fail the whole batch.
+    A requested Greek that is not a finite number is null, with an "error" saying so.
+
+    Raises a 404 error if the option market data object does not exist.
+    Raises a 400 error if the volatility surface has no smile for the options (see `get_volatility_source`).
+
+    :option_id: int: The ID of the option market data object.
+    :options_data: List[OptionPricingData]: The option pricing data, each containing the option type [Call/Put] and strike price [K].
+
+    :return: dict: A dictionary containing the results as calculated by the Black-76 model.
+    """
+    F, r, sigma, T = await get_black76_market_data(session, option_id, valuation_date)
+    if volatility_source == VolatilitySource.surface:
+        sigma = await get_surface_volatility(
+            session, option_id, [option_data.K for option_data in options_data]
+        )
+
+    values, errors = await price_black76_batch(
+        [option_data.option_type for option_data in options_data],
+        F,
+        [option_data.K for option_data in options_data],
+        r,
+        sigma,
+        T,
+        greeks,
+    )
+    return {
+        "results": [
+            priced_result(values, i, greeks, errors.get(i))
+            for i in range(len(options_data))
+        ]
+    }
+
+
+@router.post("/option_pricing/{option_id}/implied_volatility")
+async def calculate_implied_volatility(
+    option_id: int,
+    quotes_data: List[ImpliedVolatilityData],
+    session: AsyncSession = Depends(get_session),
+    valuation_date: Optional[date] = Depends(get_valuation_date),
+) -> dict:
+    """
+    Endpoint for calculating the Black76 implied volatility of a ladder of option prices.
+
+    The forward price, risk-free rate and time to expiration come from the market data object,
+    its stored volatility is ignored. All prices are solved together in one vectorized call.
+
+    Returns a dictionary with a "results" list in request order, each entry is either
+    {"volatility": float} or {"error": str} if that price can't be solved
+    (see `pricer_app.implied_volatility.implied_volatility_batch`).
+
+    Raises a 404 error if the option market data object does not exist.
+
+    :option_id: int: The ID of the option market data object.
+    :quotes_data: List[ImpliedVolatilityData]: The quotes, each containing the option type [Call/Put], strike price [K] and price.
+
+    :return: dict: A dictionary containing the implied volatilities.
+    """
+    F, r, _, T = await get_black76_market_data(session, option_id, valuation_date)
+
+    volatilities, errors = await solve_implied_volatility_batch(
+        [quote_data.option_type for quote_data in quotes_data],
+        [quote_data.price for quote_data in quotes_data],
+        F,
+        [quote_data.K for quote_data in quotes_data],
+        r,
+        T,
+    )
+    return {
+        "results": [
+            {"error": errors[i]} if i in errors else {"volatility": volatility}
+            for i, volatility in enumerate(volatilities.tolist())
+        ]
+    }
@@ -0,0 +1,57 @@
+"""
+Scenario grids: options revalued under every combination of shifts to their market data.
+
+The options and each shift axis are dimensions of one grid, the market data is broadcast across it so
+the whole grid is priced in a single vectorized call.
+"""
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# (axis name, Black76 parameter it shifts) of each scenario axis, in grid order after the options.
+SCENARIO_AXES = (
+    ("forward_shift", "F"),
+    ("volatility_shift", "sigma"),
+    ("rate_shift", "r"),
+    ("time_shift", "T"),
+)
+
+
+def scenario_grid(
+    F: Sequence[float],
+    r: Sequence[float],
+    sigma: Sequence[float],
+    T: Sequence[float],
+    shifts: Dict[str, Optional[Sequence[float]]],
+) -> Tuple[List[str], Dict[str, np.ndarray]]:
+    """
+    Shift the market data of each option along the scenario axes.
+
+    >>> axes, grid = scenario_grid([100.0], [0.03], [0.2], [0.5], {"forward_shift": [-0.5, 0.0, 0.5]})
+    >>> axes, grid["F"].tolist(), grid["sigma"].shape
+    (['option', 'forward_shift'], [[50.0, 100.0, 150.0]], (1, 1))
+
+    :param F, r, sigma, T: the market data, one value per option
+    :param shifts: {axis name: shifts} see `SCENARIO_AXES`, axes that are missing or None are left out;
+    forward price shifts are relative, the others are added.
+    :return: tuple of (the grid's axes, {"F": ..., "r": ..., "sigma": ..., "T": ...}), the parameters
+    broadcast to the grid's shape of (options, shifts of each axis, ...)
+    """
+    axes = ["option"]
+    grid = {
+        name: np.asarray(values, dtype=float)
+        for name, values in (("F", F), ("r", r), ("sigma", sigma), ("T", T))
+    }
+    for axis, parameter in SCENARIO_AXES:
+        if shifts.get(axis) is None:
+            continue
+        axes.append(axis)
+        # every parameter gets the new dimension, so the options stay on the first.
+        for name in grid:
+            grid[name] = grid[name][..., np.newaxis]
+        axis_shifts = np.asarray(shifts[axis], dtype=float)
+        if parameter == "F":
+            grid[parameter] = grid[parameter] * (1.0 + axis_shifts)
+        else:
+            grid[parameter] = grid[parameter] + axis_shifts
+    return axes, grid
@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic import BaseModel
 from .enums import OptionType
 
@@ -7,3 +9,30 @@ class OptionPricingData(BaseModel):
     K: float
 
     _validate_option_type = OptionType.ensure_valid_option_type
+
+
+class PortfolioLegData(OptionPricingData):
+    # The ID of the option market data object this leg is priced against.
+    option_id: int
+    quantity: float = 1.0
+
+
+class ImpliedVolatilityData(OptionPricingData):
+    # The option's present value, e.g. as quoted by the exchange.
+    price: float
+
+
+class ScenarioOptionData(OptionPricingData):
+    # The ID of the option market data object the option is revalued against.
+    option_id: int
+
+
+class ScenarioData(BaseModel):
+    options: List[ScenarioOptionData]
+    # The shifts along each axis of the grid, see `scenarios.SCENARIO_AXES`; axes that aren't given are
+    # left out. Forward price shifts are relative (0.01 is +1%), the others are added to the market data:
+    # volatility and rate shifts as absolute amounts (0.01 is one point), time shifts in years.
+    forward_shifts: Optional[List[float]] = None
+    volatility_shifts: Optional[List[float]] = None
+    rate_shifts: Optional[List[float]] = None
+    time_shifts: Optional[List[float]] = None
@@ -0,0 +1,211 @@
+import asyncio
+import os
+import signal
+import time
+from functools import partial
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from pricer_app.option_pricing import executor
+from pricer_app.option_pricing.enums import Greek
+from pricer_app.option_pricing.executor import (
+    black76_chunk,
+    price_black76_batch,
+    run_chunked,
+    solve_implied_volatility_batch,
+)
+from pricer_app.option_pricing.implied_volatility import implied_volatility_batch
+from pricer_app.option_pricing.pricing import black76_array, black76_batch
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """
+    Send every job to a pool of two workers, in chunks of at most 7 options.
+    """
+    monkeypatch.setattr(executor.settings, "pricing_pool_workers", 2)
+    monkeypatch.setattr(executor.settings, "pricing_pool_threshold", 0)
+    monkeypatch.setattr(executor.settings, "implied_volatility_pool_threshold", 0)
+    monkeypatch.setattr(executor.settings, "pricing_pool_chunk_size", 7)
+    yield
+    executor.shutdown_pool()
+
+
+async def test_price_black76_batch_in_pool(pool):
+    option_types = ["call", "put"] * 25
+    K = np.linspace(-10.0, 150.0, 50)
+    K[[20, 30]] = np.nan
+    exclude = np.arange(50) == 20
+    greeks = [Greek.delta, Greek.vega]
+
+    values, errors = await price_black76_batch(
+        option_types, 100.0, K, 0.03, 0.2, 0.5, greeks, exclude
+    )
+    expected_values, expected_errors = black76_batch(
+        option_types, 100.0, K, 0.03, 0.2, 0.5, greeks, exclude
+    )
+    assert executor._pool is not None
+    assert errors == expected_errors
+    assert 20 not in errors and 30 in errors
+    assert set(values) == {"pv", "delta", "vega"}
+    for name, value in values.items():
+        np.testing.assert_array_equal(value, expected_values[name])
+
+
+async def test_price_black76_batch_in_pool_broadcasts(pool):
+    # a grid of forward prices by strikes, neither is sent through shared memory.
+    F = np.linspace(80.0, 120.0, 5).reshape(-1, 1)
+    K = np.linspace(90.0, 110.0, 9)
+
+    values, errors = await price_black76_batch("call", F, K, 0.03, 0.2, 0.5)
+    assert errors == {}
+    assert values["pv"].shape == (5, 9)
+    np.testing.assert_array_equal(
+        values["pv"], black76_array("call", F, K, 0.03, 0.2, 0.5)
+    )
+
+
+async def test_solve_implied_volatility_batch_in_pool(pool):
+    K = np.linspace(50.0, 150.0, 40)
+    option_types = np.where(K > 100.0, "call", "put")
+    prices = black76_array(option_types, 100.0, K, 0.03, 0.3, 0.5)
+    prices[3] = 1000.0
+
+    volatilities, errors = await solve_implied_volatility_batch(
+        option_types, prices, 100.0, K, 0.03, 0.5
+    )
+    expected_volatilities, expected_errors = implied_volatility_batch(
+        option_types, prices, 100.0, K, 0.03, 0.5
+    )
+    assert errors == expected_errors
+    assert list(errors) == [3]
+    np.testing.assert_array_equal(volatilities, expected_volatilities)
+
+
+async def test_small_jobs_stay_inline(monkeypatch):
+    monkeypatch.setattr(executor.settings, "pricing_pool_threshold", 100)
+    values, errors = await price_black76_batch(
+        "call", 100.0, [90.0, 110.0], 0.03, 0.2, 0.5
+    )
+    assert executor._pool is None
+    assert values["pv"].shape == (2,)
+
+
+def test_pricing_pool_disabled(monkeypatch):
+    monkeypatch.setattr(executor.settings, "pricing_pool_workers", 0)
+    assert not executor.use_pool(10**9, 0)
+
+
+async def test_broken_pool_is_replaced(pool):
+    await price_black76_batch("call", 100.0, [90.0, 110.0], 0.03, 0.2, 0.5)
+    broken = executor._pool
+    for process in list(broken._processes.values()):
+        os.kill(process.pid, signal.SIGKILL)
+
+    values, errors = await price_black76_batch(
+        "call", 100.0, [90.0, 110.0], 0.03, 0.2, 0.5
+    )
+    assert executor._pool is not broken
+    assert errors == {}
+    np.testing.assert_array_equal(
+        values["pv"], black76_array("call", 100.0, [90.0, 110.0], 0.03, 0.2, 0.5)
+    )
+
+
+def black76_chunk_dying_once(*chunk_args, marker: str, **kwargs):
+    """
+    In a pool worker: exit the process, breaking the pool, the first time any chunk is priced.
+    """
+    try:
+        os.close(os.open(marker, os.O_CREAT | os.O_EXCL))
+    except FileExistsError:
+        return black76_chunk(*chunk_args, **kwargs)
+    os._exit(1)
+
+
+async def test_job_is_retried_when_pool_breaks(pool, tmp_path):
+    inputs = {
+        "is_call": np.ones(20, dtype=bool),
+        "F": np.full(20, 100.0),
+        "K": np.linspace(80.0, 120.0, 20),
+        "r": np.array(0.03),
+        "sigma": np.array(0.2),
+        "T": np.array(0.5),
+    }
+    chunk_function = partial(
+        black76_chunk_dying_once, marker=str(tmp_path / "died"), greeks=()
+    )
+
+    outputs, errors = await run_chunked(chunk_function, inputs, (20,), ["pv"])
+    assert errors == {}
+    np.testing.assert_array_equal(
+        outputs["pv"], black76_array("call", 100.0, inputs["K"], 0.03, 0.2, 0.5)
+    )
+
+
+@pytest.mark.parametrize(
+    "server_workers, expected", [(None, 32), (1, 32), (8, 4), (32, 1), (64, 1)]
+)
+def test_pool_workers_share_cpu_cores(monkeypatch, server_workers, expected):
+    monkeypatch.setattr(executor.settings, "pricing_pool_workers", None)
+    monkeypatch.setattr(executor.settings, "server_workers", server_workers)
+    monkeypatch.setattr(executor.os, "cpu_count", lambda: 32)
+    assert executor.pool_workers() == expected
+
+
+def test_batch_endpoint_in_pool(pool, client: TestClient, market_data_models):
+    options = [{"option_type": "call", "K": K} for K in range(80, 120)]
+    options[5]["K"] = -1.0
+
+    results = client.post("/option_pricing/1/batch", json=options).json()["results"]
+    assert results[5] == {"error": "Strike price (K) must be non-negative."}
+    single = client.post("/option_pricing/1", json=options[0]).json()
+    assert results[0]["pv"] == pytest.approx(single["pv"], rel=1e-14)
+
+
+@pytest.mark.benchmark
+async def test_pool_benchmark(pool, monkeypatch):
+    """
+    Price a large batch inline and in the pool, and measure how long the event loop is held up
+    meanwhile: inline, for the whole job; pooled, for little more than the copies in and out of
+    shared memory.  Pooled jobs are only faster with several cores to share them.
+    """
+    monkeypatch.setattr(executor.settings, "pricing_pool_chunk_size", 100000)
+    K = np.linspace(50.0, 150.0, 400000)
+    # start the workers up, outside the measurement.
+    await price_black76_batch("call", 100.0, K[:10], 0.03, 0.2, 0.5)
+
+    async def latency_while(job):
+        longest_pause = 0.0
+
+        async def ticker():
+            nonlocal longest_pause
+            while True:
+                start = time.perf_counter()
+                await asyncio.sleep(0)
+                longest_pause = max(longest_pause, time.perf_counter() - start)
+
+        ticks = asyncio.create_task(ticker())
+        await asyncio.sleep(0)
+        start = time.perf_counter()
+        values, _errors = await job()
+        elapsed = time.perf_counter() - start
+        ticks.cancel()
+        return values, elapsed, longest_pause
+
+    async def inline():
+        return black76_batch("call", 100.0, K, 0.03, 0.2, 0.5)
+
+    async def pooled():
+        return await price_black76_batch("call", 100.0, K, 0.03, 0.2, 0.5)
+
+    inline_values, inline_elapsed, _ = await latency_while(inline)
+    pooled_values, pooled_elapsed, pooled_pause = await latency_while(pooled)
+    print(
+        f"{K.size} options: inline {inline_elapsed * 1e3:.1f}ms (event loop blocked throughout), "
+        f"pooled {pooled_elapsed * 1e3:.1f}ms, longest event loop pause {pooled_pause * 1e3:.1f}ms"
+    )
+
+    np.testing.assert_array_equal(pooled_values["pv"], inline_values["pv"])
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from pricer_app.option_pricing.enums import OptionType
+from pricer_app.option_pricing.implied_volatility import (
+    implied_volatility,
+    implied_volatility_batch,
+)
+from pricer_app.option_pricing.pricing import black76, black76_array
+
+
+@pytest.mark.parametrize(
+    "option_type, F, K, r, sigma, T",
+    [
+        (OptionType.call, 95.0, 100.0, 0.03, 0.25, 0.5),
+        (OptionType.put, 10.0, 10.0, 0.02, 0.3, 0.7),
+        (OptionType.call, 100.0, 50.0, 0.03, 0.2, 0.5),
+        (OptionType.put, 45.0, 50.0, 0.04, 0.2, 0.75),
+        (OptionType.call, 100.0, 100.0, 0.0, 2.5, 2.0),
+        (OptionType.put, 100.0, 120.0, 0.05, 0.4, 0.1),
+    ],
+)
+def test_implied_volatility_round_trip(option_type, F, K, r, sigma, T):
+    price = black76(option_type, F, K, r, sigma, T)
+    assert implied_volatility(option_type, price, F, K, r, T) == pytest.approx(
+        sigma, abs=1e-6
+    )
+
+
+def test_implied_volatility_batch_round_trip():
+    strikes = np.linspace(50.0, 200.0, 2000)
+    sigmas = np.linspace(0.1, 1.0, 2000)
+    option_types = np.where(strikes > 100.0, "call", "put")
+    prices = black76_array(option_types, 100.0, strikes, 0.03, sigmas, 0.5)
+
+    volatilities, errors = implied_volatility_batch(
+        option_types, prices, 100.0, strikes, 0.03, 0.5
+    )
+    assert errors == {}
+    assert volatilities.shape == strikes.shape
+    np.testing.assert_allclose(volatilities, sigmas, atol=1e-6)
+
+
+@pytest.mark.parametrize(
+    "option_type, price, F, K, r, T, expected_error",
+    [
+        (
+            OptionType.call,
+            200.0,
+            100.0,
+            100.0,
+            0.0,
+            0.5,
+            "Option price must be between the no-arbitrage bounds 0.0 and 100.0.",
+        ),
+        (
+            OptionType.put,
+            60.0,
+            100.0,
+            50.0,
+            0.0,
+            0.5,
+            "Option price must be between the no-arbitrage bounds 0.0 and 50.0.",
+        ),
+        (
+            OptionType.call,
+            10.0,
+            100.0,
+            -1.0,
+            0.0,
+            0.5,
+            "Strike price (K) must be non-negative.",
+        ),
+        (
+            OptionType.call,
+            10.0,
+            100.0,
+            100.0,
+            0.0,
+            0.0,
+            "Time to maturity (T) must be positive to imply a volatility.",
+        ),
+        (
+            OptionType.call,
+            1e-12,
+            100.0,
+            100.0,
+            0.0,
+            1.0,
+            "Implied volatility is outside the search range 1e-08 to 100.0.",
+        ),
+        (
+            OptionType.put,
+            50.0,
+            100.0,
+            100.0,
+            0.0,
+            1e-4,
+            "Implied volatility is outside the search range 1e-08 to 100.0.",
+        ),
+    ],
+)
+def test_implied_volatility_errors(option_type, price, F, K, r, T, expected_error):
+    with pytest.raises(ValueError) as e:
+        implied_volatility(option_type, price, F, K, r, T)
+    assert str(e.value) == expected_error
+
+
+def test_implied_volatility_batch_reports_errors_per_option():
+    volatilities, errors = implied_volatility_batch(
+        ["call", "call", "put"], [10.0, 200.0, 5.0], 100.0, 100.0, 0.0, 0.5
+    )
+    assert list(errors) == [1]
+    assert np.isnan(volatilities[1])
+    assert not np.isnan(volatilities[[0, 2]]).any()
+
+
+def test_implied_volatility_batch_outside_search_range():
+    volatilities, errors = implied_volatility_batch(
+        "call", [1e-12, 1e-9, 1e-3], 100.0, 100.0, 0.0, 1.0
+    )
+    assert list(errors) == [0, 1]
+    assert np.isnan(volatilities[[0, 1]]).all()
+    assert black76(OptionType.call, 100.0, 100.0, 0.0, volatilities[2], 1.0) == (
+        pytest.approx(1e-3, rel=1e-10)
+    )
@@ -0,0 +1,74 @@
+from timeit import timeit
+
+import numpy as np
+import pytest
+from scipy.stats import norm
+
+from pricer_app.option_pricing.enums import OptionType
+from pricer_app.option_pricing.normal import (
+    norm_cdf,
+    norm_cdf_array,
+    norm_pdf,
+    norm_pdf_array,
+)
+from pricer_app.option_pricing.pricing import black76
+
+# Includes deep in and out-of-the-money tails, where d1 and d2 are large.
+POINTS = [-37.0, -20.0, -8.5, -5.0, -1.0, -1e-9, 0.0, 1e-9, 0.5, 3.0, 8.5, 20.0]
+
+
+@pytest.mark.parametrize("x", POINTS)
+def test_norm_cdf_matches_scipy_stats(x):
+    assert norm_cdf(x) == pytest.approx(norm.cdf(x), rel=1e-12, abs=0)
+
+
+@pytest.mark.parametrize("x", POINTS)
+def test_norm_pdf_matches_scipy_stats(x):
+    assert norm_pdf(x) == pytest.approx(norm.pdf(x), rel=1e-13, abs=0)
+
+
+def test_array_kernels_match_scipy_stats():
+    x = np.array(POINTS)
+    np.testing.assert_allclose(norm_cdf_array(x), norm.cdf(x), rtol=1e-13, atol=0)
+    np.testing.assert_allclose(norm_pdf_array(x), norm.pdf(x), rtol=1e-13, atol=0)
+
+
+@pytest.mark.parametrize(
+    "option_type, F, K, r, sigma, T",
+    [
+        (OptionType.call, 95.0, 100.0, 0.03, 0.25, 0.5),
+        (OptionType.put, 10.0, 10.0, 0.02, 0.3, 0.7),
+        (OptionType.call, 100.0, 50.0, 0.03, 0.2, 0.5),
+        (OptionType.call, 100.0, 300.0, 0.03, 0.2, 0.5),
+        (OptionType.put, 100.0, 30.0, 0.03, 0.2, 0.5),
+    ],
+)
+def test_black76_matches_scipy_stats_pricer(option_type, F, K, r, sigma, T):
+    """
+    black76 as it was before the kernels, priced with scipy.stats.norm.cdf.
+    """
+    sigma_sqrt_t = sigma * np.sqrt(T)
+    d1 = (np.log(F / K) + 0.5 * sigma**2 * T) / sigma_sqrt_t
+    d2 = d1 - sigma_sqrt_t
+    if option_type == OptionType.call:
+        expected = np.exp(-r * T) * (F * norm.cdf(d1) - K * norm.cdf(d2))
+    else:
+        expected = np.exp(-r * T) * (K * norm.cdf(-d2) - F * norm.cdf(-d1))
+    assert black76(option_type, F, K, r, sigma, T) == pytest.approx(
+        expected, rel=1e-12, abs=1e-300
+    )
+
+
+@pytest.mark.benchmark
+def test_norm_cdf_is_faster_than_scipy_stats():
+    """
+    Micro-benchmark of the per call cost; the kernel is typically ~100x faster,
+    the assertion leaves plenty of room for noisy machines.
+    """
+    number = 2000
+    kernel = min(timeit(lambda: norm_cdf(0.3), number=number) for _ in range(3))
+    scipy_stats = min(timeit(lambda: norm.cdf(0.3), number=number) for _ in range(3))
+    assert kernel * 10 < scipy_stats, (
+        f"norm_cdf: {kernel / number * 1e9:.0f}ns, "
+        f"scipy.stats.norm.cdf: {scipy_stats / number * 1e9:.0f}ns per call"
+    )
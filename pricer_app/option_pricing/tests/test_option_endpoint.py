@@ -1,7 +1,14 @@
+import json
+import math
+
 import pytest
 
 from fastapi.testclient import TestClient
 
+from pricer_app.option_pricing.enums import OptionType
+from pricer_app.option_pricing.pricing import black76
+from pricer_app.settings import settings
+
 
 @pytest.mark.parametrize(
     "option_index, option_type, K, expected_status_code, expected_error_message",
@@ -37,3 +44,386 @@ async def test_calculate_option_pv(
     elif response.status_code == 400:
         assert "detail" in data
         assert expected_error_message == data["detail"]
+
+
+@pytest.mark.asyncio
+async def test_calculate_option_pv_batch(client: TestClient, market_data_models):
+    options = [
+        {"option_type": "call", "K": 90.0},
+        {"option_type": "put", "K": -10.0},
+        {"option_type": "put", "K": 100.0},
+    ]
+    response = client.post("/option_pricing/1/batch", json=options)
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert len(results) == len(options)
+    assert results[1] == {"error": "Strike price (K) must be non-negative."}
+
+    # Valid options match the single option endpoint, in request order.
+    for option, result in zip(options[::2], results[::2]):
+        single = client.post("/option_pricing/1", json=option).json()
+        assert result["pv"] == pytest.approx(single["pv"], rel=1e-14)
+
+
+@pytest.mark.asyncio
+async def test_calculate_option_pv_batch_nan(client: TestClient, market_data_models):
+    options = [
+        {"option_type": "call", "K": float("nan")},
+        {"option_type": "call", "K": 90.0},
+    ]
+    response = client.post("/option_pricing/1/batch", json=options)
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert results[0] == {"error": "Strike price (K) must be a number."}
+    assert results[1]["pv"] > 0
+
+
+@pytest.mark.parametrize(
+    "option_id, options, expected_status_code",
+    [
+        (999, [{"option_type": "call", "K": 100.0}], 404),
+        (1, [{"option_type": "invalid", "K": 100.0}], 422),
+        (1, [], 200),
+    ],
+)
+@pytest.mark.asyncio
+async def test_calculate_option_pv_batch_status(
+    client: TestClient, market_data_models, option_id, options, expected_status_code
+):
+    response = client.post(f"/option_pricing/{option_id}/batch", json=options)
+    assert response.status_code == expected_status_code
+
+
+@pytest.mark.asyncio
+async def test_calculate_portfolio_pv(client: TestClient, market_data_models):
+    legs = [
+        {"option_id": 1, "option_type": "call", "K": 100.0, "quantity": 2},
+        {"option_id": 2, "option_type": "put", "K": 10.0, "quantity": -1},
+        {"option_id": 999, "option_type": "call", "K": 100.0},
+        {"option_id": 1, "option_type": "put", "K": -1.0},
+        {"option_id": 3, "option_type": "call", "K": 50.0},
+    ]
+    response = client.post("/option_pricing/portfolio", json=legs)
+    assert response.status_code == 200
+    data = response.json()
+
+    assert len(data["legs"]) == len(legs)
+    assert data["legs"][2] == {"error": "Option market data not found."}
+    assert data["legs"][3] == {"error": "Strike price (K) must be non-negative."}
+
+    total = 0.0
+    for leg, result in zip(legs, data["legs"]):
+        if "error" in result:
+            continue
+        single = client.post(
+            f"/option_pricing/{leg['option_id']}",
+            json={"option_type": leg["option_type"], "K": leg["K"]},
+        ).json()
+        assert result["pv"] == pytest.approx(single["pv"], rel=1e-14)
+        assert result["value"] == pytest.approx(
+            single["pv"] * leg.get("quantity", 1), rel=1e-14
+        )
+        total += result["value"]
+    assert data["total"] == pytest.approx(total)
+
+
+@pytest.mark.asyncio
+async def test_calculate_portfolio_pv_empty(client: TestClient, market_data_models):
+    response = client.post("/option_pricing/portfolio", json=[])
+    assert response.status_code == 200
+    assert response.json() == {"legs": [], "total": 0.0}
+
+
+@pytest.mark.asyncio
+async def test_calculate_option_pv_greeks(client: TestClient, market_data_models):
+    option = {"option_type": "call", "K": 100.0}
+    response = client.post("/option_pricing/1?greeks=delta,vega", json=option)
+    assert response.status_code == 200
+    data = response.json()
+    assert set(data["greeks"]) == {"delta", "vega"}
+    assert data["pv"] == client.post("/option_pricing/1", json=option).json()["pv"]
+
+    batch = client.post("/option_pricing/1/batch?greeks=delta,vega", json=[option])
+    assert batch.json()["results"][0]["greeks"] == pytest.approx(data["greeks"])
+
+    portfolio = client.post(
+        "/option_pricing/portfolio?greeks=delta,vega",
+        json=[{"option_id": 1, **option}],
+    )
+    assert portfolio.json()["legs"][0]["greeks"] == pytest.approx(data["greeks"])
+
+
+@pytest.mark.parametrize(
+    "url",
+    ["/option_pricing/1", "/option_pricing/1/batch", "/option_pricing/portfolio"],
+)
+@pytest.mark.asyncio
+async def test_invalid_greeks(client: TestClient, market_data_models, url):
+    option = {"option_id": 1, "option_type": "call", "K": 100.0}
+    body = option if url == "/option_pricing/1" else [option]
+    response = client.post(f"{url}?greeks=delta,speed", json=body)
+    assert response.status_code == 422
+    assert response.json()["detail"].startswith("Invalid greeks 'speed'")
+
+
+@pytest.mark.asyncio
+async def test_calculate_implied_volatility(client: TestClient, market_data_models):
+    # Market data 1 has a volatility of 0.25, price options with it and solve back.
+    options = [
+        {"option_type": "call", "K": 90.0},
+        {"option_type": "put", "K": 100.0},
+    ]
+    pvs = client.post("/option_pricing/1/batch", json=options).json()["results"]
+    quotes = [{**option, "price": pv["pv"]} for option, pv in zip(options, pvs)]
+    quotes.append({"option_type": "call", "K": 90.0, "price": 1000.0})
+
+    response = client.post("/option_pricing/1/implied_volatility", json=quotes)
+    assert response.status_code == 200
+    results = response.json()["results"]
+
+    assert [result["volatility"] for result in results[:2]] == pytest.approx(
+        [0.25, 0.25]
+    )
+    assert results[2]["error"].startswith("Option price must be between")
+
+
+@pytest.mark.asyncio
+async def test_calculate_implied_volatility_not_found(client: TestClient):
+    response = client.post(
+        "/option_pricing/999/implied_volatility",
+        json=[{"option_type": "call", "K": 90.0, "price": 1.0}],
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_calculate_option_pv_valuation_date(
+    client: TestClient, market_data_models
+):
+    # Market data 3 is "BRN Jun21 Call Strike 50.0 USD" on ICE, which expires on 2021-04-30.
+    option = {"option_type": "call", "K": 50.0}
+    response = client.post(
+        "/option_pricing/3?valuation_date=2021-01-01&greeks=theta", json=option
+    )
+    assert response.status_code == 200
+    expected = black76(OptionType.call, 100.0, 50.0, 0.03, 0.2, 119 / 365)
+    assert response.json()["pv"] == pytest.approx(expected, rel=1e-14)
+
+    batch = client.post(
+        "/option_pricing/3/batch?valuation_date=2021-01-01", json=[option]
+    )
+    assert batch.json()["results"][0]["pv"] == pytest.approx(expected, rel=1e-14)
+
+
+@pytest.mark.asyncio
+async def test_calculate_portfolio_pv_valuation_date(
+    client: TestClient, market_data_models
+):
+    legs = [
+        {"option_id": 3, "option_type": "call", "K": 50.0},
+        # Market data 2 is an HH contract on ICE, which has no expiry rule for HH.
+        {"option_id": 2, "option_type": "put", "K": 10.0},
+    ]
+    response = client.post(
+        "/option_pricing/portfolio?valuation_date=2021-01-01", json=legs
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["legs"][0]["pv"] == pytest.approx(
+        black76(OptionType.call, 100.0, 50.0, 0.03, 0.2, 119 / 365), rel=1e-14
+    )
+    assert data["legs"][1] == {"error": "No expiry rule found for asset code: HH"}
+
+
+@pytest.mark.asyncio
+async def test_calculate_portfolio_pv_at_expiry(client: TestClient, market_data_models):
+    # Market data 3 expires on the valuation date, its options are worth their intrinsic value.
+    legs = [
+        {"option_id": 3, "option_type": "call", "K": 90.0, "quantity": 2},
+        {"option_id": 3, "option_type": "put", "K": 100.0},
+    ]
+    response = client.post(
+        "/option_pricing/portfolio?valuation_date=2021-04-30", json=legs
+    )
+    data = response.json()
+    assert data["legs"] == [{"pv": 10.0, "value": 20.0}, {"pv": 0.0, "value": 0.0}]
+    assert data["total"] == 20.0
+
+    # gamma is infinite at the money, only that Greek is left out.
+    response = client.post(
+        "/option_pricing/portfolio?valuation_date=2021-04-30&greeks=gamma", json=legs
+    )
+    data = response.json()
+    assert data["legs"][1] == {
+        "pv": 0.0,
+        "value": 0.0,
+        "greeks": {"gamma": None},
+        "error": "The gamma of the option is not a finite number.",
+    }
+    assert data["total"] == 20.0
+
+
+@pytest.mark.asyncio
+async def test_calculate_option_pv_at_expiry(client: TestClient, market_data_models):
+    # Market data 3 expires on the valuation date, its options are worth their intrinsic value.
+    response = client.post(
+        "/option_pricing/3?valuation_date=2021-04-30&greeks=delta,gamma",
+        json={"option_type": "call", "K": 50.0},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"pv": 50.0, "greeks": {"delta": 1.0, "gamma": 0.0}}
+
+    options = [{"option_type": "call", "K": 100.0}, {"option_type": "put", "K": 110.0}]
+    response = client.post(
+        "/option_pricing/3/batch?valuation_date=2021-04-30", json=options
+    )
+    assert response.json()["results"] == [{"pv": 0.0}, {"pv": 10.0}]
+
+
+@pytest.mark.parametrize(
+    "option_id, valuation_date, K, greeks, expected_error",
+    [
+        (2, "2024-01-01", 50.0, "", "No expiry rule found for asset code: HH"),
+        (3, "2021-05-01", 50.0, "", "Time to maturity (T) must be non-negative."),
+        # on its expiry date, an option at the money has no finite gamma.
+        (
+            3,
+            "2021-04-30",
+            100.0,
+            "gamma",
+            "The gamma of the option is not a finite number.",
+        ),
+    ],
+)
+@pytest.mark.asyncio
+async def test_calculate_option_pv_valuation_date_errors(
+    client: TestClient,
+    market_data_models,
+    option_id,
+    valuation_date,
+    K,
+    greeks,
+    expected_error,
+):
+    response = client.post(
+        f"/option_pricing/{option_id}?valuation_date={valuation_date}&greeks={greeks}",
+        json={"option_type": "call", "K": K},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == expected_error
+
+
+@pytest.mark.asyncio
+async def test_calculate_scenarios(client: TestClient, market_data_models):
+    scenario = {
+        "options": [
+            {"option_id": 1, "option_type": "call", "K": 100.0},
+            {"option_id": 999, "option_type": "call", "K": 100.0},
+            {"option_id": 2, "option_type": "put", "K": 10.0},
+        ],
+        "forward_shifts": [-0.1, 0.0, 0.1],
+        "volatility_shifts": [-0.05, 0.0],
+    }
+    response = client.post("/option_pricing/scenarios", json=scenario)
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["axes"] == ["option", "forward_shift", "volatility_shift"]
+    assert data["shape"] == [3, 3, 2]
+    assert data["errors"] == {"1": "Option market data not found."}
+    assert data["pv"][1] == [[None, None]] * 3
+
+    for i, option in enumerate(scenario["options"]):
+        if i == 1:
+            continue
+        market_data = json.loads(
+            client.get(f"/market_data/{option['option_id']}").json()["market_data"]
+        )
+        # unshifted, as the single option endpoint prices it.
+        single = client.post(f"/option_pricing/{option['option_id']}", json=option)
+        assert data["pv"][i][1][1] == pytest.approx(single.json()["pv"], rel=1e-14)
+
+        assert data["pv"][i][2][0] == pytest.approx(
+            black76(
+                OptionType(option["option_type"]),
+                market_data["forward_price"] * 1.1,
+                option["K"],
+                market_data["risk_free_interest_rate"],
+                market_data["volatility"] - 0.05,
+                market_data["time_to_expiration"],
+            ),
+            rel=1e-14,
+        )
+
+
+@pytest.mark.asyncio
+async def test_calculate_scenarios_greeks_and_errors(
+    client: TestClient, market_data_models
+):
+    scenario = {
+        "options": [{"option_id": 1, "option_type": "call", "K": 100.0}],
+        "volatility_shifts": [0.0, -10.0],
+        "time_shifts": [0.0],
+    }
+    response = client.post("/option_pricing/scenarios?greeks=delta", json=scenario)
+    assert response.status_code == 200
+    data = response.json()
+
+    assert data["axes"] == ["option", "volatility_shift", "time_shift"]
+    single = client.post(
+        "/option_pricing/1?greeks=delta", json=scenario["options"][0]
+    ).json()
+    assert data["greeks"]["delta"][0][0] == [
+        pytest.approx(single["greeks"]["delta"], rel=1e-14)
+    ]
+    assert data["pv"][0][1] == [None]
+    assert data["errors"] == {"0": "Volatility (sigma) must be non-negative."}
+
+
+@pytest.mark.asyncio
+async def test_calculate_scenarios_zero_volatility(
+    client: TestClient, market_data_models
+):
+    # Market data 3 has F=100 and sigma=0.2: shifted to no volatility, options are worth their intrinsic value.
+    scenario = {
+        "options": [
+            {"option_id": 3, "option_type": "call", "K": 100.0},
+            {"option_id": 3, "option_type": "call", "K": 90.0},
+        ],
+        "volatility_shifts": [0.0, -0.2],
+    }
+    response = client.post("/option_pricing/scenarios", json=scenario)
+    data = response.json()
+    discount = math.exp(-0.03 * 0.5)
+    assert [row[1] for row in data["pv"]] == [
+        0.0,
+        pytest.approx(10.0 * discount, rel=1e-14),
+    ]
+    assert data["errors"] == {}
+
+    # gamma is infinite at the money, only that value is left out.
+    response = client.post("/option_pricing/scenarios?greeks=gamma", json=scenario)
+    data = response.json()
+    assert data["pv"][0][1] == 0.0
+    assert data["greeks"]["gamma"][0][1] is None
+    assert data["greeks"]["gamma"][1][1] == 0.0
+    assert data["errors"] == {"0": "The gamma of the option is not a finite number."}
+
+
+@pytest.mark.asyncio
+async def test_calculate_scenarios_too_large(
+    client: TestClient, market_data_models, monkeypatch
+):
+    monkeypatch.setattr(settings, "scenario_max_points", 8)
+    scenario = {
+        "options": [{"option_id": 1, "option_type": "call", "K": 100.0}],
+        "forward_shifts": [-0.1, 0.0, 0.1],
+        "volatility_shifts": [-0.05, 0.0, 0.05],
+    }
+    response = client.post("/option_pricing/scenarios", json=scenario)
+    assert response.status_code == 400
+    assert response.json()["detail"] == (
+        "Scenario grid of 9 points is larger than the limit of 8."
+    )
@@ -1,9 +1,18 @@
 import re
 
+import numpy as np
 import pytest
 
-from pricer_app.option_pricing.enums import OptionType
-from pricer_app.option_pricing.pricing import black76
+from pricer_app.option_pricing.enums import Greek, OptionType
+from pricer_app.option_pricing.pricing import (
+    black76,
+    black76_array,
+    black76_array_greeks,
+    black76_batch,
+    black76_greeks,
+    black76_input_errors,
+    call_mask,
+)
 
 
 @pytest.mark.parametrize(
@@ -62,3 +71,189 @@ def test_black76_value_errors(option_type, F, K, r, sigma, T, expected_error):
     """
     with pytest.raises(ValueError, match=re.escape(expected_error)):
         black76(option_type, F, K, r, sigma, T)
+
+
+# Cases from the option endpoint tests and the README example.
+PRICING_CASES = [
+    (OptionType.call, 95.0, 100.0, 0.03, 0.25, 0.5),
+    (OptionType.put, 10.0, 10.0, 0.02, 0.3, 0.7),
+    (OptionType.call, 100.0, 50.0, 0.03, 0.2, 0.5),
+    (OptionType.put, 45.0, 50.0, 0.04, 0.2, 0.75),
+]
+
+
+@pytest.mark.parametrize("option_type, F, K, r, sigma, T", PRICING_CASES)
+def test_black76_array_matches_scalar(option_type, F, K, r, sigma, T):
+    pv = black76_array(option_type, F, K, r, sigma, T)
+    assert pv.shape == ()
+    assert float(pv) == pytest.approx(
+        black76(option_type, F, K, r, sigma, T), rel=1e-14
+    )
+
+
+def test_black76_array_prices_all_cases_in_one_pass():
+    option_types, F, K, r, sigma, T = zip(*PRICING_CASES)
+    pvs = black76_array(list(option_types), F, K, r, sigma, T)
+    expected = [black76(*case) for case in PRICING_CASES]
+    assert pvs.tolist() == pytest.approx(expected, rel=1e-14)
+
+
+def test_black76_array_broadcasts_scalars():
+    strikes = np.array([80.0, 90.0, 100.0, 110.0])
+    pvs = black76_array("put", 95.0, strikes, 0.03, 0.25, 0.5)
+    expected = [black76(OptionType.put, 95.0, K, 0.03, 0.25, 0.5) for K in strikes]
+    assert pvs.shape == strikes.shape
+    assert pvs.tolist() == pytest.approx(expected, rel=1e-14)
+
+
+def test_black76_array_accepts_call_mask():
+    pvs = black76_array(np.array([True, False]), 45.0, 50.0, 0.04, 0.2, 0.75)
+    assert pvs.tolist() == pytest.approx(
+        [
+            black76(OptionType.call, 45.0, 50.0, 0.04, 0.2, 0.75),
+            black76(OptionType.put, 45.0, 50.0, 0.04, 0.2, 0.75),
+        ],
+        rel=1e-14,
+    )
+
+
+def test_black76_array_value_errors_report_all_offending_indices():
+    with pytest.raises(ValueError) as e:
+        black76_array("call", [45, 45, -1], [-1, 50, -2], 0.04, 0.2, 0.75)
+    assert str(e.value) == (
+        "Forward price (F) must be non-negative. Offending indices: [2] "
+        "Strike price (K) must be non-negative. Offending indices: [0, 2]"
+    )
+
+
+def test_black76_input_errors():
+    assert black76_input_errors(45, [50, 55], 0.04, 0.2, 0.75) == {}
+    assert black76_input_errors(45, 50, 0.04, [0.2, -0.1, -0.3], 0.75) == {
+        "Volatility (sigma) must be non-negative.": [1, 2]
+    }
+    assert black76_input_errors(45, [50, np.nan], 0.04, 0.2, 0.75) == {
+        "Strike price (K) must be a number.": [1]
+    }
+
+
+def test_call_mask():
+    assert call_mask(["call", OptionType.put, "put"]).tolist() == [True, False, False]
+    with pytest.raises(ValueError):
+        call_mask(["call", "straddle"])
+
+
+def test_black76_batch_reports_errors_per_option():
+    values, errors = black76_batch(
+        ["call", "put", "call"], [45, 45, -1], [50, 50, -2], 0.04, 0.2, 0.75
+    )
+    pvs = values["pv"]
+    assert errors == {
+        2: "Forward price (F) must be non-negative. "
+        "Strike price (K) must be non-negative."
+    }
+    assert np.isnan(pvs[2])
+    assert pvs[:2].tolist() == pytest.approx(
+        [
+            black76(OptionType.call, 45, 50, 0.04, 0.2, 0.75),
+            black76(OptionType.put, 45, 50, 0.04, 0.2, 0.75),
+        ],
+        rel=1e-14,
+    )
+
+
+def test_black76_batch_exclude():
+    values, errors = black76_batch(
+        "call", 45, [50, np.nan, np.nan], 0.04, 0.2, 0.75, exclude=[False, True, False]
+    )
+    # NaN inputs are errors, unless the option is excluded.
+    assert errors == {2: "Strike price (K) must be a number."}
+    assert np.isnan(values["pv"][1:]).all()
+    assert values["pv"][0] == pytest.approx(
+        black76(OptionType.call, 45, 50, 0.04, 0.2, 0.75), rel=1e-14
+    )
+
+
+@pytest.mark.parametrize("sigma, T", [(0.0, 0.75), (0.2, 0.0)])
+def test_black76_batch_prices_zero_total_volatility_at_intrinsic_value(sigma, T):
+    values, errors = black76_batch(
+        ["call", "put", "call", "put"],
+        100.0,
+        [90.0, 90.0, 110.0, 100.0],
+        0.04,
+        sigma,
+        T,
+        [Greek.delta, Greek.gamma, Greek.vega, Greek.rho],
+    )
+    discount = np.exp(-0.04 * T)
+    # gamma is infinite at the money.
+    assert errors == {3: "The gamma of the option is not a finite number."}
+    assert values["pv"][:3].tolist() == pytest.approx([10 * discount, 0.0, 0.0])
+    assert values["delta"][:3].tolist() == pytest.approx([discount, 0.0, 0.0])
+    assert values["gamma"][:3].tolist() == [0.0, 0.0, 0.0]
+    # only the value that isn't finite is left out.
+    assert np.isnan(values["gamma"][3])
+    assert values["pv"][3] == 0.0
+    assert values["delta"][3] == pytest.approx(-0.5 * discount)
+
+    # without gamma, the option at the money is priced like the others, its delta is the limit from either side.
+    values, errors = black76_batch("put", 100.0, 100.0, 0.04, sigma, T, [Greek.delta])
+    assert errors == {}
+    assert values["pv"] == 0.0
+    assert values["delta"] == pytest.approx(-0.5 * discount)
+
+
+@pytest.mark.parametrize("sigma, T", [(0.0, 0.75), (0.2, 0.0)])
+def test_black76_zero_total_volatility(sigma, T):
+    discount = np.exp(-0.04 * T)
+    assert black76(OptionType.call, 100.0, 90.0, 0.04, sigma, T) == pytest.approx(
+        10 * discount
+    )
+    assert black76(OptionType.put, 100.0, 90.0, 0.04, sigma, T) == 0.0
+    values = black76_greeks(OptionType.put, 100.0, 100.0, 0.04, sigma, T, ["delta"])
+    assert values == pytest.approx({"pv": 0.0, "delta": -0.5 * discount})
+    with pytest.raises(ValueError, match="The gamma of the option"):
+        black76_greeks(OptionType.call, 100.0, 100.0, 0.04, sigma, T, ["gamma"])
+
+
+def bumped_greeks(option_type, F, K, r, sigma, T, h=1e-5):
+    """
+    Greeks by central finite differences of black76, to check the analytic Greeks against.
+    """
+
+    def pv(F=F, r=r, sigma=sigma, T=T):
+        return black76(option_type, F, K, r, sigma, T)
+
+    return {
+        "delta": (pv(F=F + h) - pv(F=F - h)) / (2 * h),
+        # gamma uses a bigger bump, the second difference is dominated by rounding otherwise.
+        "gamma": (pv(F=F + 1e3 * h) - 2 * pv() + pv(F=F - 1e3 * h)) / (1e3 * h) ** 2,
+        "vega": (pv(sigma=sigma + h) - pv(sigma=sigma - h)) / (2 * h),
+        "theta": -(pv(T=T + h) - pv(T=T - h)) / (2 * h),
+        "rho": (pv(r=r + h) - pv(r=r - h)) / (2 * h),
+    }
+
+
+@pytest.mark.parametrize("option_type, F, K, r, sigma, T", PRICING_CASES)
+def test_black76_greeks_match_finite_differences(option_type, F, K, r, sigma, T):
+    values = black76_greeks(option_type, F, K, r, sigma, T)
+    assert values["pv"] == black76(option_type, F, K, r, sigma, T)
+    for greek, expected in bumped_greeks(option_type, F, K, r, sigma, T).items():
+        assert values[greek] == pytest.approx(expected, rel=1e-4, abs=1e-6), greek
+
+
+def test_black76_greeks_only_calculates_requested_greeks():
+    values = black76_greeks(
+        OptionType.call, 95.0, 100.0, 0.03, 0.25, 0.5, [Greek.delta, "vega"]
+    )
+    assert set(values) == {"pv", "delta", "vega"}
+
+
+def test_black76_array_greeks_match_scalar():
+    option_types, F, K, r, sigma, T = zip(*PRICING_CASES)
+    values = black76_array_greeks(list(option_types), F, K, r, sigma, T)
+    expected = [black76_greeks(*case) for case in PRICING_CASES]
+    assert set(values) == {"pv", *(greek.value for greek in Greek)}
+    for name, array in values.items():
+        assert array.tolist() == pytest.approx(
+            [e[name] for e in expected], rel=1e-12
+        ), name
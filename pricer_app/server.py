@@ -0,0 +1,79 @@
+"""
+Production server entry point: the app in several uvicorn worker processes.
+
+    $ python -m pricer_app.server --workers 8
+
+Each worker starts up (see `main.lifespan`) with the exchange calendars loaded and the market data cache
+filled before it accepts requests.  The database is migrated once, here, before the workers start.
+
+Sending SIGHUP to the server process replaces the workers one at a time, each new one started before the
+old one is stopped, so code and settings are reloaded without refusing requests.  Workers stopping get
+settings.server_graceful_shutdown_timeout seconds to finish the requests in progress.
+
+--reload runs a single worker that restarts when the code changes, for development.
+"""
+import argparse
+import os
+from typing import List, Optional
+
+import uvicorn
+from sqlmodel import Session
+
+from pricer_app.database import engine
+from pricer_app.main import prepare_database
+from pricer_app.settings import settings
+
+APP = "pricer_app.main:app"
+
+
+def default_workers() -> int:
+    """
+    :return: settings.server_workers, or the number of CPU cores when it isn't set.
+    """
+    return settings.server_workers or os.cpu_count() or 1
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the pricer app.")
+    parser.add_argument("--host", default=settings.server_host)
+    parser.add_argument("--port", type=int, default=settings.server_port)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=default_workers(),
+        help="worker processes, defaults to the number of CPU cores",
+    )
+    parser.add_argument(
+        "--reload",
+        action="store_true",
+        help="restart when the code changes, runs a single worker",
+    )
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    # Once, rather than by every worker at the same time.
+    with Session(engine) as session:
+        prepare_database(session)
+    # Workers are new processes that read their settings from the environment.
+    os.environ["PREPARE_DATABASE_ON_STARTUP"] = "false"
+    # so they can share the CPU cores between their pricing pools, see `option_pricing.executor.pool_workers`.
+    os.environ["SERVER_WORKERS"] = str(1 if args.reload else args.workers)
+
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=None if args.reload else args.workers,
+        reload=args.reload,
+        timeout_graceful_shutdown=settings.server_graceful_shutdown_timeout,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
@@ -7,6 +9,79 @@ load_dotenv()
 class Settings(BaseSettings):
     database_url: str
     test_database_url: str
+    # PostgreSQL database for the PostgreSQL backend tests, they are skipped if it isn't set.
+    # Its tables are dropped after each test.
+    test_postgres_url: Optional[str] = None
+
+    # Database engine, see `database.create_database_engine`.
+    database_echo: bool = False
+    database_pool_size: int = 5
+    database_max_overflow: int = 10
+    database_pool_pre_ping: bool = True
+
+    # SQLite pragmas, set on every new connection: WAL lets readers carry on while a write is in progress,
+    # busy_timeout (milliseconds) makes writers wait for each other instead of failing, and cache_size is
+    # in KiB when negative.
+    sqlite_journal_mode: Literal[
+        "DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"
+    ] = "WAL"
+    sqlite_synchronous: Literal["OFF", "NORMAL", "FULL", "EXTRA"] = "NORMAL"
+    sqlite_busy_timeout: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64 * 1024
+
+    # Years of exchange business days to precompute for expiry calculations, see `LastBusinessDayTable`.
+    expiry_calendar_start_year: int = 2000
+    expiry_calendar_end_year: int = 2040
+    # Most delivery months one GET /expiries request may span; months outside the horizon above are
+    # calculated and added to the expiry index when they are first asked for.
+    expiries_max_months: int = 120
+
+    # Rows per upsert statement for bulk market data uploads.
+    bulk_upload_chunk_size: int = 500
+
+    # Default and largest number of rows per page when listing market data.
+    market_data_page_size: int = 100
+    market_data_max_page_size: int = 1000
+
+    # Rows fetched per round trip when exporting market data.
+    market_data_export_batch_size: int = 1000
+
+    # Market data cached for pricing, per worker process: most entries (0 disables the cache) and
+    # seconds they are kept, see `market_data.cache`.
+    market_data_cache_size: int = 10000
+    market_data_cache_ttl: float = 60.0
+    # Volatility surfaces cached per worker process (one per exchange and asset), with the same time to live,
+    # see `market_data.volatility_surface`.
+    volatility_surface_cache_size: int = 1000
+    # Seconds a worker reuses the market data version it last read rather than reading it again for every
+    # request, so entries made stale by another worker's upload can be used for up to this long (0 reads it
+    # every time), see `market_data.cache.get_market_data_version`.
+    market_data_version_ttl: float = 1.0
+    # Load the most recently uploaded market data into the cache when a worker starts.
+    market_data_cache_prewarm: bool = True
+
+    # Process pool large pricing jobs run in, see `option_pricing.executor`: worker processes (defaults to
+    # the number of CPU cores divided by the number of server workers, 0 prices everything inline), the
+    # number of options (quotes for implied volatility) from which a job is sent to the pool, and the most
+    # options per chunk.
+    pricing_pool_workers: Optional[int] = None
+    pricing_pool_threshold: int = 50000
+    implied_volatility_pool_threshold: int = 5000
+    pricing_pool_chunk_size: int = 100000
+
+    # Most points (options x shifts) a scenario grid may have, see `option_pricing.scenarios`.
+    scenario_max_points: int = 1000000
+
+    # Server, see `pricer_app.server`; the number of workers defaults to the number of CPU cores.
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: Optional[int] = None
+    # Seconds a worker that is stopped or replaced has to finish the requests in progress.
+    server_graceful_shutdown_timeout: float = 30.0
+    # Migrate and create the tables and the expiry index when the app starts up.  The server does this
+    # once, before starting its workers, and turns it off for them.
+    prepare_database_on_startup: bool = True
 
 
 settings = Settings()
@@ -0,0 +1,62 @@
+import pytest
+from sqlalchemy import text
+
+from pricer_app.database import (
+    async_database_url,
+    create_async_database_engine,
+    create_database_engine,
+    engine_options,
+)
+from pricer_app.settings import settings
+
+SQLITE_PRAGMAS = ("journal_mode", "synchronous", "busy_timeout", "cache_size")
+
+
+@pytest.fixture
+def sqlite_settings(monkeypatch):
+    monkeypatch.setattr(settings, "sqlite_journal_mode", "WAL")
+    monkeypatch.setattr(settings, "sqlite_synchronous", "FULL")
+    monkeypatch.setattr(settings, "sqlite_busy_timeout", 1234)
+    monkeypatch.setattr(settings, "sqlite_cache_size", -2048)
+    # journal_mode, then synchronous as a number.
+    return ["wal", 2, 1234, -2048]
+
+
+def test_engine_options(monkeypatch):
+    monkeypatch.setattr(settings, "database_echo", True)
+    monkeypatch.setattr(settings, "database_pool_size", 7)
+
+    options = engine_options("sqlite:///db.sqlite")
+    assert options["echo"] is True
+    assert options["pool_size"] == 7
+    assert options["connect_args"] == {"check_same_thread": False}
+
+    assert "pool_size" not in engine_options("sqlite://")
+    assert "connect_args" not in engine_options("postgresql://user@localhost/db")
+
+
+def test_async_database_url():
+    assert async_database_url("sqlite:///db.sqlite") == "sqlite+aiosqlite:///db.sqlite"
+
+
+def test_create_database_engine_sqlite_pragmas(tmp_path, sqlite_settings):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    with engine.connect() as connection:
+        pragmas = [
+            connection.execute(text(f"PRAGMA {pragma}")).scalar()
+            for pragma in SQLITE_PRAGMAS
+        ]
+    assert pragmas == sqlite_settings
+    engine.dispose()
+
+
+async def test_create_async_database_engine_sqlite_pragmas(tmp_path, sqlite_settings):
+    engine = create_async_database_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    assert engine.pool.size() == settings.database_pool_size
+    async with engine.connect() as connection:
+        pragmas = [
+            (await connection.execute(text(f"PRAGMA {pragma}"))).scalar()
+            for pragma in SQLITE_PRAGMAS
+        ]
+    assert pragmas == sqlite_settings
+    await engine.dispose()
@@ -0,0 +1,56 @@
+"""
+Startup import budget: importing the app must not pull in the heavy libraries only some requests need,
+and must stay within IMPORT_TIME_BUDGET seconds (override with the IMPORT_TIME_BUDGET environment variable).
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+REPOSITORY_ROOT = Path(__file__).parents[2]
+
+# Imported on first use: exchange calendars by the expiry rules, scipy by the array pricer,
+# pyarrow by the columnar exports.
+LAZY_MODULES = (
+    "pandas",
+    "pandas_market_calendars",
+    "exchange_calendars",
+    "scipy",
+    "pyarrow",
+    "pytest",
+)
+
+IMPORT_TIME_BUDGET = float(os.environ.get("IMPORT_TIME_BUDGET", 2.5))
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=REPOSITORY_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def test_app_import_is_lazy():
+    result = run_python(
+        "-c",
+        "import json, sys; import pricer_app.main; "
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))",
+    )
+    assert json.loads(result.stdout) == []
+
+
+def test_app_import_time_budget():
+    result = run_python("-X", "importtime", "-c", "import pricer_app.main")
+    # lines are "import time: self [us] | cumulative | module"
+    cumulative = re.search(
+        r"^import time:\s+\d+ \|\s+(\d+) \| pricer_app\.main$",
+        result.stderr,
+        re.MULTILINE,
+    )
+    seconds = int(cumulative.group(1)) / 1e6
+    assert seconds < IMPORT_TIME_BUDGET
@@ -0,0 +1,119 @@
+"""
+Tests of the PostgreSQL backend, against settings.test_postgres_url (TEST_POSTGRES_URL), skipped if it isn't set.
+"""
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from pricer_app.market_data.bulk_upload import (
+    upsert_market_data,
+    validate_market_data_rows,
+)
+from pricer_app.market_data.postgres import copy_upsert_market_data
+from pricer_app.market_data.tests.factories import MarketDataRowFactory
+from pricer_app.settings import settings
+
+pytestmark = pytest.mark.skipif(
+    not settings.test_postgres_url, reason="TEST_POSTGRES_URL is not set"
+)
+
+
+@pytest.fixture
+def database_url():
+    # conftest's session, async_session and client fixtures use this database instead of the SQLite one.
+    return settings.test_postgres_url
+
+
+async def test_copy_upsert_market_data(async_session):
+    valid, _ = validate_market_data_rows(
+        [
+            MarketDataRowFactory(contract="BRN Jan24 Call Strike 100 USD/BBL"),
+            MarketDataRowFactory(contract="BRN Feb24 Call Strike 100 USD/BBL"),
+        ]
+    )
+    created = await copy_upsert_market_data(async_session, valid)
+    assert [result["status"] for result in created.values()] == ["created"] * 2
+
+    valid, _ = validate_market_data_rows(
+        [
+            MarketDataRowFactory(
+                contract="BRN Jan24 Call Strike 100 USD/BBL",
+                market_data__forward_price=96.0,
+            ),
+            MarketDataRowFactory(contract="BRN Mar24 Call Strike 100 USD/BBL"),
+            MarketDataRowFactory(
+                contract="BRN Jan24 Call Strike 100 USD/BBL",
+                market_data__forward_price=97.0,
+            ),
+        ]
+    )
+    results = await copy_upsert_market_data(async_session, valid)
+    await async_session.commit()
+
+    assert results[0] == results[2] == {"status": "updated", "id": created[0]["id"]}
+    assert results[1]["status"] == "created"
+
+
+async def test_upsert_market_data(async_session):
+    valid, _ = validate_market_data_rows(
+        [
+            MarketDataRowFactory(contract="BRN Jan24 Call Strike 100 USD/BBL"),
+            MarketDataRowFactory(
+                contract="BRN Jan24 Call Strike 100 USD/BBL",
+                market_data__forward_price=97.0,
+            ),
+        ]
+    )
+    results = await async_session.run_sync(upsert_market_data, valid)
+    assert results[0] == results[1]
+    assert results[0]["status"] == "created"
+
+
+def test_postgres_routes(client: TestClient):
+    rows = [
+        MarketDataRowFactory(contract="BRN Jan24 Call Strike 100 USD/BBL"),
+        MarketDataRowFactory(
+            exchange_code="NYMEX", contract="HH Mar24 Put Strike 10 USD/MMBTu"
+        ),
+        MarketDataRowFactory(
+            contract="BRN Jan24 Call Strike 100 USD/BBL",
+            market_data__forward_price=99.0,
+        ),
+    ]
+    response = client.post("/market_data/bulk", json=rows)
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0] == results[2]
+    option_id = results[0]["id"]
+
+    response = client.post(
+        "/market_data",
+        json=MarketDataRowFactory(contract="BRN Feb24 Call Strike 100 USD/BBL"),
+    )
+    assert response.status_code == 200
+
+    listed = client.get("/market_data", params={"asset": "BRN"}).json()
+    assert [row["contract"] for row in listed] == [
+        "BRN Jan24 Call Strike 100 USD/BBL",
+        "BRN Feb24 Call Strike 100 USD/BBL",
+    ]
+    assert json.loads(listed[0]["market_data"])["forward_price"] == 99.0
+
+    response = client.post(
+        f"/option_pricing/{option_id}", json={"option_type": "call", "K": 100.0}
+    )
+    assert response.status_code == 200
+
+    exported = client.get("/market_data/export").text.splitlines()
+    assert len(exported) == 3
+
+    body = (
+        "exchange_code,contract,pricing_model,forward_price,strike_price,"
+        "time_to_expiration,volatility,risk_free_interest_rate\n"
+        "ICE,BRN Jan24 Call Strike 100 USD/BBL,Black76,101.0,100.0,0.5,0.2,0.03\n"
+    )
+    response = client.post(
+        "/market_data/stream", content=body, headers={"Content-Type": "text/csv"}
+    )
+    assert json.loads(response.text.splitlines()[-1])["updated"] == 1
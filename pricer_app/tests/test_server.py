@@ -0,0 +1,64 @@
+import os
+from unittest import mock
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import Session, select
+
+from pricer_app import server
+from pricer_app.market_data.cache import market_data_cache
+from pricer_app.market_data.models import Expiry, MarketData
+
+
+@pytest.fixture
+def uvicorn_run(monkeypatch):
+    calls = []
+    monkeypatch.setattr(
+        server.uvicorn, "run", lambda *args, **kwargs: calls.append((args, kwargs))
+    )
+    monkeypatch.setattr(
+        server, "prepare_database", lambda session: calls.append("prepare_database")
+    )
+    # main sets environment variables for the workers, the environment is restored after the test.
+    with mock.patch.dict(os.environ, PREPARE_DATABASE_ON_STARTUP="true"):
+        os.environ.pop("SERVER_WORKERS", None)
+        yield calls
+
+
+def test_server_runs_workers(uvicorn_run, monkeypatch):
+    monkeypatch.setattr(server.settings, "server_workers", None)
+    monkeypatch.setattr(server.os, "cpu_count", lambda: 6)
+
+    server.main(["--port", "9000"])
+
+    prepare, (args, kwargs) = uvicorn_run
+    assert prepare == "prepare_database"
+    assert args == ("pricer_app.main:app",)
+    assert kwargs["port"] == 9000
+    assert kwargs["workers"] == 6
+    assert kwargs["reload"] is False
+    assert os.environ["PREPARE_DATABASE_ON_STARTUP"] == "false"
+    assert os.environ["SERVER_WORKERS"] == "6"
+
+
+def test_server_reload(uvicorn_run):
+    server.main(["--reload", "--workers", "4"])
+
+    _prepare, (_args, kwargs) = uvicorn_run
+    assert kwargs["reload"] is True
+    assert kwargs["workers"] is None
+
+
+def test_server_workers_must_be_positive(uvicorn_run):
+    with pytest.raises(SystemExit):
+        server.main(["--workers", "0"])
+    assert uvicorn_run == []
+
+
+def test_startup_prepares_database_and_cache(
+    session: Session, market_data_models, client: TestClient
+):
+    # the client fixture has started the app up.
+    assert session.exec(select(Expiry)).first() is not None
+    market_data_count = len(session.exec(select(MarketData.id)).all())
+    assert market_data_cache.stats()["size"] == market_data_count